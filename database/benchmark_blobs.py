@@ -0,0 +1,68 @@
+"""
+Size benchmark for content-addressed test messages
+Fills a scratch SQLite database with test runs whose system/user messages
+repeat (as they do when a prompt is tested many times), stores them inline
+as before, then moves them into content_blobs and compares the file sizes
+
+Usage: python database/benchmark_blobs.py [--prompts 200] [--runs 25]
+"""
+
+import os
+import argparse
+import random
+import tempfile
+from datetime import datetime
+
+from benchmarking import load_app
+
+def file_bytes(db, text):
+    with db.engine.connect() as conn:
+        conn.execute(text('VACUUM'))
+        return conn.execute(text('PRAGMA page_count')).scalar() * conn.execute(text('PRAGMA page_size')).scalar()
+
+def benchmark(prompt_count, runs_per_prompt):
+    with tempfile.TemporaryDirectory() as scratch:
+        app = load_app(os.path.join(scratch, 'benchmark.db'))
+
+        from sqlalchemy import text
+        from src.models.user import db
+        from src.models.prompt import TestResult
+        from src.services.migrations import move_inline_test_messages
+
+        with app.app_context():
+            words = 'summarize classify translate explain rewrite the following text as a list'.split()
+            system_messages = [f'You are assistant #{i}. ' * 20 for i in range(5)]
+            prompts = [' '.join(random.choices(words, k=300)) for _ in range(prompt_count)]
+
+            # Inline layout: every run stores its own copy of both messages
+            rows = [
+                {
+                    'prompt_id': prompt_id + 1,
+                    'model_name': 'benchmark-model',
+                    'system_message': random.choice(system_messages),
+                    'user_message': prompt,
+                    'model_response': f'Response {run}',
+                    'created_at': datetime.utcnow()
+                }
+                for prompt_id, prompt in enumerate(prompts)
+                for run in range(runs_per_prompt)
+            ]
+            db.session.execute(db.insert(TestResult), rows)
+            db.session.commit()
+            inline_bytes = file_bytes(db, text)
+
+            with db.engine.begin() as conn:
+                moved = move_inline_test_messages(conn)
+            blob_bytes = file_bytes(db, text)
+            blob_count = db.session.execute(text('SELECT COUNT(*) FROM content_blobs')).scalar()
+
+        print(f"{moved:,} test results, {blob_count:,} distinct messages")
+        print(f"   Inline messages:  {inline_bytes:12,} bytes")
+        print(f"   Content blobs:    {blob_bytes:12,} bytes ({(1 - blob_bytes / inline_bytes) * 100:.0f}% smaller)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=25)
+    args = parser.parse_args()
+    benchmark(args.prompts, args.runs)
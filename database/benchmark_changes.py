@@ -0,0 +1,70 @@
+"""
+Benchmark for the change feed
+Fills a scratch SQLite database with prompts (5k by default), edits a few of
+them through the API and compares what a client pays to catch up: reloading
+GET /api/prompts versus GET /api/changes?since=<cursor>, in bytes and time.
+Also reports the cost the change log adds to POST /api/prompts
+
+Usage: python database/benchmark_changes.py [--prompts 5000] [--edits 5] [--repeat 5]
+"""
+
+import os
+import argparse
+import tempfile
+
+from benchmarking import load_app, timed
+
+INSERT_CHUNK = 5000
+
+def benchmark(prompt_count, edits, repeat):
+    with tempfile.TemporaryDirectory() as scratch:
+        app = load_app(os.path.join(scratch, 'benchmark.db'))
+
+        from datetime import datetime
+        from src.models.user import db
+        from src.models.prompt import Prompt, content_hash
+
+        with app.app_context():
+            now = datetime.utcnow()
+            content = 'Benchmark prompt body with a few sentences of instructions. ' * 20
+            for start in range(0, prompt_count, INSERT_CHUNK):
+                db.session.execute(db.insert(Prompt), [
+                    {'id': i, 'title': f'Prompt {i}', 'content': f'{content}{i}', 'content_hash': content_hash(f'{content}{i}'),
+                     'is_head': True, 'delta_depth': 0, 'version': '1.0.0', 'created_at': now, 'updated_at': now}
+                    for i in range(start + 1, min(start + INSERT_CHUNK, prompt_count) + 1)
+                ])
+            db.session.commit()
+
+        client = app.test_client()
+        cursor = client.get('/api/changes').get_json()['last_seq']
+        for i in range(1, edits + 1):
+            client.put(f'/api/prompts/{i}', json={'content': f'Edited prompt {i}'})
+
+        full_time, full = timed(lambda: client.get('/api/prompts', headers={'Accept-Encoding': 'identity'}), repeat)
+        feed_time, feed = timed(lambda: client.get(f'/api/changes?since={cursor}', headers={'Accept-Encoding': 'identity'}), repeat)
+        print(f"{prompt_count:,} prompts, {edits} edited (best of {repeat})")
+        print(f"   reload GET /api/prompts         {len(full.data):12,} bytes  {full_time * 1000:8.1f} ms")
+        print(f"   GET /api/changes?since=cursor   {len(feed.data):12,} bytes  {feed_time * 1000:8.1f} ms"
+              f"  ({len(feed.get_json()['changes'])} changes)")
+
+        # Write cost: the same create with and without the change log entry,
+        # interleaved so warm-up and noise affect both alike
+        from src.routes import prompt as prompt_routes
+        record_change = prompt_routes.record_change
+        best = {True: None, False: None}
+        for n in range(repeat * 40):
+            logged = n % 2 == 0
+            prompt_routes.record_change = record_change if logged else (lambda *args, **kwargs: None)
+            elapsed, _ = timed(lambda: client.post('/api/prompts', json={'title': f'New {n}', 'content': f'New prompt {n}'}), 1)
+            best[logged] = elapsed if best[logged] is None else min(best[logged], elapsed)
+        prompt_routes.record_change = record_change
+        print(f"   POST /api/prompts               {best[False] * 1000:8.2f} ms without the change log, "
+              f"{best[True] * 1000:8.2f} ms with it")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=5000)
+    parser.add_argument('--edits', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.prompts, args.edits, args.repeat)
@@ -0,0 +1,69 @@
+"""
+Benchmark for response compression
+Fills a scratch SQLite database with prompts (5k by default) of generated
+prose and requests GET /api/prompts with each Accept-Encoding the server
+supports, reporting bytes on the wire and request time per encoding
+
+Usage: python database/benchmark_compression.py [--prompts 5000] [--repeat 5]
+"""
+
+import os
+import argparse
+import random
+import tempfile
+
+from benchmarking import load_app, timed
+
+INSERT_CHUNK = 5000
+
+def prose(words, count):
+    return ' '.join(random.choices(words, k=count)).capitalize() + '.'
+
+def fill(prompt_count):
+    from datetime import datetime, timedelta
+    from src.models.user import db
+    from src.models.prompt import Prompt, content_hash
+
+    # Zipf-ish vocabulary, so the text compresses roughly like real prompts
+    words = [''.join(random.choices('etaoinshrdlucmfwypvbgkqjxz', k=random.randint(2, 9))) for _ in range(3000)]
+    words = [word for rank, word in enumerate(words) for _ in range(max(1, 300 // (rank + 1)))]
+    now = datetime.utcnow()
+    for start in range(0, prompt_count, INSERT_CHUNK):
+        rows = []
+        for i in range(start + 1, min(start + INSERT_CHUNK, prompt_count) + 1):
+            content = '\n\n'.join(prose(words, random.randint(30, 120)) for _ in range(random.randint(2, 6)))
+            rows.append({
+                'id': i, 'title': prose(words, 5), 'content': content, 'content_hash': content_hash(content),
+                'description': prose(words, 15), 'author': 'bench', 'is_head': True, 'delta_depth': 0,
+                'version': '1.0.0', 'created_at': now - timedelta(minutes=i), 'updated_at': now - timedelta(minutes=i),
+            })
+        db.session.execute(db.insert(Prompt), rows)
+    db.session.commit()
+
+def benchmark(prompt_count, repeat):
+    with tempfile.TemporaryDirectory() as scratch:
+        app = load_app(os.path.join(scratch, 'benchmark.db'))
+
+        from src.services.compression import available_encodings
+
+        with app.app_context():
+            fill(prompt_count)
+
+        client = app.test_client()
+        print(f"GET /api/prompts, {prompt_count:,} prompts (best of {repeat})")
+        for url in ('/api/prompts', '/api/prompts?fields=id,title,description,updated_at'):
+            print(f"   {url}")
+            identity = None
+            for encoding in ['identity'] + available_encodings():
+                elapsed, response = timed(lambda: client.get(url, headers={'Accept-Encoding': encoding}), repeat)
+                assert response.headers.get('Content-Encoding', 'identity') == encoding, response.headers
+                size = len(response.data)
+                identity = identity or size
+                print(f"      {encoding:9} {size:12,} bytes  ({size / identity:6.1%})  {elapsed * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.prompts, args.repeat)
@@ -0,0 +1,113 @@
+"""
+Benchmark for the analytics overview
+Fills a scratch SQLite database and compares the single-statement overview
+with the previous approach of one COUNT / SUM query per figure (the
+statement count and cache behaviour are checked in tests/test_overview_cache.py)
+
+Usage: python database/benchmark_overview.py [--prompts 50000] [--tests 500000] [--repeat 20]
+"""
+
+import os
+import argparse
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from benchmarking import load_app, timed
+
+INSERT_CHUNK = 10000
+
+def per_query_overview(db, models, days):
+    """The previous get_overview: a separate round trip per figure"""
+    Prompt, PromptTemplate, Shortcut, Category, TestResult = models
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=days)
+    prev_start_date = start_date - timedelta(days=days)
+    return {
+        'total_prompts': Prompt.query.count(),
+        'total_templates': PromptTemplate.query.count(),
+        'total_shortcuts': Shortcut.query.count(),
+        'total_categories': Category.query.count(),
+        'total_tests': TestResult.query.count(),
+        'prompts_in_period': Prompt.query.filter(Prompt.created_at >= start_date).count(),
+        'prev_prompts': Prompt.query.filter(Prompt.created_at >= prev_start_date, Prompt.created_at < start_date).count(),
+        'total_prompt_uses': db.session.query(db.func.sum(Prompt.use_count)).scalar() or 0,
+        'total_template_uses': db.session.query(db.func.sum(PromptTemplate.use_count)).scalar() or 0,
+        'total_shortcut_uses': db.session.query(db.func.sum(Shortcut.use_count)).scalar() or 0,
+        'total_favorites': Prompt.query.filter_by(is_favorite=True).count(),
+    }
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        self.engine = engine
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+def benchmark(prompt_count, test_count, repeat):
+    with tempfile.TemporaryDirectory() as scratch:
+        app = load_app(os.path.join(scratch, 'benchmark.db'))
+
+        from src.models.user import db
+        from src.models.prompt import Prompt, PromptTemplate, Shortcut, Category, TestResult
+        from src.routes.analytics import overview_counts
+
+        with app.app_context():
+            now = datetime.utcnow()
+            db.session.execute(db.insert(Category), [{'name': f'Category {i}'} for i in range(20)])
+            for start in range(0, prompt_count, INSERT_CHUNK):
+                db.session.execute(db.insert(Prompt), [
+                    {
+                        'title': f'Prompt {i}', 'content': f'Benchmark prompt {i}',
+                        'category_id': random.randint(1, 20), 'is_favorite': random.random() < 0.1,
+                        'use_count': random.randint(0, 50),
+                        'created_at': now - timedelta(days=random.uniform(0, 365))
+                    }
+                    for i in range(start, min(start + INSERT_CHUNK, prompt_count))
+                ])
+            db.session.execute(db.insert(PromptTemplate), [
+                {'name': f'Template {i}', 'content': 'Hello {{name}}', 'use_count': i} for i in range(500)
+            ])
+            db.session.execute(db.insert(Shortcut), [
+                {'trigger': f';s{i}', 'expansion': f'Shortcut {i}', 'use_count': i} for i in range(500)
+            ])
+            table = TestResult.__table__
+            for start in range(0, test_count, INSERT_CHUNK):
+                db.session.execute(table.insert(), [
+                    {
+                        'prompt_id': random.randint(1, prompt_count), 'model_name': 'model-a',
+                        'model_response': 'Model output.', 'created_at': now
+                    }
+                    for _ in range(min(INSERT_CHUNK, test_count - start))
+                ])
+            db.session.commit()
+
+            models = (Prompt, PromptTemplate, Shortcut, Category, TestResult)
+            with StatementCounter(db.engine) as old:
+                per_query_overview(db, models, 30)
+            with StatementCounter(db.engine) as new:
+                overview_counts(30)
+            old_time, _ = timed(lambda: per_query_overview(db, models, 30), repeat)
+            new_time, _ = timed(lambda: overview_counts(30), repeat)
+
+        print(f"{prompt_count:,} prompts, {test_count:,} test results (best of {repeat})")
+        print(f"   Per-figure queries: {old.count:2} statements {old_time * 1000:8.1f} ms")
+        print(f"   Single statement:   {new.count:2} statement  {new_time * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=50000)
+    parser.add_argument('--tests', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.prompts, args.tests, args.repeat)
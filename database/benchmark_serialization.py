@@ -0,0 +1,145 @@
+"""
+Benchmark for list serialization
+Fills a scratch SQLite database with prompts, test results and templates and
+times turning each full list into a JSON body three ways: ORM instances with
+to_dict() and the stdlib encoder (the previous list endpoints), the same with
+orjson, and the column-level serializers with orjson (the current ones)
+
+Usage: python database/benchmark_serialization.py [--prompts 5000] [--tests 20000] [--templates 2000] [--repeat 5]
+"""
+
+import os
+import argparse
+import random
+import tempfile
+
+from benchmarking import load_app, timed
+
+INSERT_CHUNK = 5000
+
+def fill(prompt_count, test_count, template_count):
+    from datetime import datetime, timedelta
+    from src.models.user import db
+    from src.models.prompt import Category, Prompt, PromptTemplate, TestResult, Tag, PromptTag, content_hash
+    from src.services.blobs import message_hashes
+
+    now = datetime.utcnow()
+    categories = [Category(name=f'Category {i}', color='#888888') for i in range(10)]
+    db.session.add_all(categories)
+    tags = [Tag(name=f'tag-{i}') for i in range(50)]
+    db.session.add_all(tags)
+    db.session.flush()
+
+    for start in range(0, prompt_count, INSERT_CHUNK):
+        rows = []
+        for i in range(start + 1, min(start + INSERT_CHUNK, prompt_count) + 1):
+            content = f'Prompt body {i}. ' * 40
+            rows.append({
+                'id': i, 'title': f'Prompt {i}', 'content': content, 'content_hash': content_hash(content),
+                'description': 'Benchmark prompt', 'author': 'bench', 'category_id': random.choice(categories).id,
+                'is_head': True, 'delta_depth': 0, 'version': '1.0.0', 'use_count': i % 17,
+                'created_at': now - timedelta(minutes=i), 'updated_at': now - timedelta(minutes=i),
+                'last_used': now - timedelta(seconds=i) if i % 3 else None,
+            })
+        db.session.execute(db.insert(Prompt), rows)
+        db.session.execute(db.insert(PromptTag), [
+            {'prompt_id': row['id'], 'tag_id': tag.id, 'position': position}
+            for row in rows for position, tag in enumerate(random.sample(tags, 3))
+        ])
+
+    hashes = [message_hashes(f'System message {i}', f'User message {i}') for i in range(100)]
+    for start in range(0, test_count, INSERT_CHUNK):
+        db.session.execute(db.insert(TestResult), [
+            dict(random.choice(hashes), prompt_id=random.randint(1, prompt_count), model_name='bench-model',
+                 temperature=0.7, max_tokens=512, model_response=f'Response {i}. ' * 20, response_time=1.5,
+                 token_count_input=100, token_count_output=200, cost=0.002, quality_score=0.8,
+                 test_type='manual', test_session_id=f'session-{i % 50}', created_at=now - timedelta(seconds=i))
+            for i in range(start, min(start + INSERT_CHUNK, test_count))
+        ])
+
+    db.session.execute(db.insert(PromptTemplate), [
+        {'name': f'Template {i}', 'content': f'Hello {{{{name}}}}, template {i}',
+         'variables': '[{"name": "name", "default": "", "required": true}]',
+         'category_id': random.choice(categories).id, 'use_count': i % 11,
+         'created_at': now, 'updated_at': now - timedelta(seconds=i)}
+        for i in range(template_count)
+    ])
+    db.session.commit()
+
+def benchmark(prompt_count, test_count, template_count, repeat):
+    with tempfile.TemporaryDirectory() as scratch:
+        app = load_app(os.path.join(scratch, 'benchmark.db'))
+
+        from flask.json.provider import DefaultJSONProvider
+        from sqlalchemy.orm import joinedload, selectinload
+        from src.models.user import db
+        from src.models.prompt import Prompt, PromptTemplate, TestResult
+        from src.services.json_provider import FastJSONProvider, orjson
+        from src.services.serializers import PromptRowSerializer, TemplateRowSerializer, TestRowSerializer
+
+        if orjson is None:
+            print("orjson is not installed; the fast provider falls back to the stdlib encoder")
+        stdlib_json = DefaultJSONProvider(app)
+        fast_json = FastJSONProvider(app)
+
+        with app.app_context():
+            fill(prompt_count, test_count, template_count)
+
+            def prompt_orm():
+                query = Prompt.query.filter(Prompt.is_head.is_(True)).options(
+                    joinedload(Prompt.category), selectinload(Prompt.tag_links))
+                return [prompt.to_dict() for prompt in query.order_by(Prompt.id)]
+
+            def prompt_columns():
+                serializer = PromptRowSerializer()
+                query = Prompt.query.filter(Prompt.is_head.is_(True)).with_entities(*serializer.columns)
+                return serializer.to_dicts(query.order_by(Prompt.id).all())
+
+            def test_orm():
+                query = TestResult.query.options(
+                    selectinload(TestResult.system_message_blob), selectinload(TestResult.user_message_blob))
+                return [test.to_dict() for test in query.order_by(TestResult.id)]
+
+            def test_columns():
+                serializer = TestRowSerializer()
+                return serializer.to_dicts(serializer.select_from(TestResult.query).order_by(TestResult.id).all())
+
+            def template_orm():
+                query = PromptTemplate.query.options(joinedload(PromptTemplate.category))
+                return [template.to_dict() for template in query.order_by(PromptTemplate.id)]
+
+            def template_columns():
+                serializer = TemplateRowSerializer()
+                return serializer.to_dicts(
+                    PromptTemplate.query.with_entities(*serializer.columns).order_by(PromptTemplate.id).all())
+
+            print(f"Best of {repeat}, query + serialize + encode")
+            cases = [
+                ('Prompt', prompt_count, prompt_orm, prompt_columns),
+                ('TestResult', test_count, test_orm, test_columns),
+                ('PromptTemplate', template_count, template_orm, template_columns),
+            ]
+            for label, count, orm, columns in cases:
+                def run(load, provider):
+                    body = provider.dumps(load())
+                    # Expire instances so each run loads fresh rows, as a request would
+                    db.session.expunge_all()
+                    return body
+
+                baseline, body = timed(lambda: run(orm, stdlib_json), repeat)
+                orm_fast, _ = timed(lambda: run(orm, fast_json), repeat)
+                current, fast_body = timed(lambda: run(columns, fast_json), repeat)
+                if stdlib_json.loads(body) != stdlib_json.loads(fast_body):
+                    raise SystemExit(f"{label}: column serializer output differs from to_dict()")
+                print(f"   {label + ':':16} {count:7,} rows   to_dict+json {baseline * 1000:8.1f} ms"
+                      f"   to_dict+orjson {orm_fast * 1000:8.1f} ms   columns+orjson {current * 1000:8.1f} ms"
+                      f"   ({baseline / current:4.1f}x)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=5000)
+    parser.add_argument('--tests', type=int, default=20000)
+    parser.add_argument('--templates', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.prompts, args.tests, args.templates, args.repeat)
@@ -0,0 +1,62 @@
+"""
+Microbenchmark for shortcut trigger matching
+Compares the suffix trie used by POST /api/shortcuts/test with the previous
+linear `text.endswith(trigger)` scan over all active shortcuts
+
+Usage: python database/benchmark_shortcuts.py [--shortcuts 10000] [--texts 2000]
+"""
+
+import sys
+import os
+import argparse
+import random
+import string
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.shortcut_matcher import SuffixTrie
+
+def random_trigger(rng):
+    return rng.choice(':/;') + ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+
+def linear_match(shortcuts, text):
+    for trigger, value in shortcuts:
+        if text.endswith(trigger):
+            return value
+    return None
+
+def benchmark(shortcut_count, text_count):
+    rng = random.Random(42)
+    triggers = list({random_trigger(rng) for _ in range(shortcut_count)})
+    shortcuts = [(trigger, {'trigger': trigger}) for trigger in triggers]
+
+    # Half the texts end in a trigger, half in ordinary typing
+    texts = []
+    for i in range(text_count):
+        prefix = ' '.join(rng.choices(['hello', 'prompt', 'draft', 'the'], k=20))
+        texts.append(prefix + ' ' + (rng.choice(triggers) if i % 2 else 'words'))
+
+    started = time.perf_counter()
+    trie = SuffixTrie(shortcuts)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    linear_hits = sum(linear_match(shortcuts, text) is not None for text in texts)
+    linear_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    trie_hits = sum(trie.longest_suffix(text) is not None for text in texts)
+    trie_time = time.perf_counter() - started
+
+    print(f"{len(triggers)} shortcuts, {text_count} texts ({trie_hits} matches, linear found {linear_hits})")
+    print(f"   Trie build:   {build_time * 1000:9.2f} ms (once per change)")
+    print(f"   Linear scan:  {linear_time / text_count * 1e6:9.2f} µs per text")
+    print(f"   Suffix trie:  {trie_time / text_count * 1e6:9.2f} µs per text")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shortcuts', type=int, default=10000)
+    parser.add_argument('--texts', type=int, default=2000)
+    args = parser.parse_args()
+    benchmark(args.shortcuts, args.texts)
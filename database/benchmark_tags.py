@@ -0,0 +1,85 @@
+"""
+Benchmark for tag filtering
+Fills a scratch SQLite database with tagged prompts (100k by default) and
+compares the prompt_tags index lookups behind ``?tags=`` with the previous
+substring LIKE over a JSON tags column, including how many rows the LIKE
+matched by accident (e.g. "ai" inside "email")
+
+Usage: python database/benchmark_tags.py [--prompts 100000] [--vocabulary 500] [--repeat 20]
+"""
+
+import os
+import argparse
+import json
+import random
+import tempfile
+
+from benchmarking import load_app, timed
+
+INSERT_CHUNK = 10000
+TAGS_PER_PROMPT = (0, 5)
+
+def benchmark(prompt_count, vocabulary_size, repeat):
+    with tempfile.TemporaryDirectory() as scratch:
+        app = load_app(os.path.join(scratch, 'benchmark.db'))
+
+        from sqlalchemy import text
+        from src.models.user import db
+        from src.models.prompt import Prompt, Tag, PromptTag
+        from src.services.tags import tag_filter
+
+        # 'ai' is a substring of 'email', as in real tag sets
+        vocabulary = ['ai', 'email'] + [f'topic-{i}' for i in range(vocabulary_size - 2)]
+        weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+
+        with app.app_context():
+            db.session.execute(db.insert(Tag), [{'name': name} for name in vocabulary])
+            tag_ids = {name: tag_id for tag_id, name in db.session.execute(db.select(Tag.id, Tag.name))}
+            # The old JSON column, on the prompts table the LIKE used to scan
+            db.session.execute(text("ALTER TABLE prompts ADD COLUMN legacy_tags TEXT"))
+            content = 'Benchmark prompt body. ' * 40
+
+            for start in range(0, prompt_count, INSERT_CHUNK):
+                ids = range(start + 1, min(start + INSERT_CHUNK, prompt_count) + 1)
+                tag_lists = {i: list(dict.fromkeys(random.choices(vocabulary, weights, k=random.randint(*TAGS_PER_PROMPT)))) for i in ids}
+                db.session.execute(text(
+                    "INSERT INTO prompts (id, title, content, is_head, delta_depth, legacy_tags) VALUES (:id, :title, :content, 1, 0, :tags)"
+                ), [
+                    {'id': i, 'title': f'Prompt {i}', 'content': f'{content}{i}', 'tags': json.dumps(tag_lists[i])} for i in ids
+                ])
+                db.session.execute(db.insert(PromptTag), [
+                    {'prompt_id': i, 'tag_id': tag_ids[name], 'position': position}
+                    for i, names in tag_lists.items() for position, name in enumerate(names)
+                ])
+            db.session.commit()
+
+            def like_query(names, match_all, columns='id'):
+                clauses = [f"legacy_tags LIKE :t{n}" for n in range(len(names))]
+                sql = f"SELECT {columns} FROM prompts WHERE {(' AND ' if match_all else ' OR ').join(clauses)}"
+                return db.session.execute(text(sql), {f't{n}': f'%{name}%' for n, name in enumerate(names)})
+
+            def index_query(names, match_all, column=Prompt.id):
+                return db.session.execute(db.select(column).where(tag_filter(names, match_all)))
+
+            print(f"{prompt_count:,} prompts, {vocabulary_size} tags (best of {repeat})")
+            cases = [
+                ('ai', ['ai'], True),
+                ('ai AND topic-3', ['ai', 'topic-3'], True),
+                ('topic-40 OR topic-41', ['topic-40', 'topic-41'], False),
+            ]
+            for label, names, match_all in cases:
+                like_ids = set(like_query(names, match_all).scalars())
+                index_ids = set(index_query(names, match_all).scalars())
+                # Timed as COUNTs so fetching rows into Python does not dominate
+                like_time, _ = timed(lambda: like_query(names, match_all, 'count(*)').scalar(), repeat)
+                index_time, _ = timed(lambda: index_query(names, match_all, db.func.count()).scalar(), repeat)
+                print(f"   {label + ':':22} LIKE {like_time * 1000:7.2f} ms ({len(like_ids):6,} rows, {len(like_ids - index_ids):5,} false)"
+                      f"   prompt_tags {index_time * 1000:7.2f} ms ({len(index_ids):6,} rows)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=100000)
+    parser.add_argument('--vocabulary', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.prompts, args.vocabulary, args.repeat)
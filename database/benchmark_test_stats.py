@@ -0,0 +1,98 @@
+"""
+Benchmark for test result statistics
+Fills a scratch SQLite database with test results (1M by default) and
+compares the SQL aggregates behind the session analysis / prompt stats
+routes with the previous approach of loading every row into Python
+
+Usage: python database/benchmark_test_stats.py [--rows 1000000] [--sessions 10] [--prompts 50]
+"""
+
+import os
+import argparse
+import random
+import tempfile
+from datetime import datetime
+
+from benchmarking import load_app, timed
+
+INSERT_CHUNK = 10000
+
+def python_session_stats(TestResult, session_id):
+    """The previous analyze_test_session loop"""
+    tests = TestResult.query.filter_by(test_session_id=session_id).all()
+    total_tests = len(tests)
+    return {
+        'avg_response_time': sum(t.response_time for t in tests if t.response_time) / total_tests,
+        'total_cost': sum(t.cost for t in tests if t.cost),
+        'models_tested': list(set(t.model_name for t in tests)),
+    }
+
+def python_prompt_stats(TestResult, prompt_id):
+    """The previous get_prompt_test_stats loop"""
+    model_stats = {}
+    for test in TestResult.query.filter_by(prompt_id=prompt_id).all():
+        stats = model_stats.setdefault(test.model_name, {'count': 0, 'response_time': 0, 'cost': 0})
+        stats['count'] += 1
+        stats['response_time'] += test.response_time or 0
+        stats['cost'] += test.cost or 0
+    return model_stats
+
+def benchmark(row_count, session_count, prompt_count):
+    with tempfile.TemporaryDirectory() as scratch:
+        app = load_app(os.path.join(scratch, 'benchmark.db'))
+
+        from src.models.user import db
+        from src.models.prompt import Prompt, TestResult
+        from src.services.test_stats import test_stats
+
+        with app.app_context():
+            db.session.execute(db.insert(Prompt), [
+                {'title': f'Prompt {i}', 'content': f'Benchmark prompt {i}'} for i in range(prompt_count)
+            ])
+            response = 'Model output. ' * 15
+            now = datetime.utcnow()
+            table = TestResult.__table__
+            for start in range(0, row_count, INSERT_CHUNK):
+                db.session.execute(table.insert(), [
+                    {
+                        'prompt_id': random.randint(1, prompt_count),
+                        'model_name': random.choice(('model-a', 'model-b', 'model-c')),
+                        'model_response': response,
+                        'response_time': random.lognormvariate(0, 0.5),
+                        'token_count_input': random.randint(50, 500),
+                        'token_count_output': random.randint(50, 500),
+                        'cost': random.random() / 100,
+                        'user_rating': random.choice((None, None, 3, 4, 5)),
+                        'test_session_id': f'session-{random.randint(1, session_count)}',
+                        'test_type': 'automated',
+                        'created_at': now
+                    }
+                    for _ in range(min(INSERT_CHUNK, row_count - start))
+                ])
+            db.session.commit()
+
+            session_filter = TestResult.test_session_id == 'session-1'
+            session_rows = db.session.query(TestResult.id).filter(session_filter).count()
+            prompt_rows = db.session.query(TestResult.id).filter(TestResult.prompt_id == 1).count()
+
+            print(f"{row_count:,} test results; session: {session_rows:,} rows, prompt: {prompt_rows:,} rows")
+            cases = [
+                ('Session analysis', lambda: python_session_stats(TestResult, 'session-1'),
+                 lambda: test_stats(session_filter)),
+                ('Prompt stats', lambda: python_prompt_stats(TestResult, 1),
+                 lambda: test_stats(TestResult.prompt_id == 1)),
+            ]
+            for name, python_fn, sql_fn in cases:
+                db.session.expunge_all()
+                python_time, _ = timed(python_fn)
+                db.session.expunge_all()
+                sql_time, _ = timed(sql_fn)
+                print(f"   {name + ':':18} Python loop {python_time * 1000:9.1f} ms   SQL aggregates {sql_time * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--prompts', type=int, default=50)
+    args = parser.parse_args()
+    benchmark(args.rows, args.sessions, args.prompts)
@@ -0,0 +1,39 @@
+"""
+Shared helpers for the benchmark and load test scripts in this folder
+Scripts run as ``python database/<script>.py``, so this folder is on the
+import path and they use ``from benchmarking import load_app, timed``
+"""
+
+import sys
+import os
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_app(database_path, **environ):
+    """
+    Import the Flask app bound to a scratch SQLite database; keyword
+    arguments set further environment variables (e.g. DB_ENGINE_PROFILE)
+    """
+    os.environ['DATABASE_URI'] = f"sqlite:///{database_path}"
+    os.environ['FLASK_DEBUG'] = 'False'
+    os.environ.update(environ)
+    sys.path.insert(0, PROJECT_DIR)
+
+    # Keep the app's startup messages out of the report
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        from main import app
+    finally:
+        sys.stdout = stdout
+    return app
+
+def timed(fn, repeat=1):
+    """Best wall time of ``repeat`` calls to ``fn``, and the last call's result"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
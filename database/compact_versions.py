@@ -0,0 +1,102 @@
+"""
+Script to compact prompt version history into deltas
+Run this once on databases created before delta storage to convert older
+versions, and again whenever you want to reclaim space (e.g. after imports);
+it also drops message blobs no test result uses any more
+
+Usage: python database/compact_versions.py [--vacuum]
+"""
+
+import sys
+import os
+import time
+
+# Add parent directory to path to import the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from src.models.user import db
+from src.models.prompt import Prompt
+from src.services.deltas import content_cache
+from src.services.blobs import prune_blobs
+from sqlalchemy import func, text
+
+BATCH_SIZE = 500
+
+def stored_content_bytes():
+    """Bytes of prompt content actually stored (full texts plus deltas)"""
+    return db.session.query(
+        func.coalesce(func.sum(func.length(Prompt.content)), 0) +
+        func.coalesce(func.sum(func.length(Prompt.content_delta)), 0)
+    ).scalar()
+
+def database_file_bytes():
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    page_count = db.session.execute(text('PRAGMA page_count')).scalar()
+    page_size = db.session.execute(text('PRAGMA page_size')).scalar()
+    return page_count * page_size
+
+def time_version_reads(prompt_ids):
+    """Seconds to rebuild the content of the given versions from a cold cache"""
+    content_cache.clear()
+    db.session.expunge_all()
+    started = time.perf_counter()
+    for prompt_id in prompt_ids:
+        db.session.get(Prompt, prompt_id).get_content()
+    return time.perf_counter() - started
+
+def compact_versions(vacuum=False):
+    """Store every non-HEAD version stored in full as a delta against its parent"""
+    with app.app_context():
+        print("Starting to compact prompt versions...")
+
+        pruned = prune_blobs()
+        db.session.commit()
+        if pruned:
+            print(f"  ✓ Removed {pruned} unused message blobs")
+
+        candidate_ids = [
+            prompt_id for (prompt_id,) in db.session.query(Prompt.id).filter(
+                Prompt.is_head.is_(False),
+                Prompt.parent_id.isnot(None),
+                Prompt.content_delta.is_(None)
+            ).order_by(Prompt.id)
+        ]
+        if not candidate_ids:
+            print("Nothing to compact.")
+            return
+
+        content_before = stored_content_bytes()
+        file_before = database_file_bytes()
+        read_before = time_version_reads(candidate_ids)
+
+        compacted = 0
+        # Ascending ids visit parents before their children, keeping delta depths exact
+        for start in range(0, len(candidate_ids), BATCH_SIZE):
+            batch = candidate_ids[start:start + BATCH_SIZE]
+            for prompt in Prompt.query.filter(Prompt.id.in_(batch)).order_by(Prompt.id):
+                if prompt.store_as_delta():
+                    compacted += 1
+            db.session.commit()
+            print(f"  ✓ Processed {min(start + BATCH_SIZE, len(candidate_ids))}/{len(candidate_ids)} versions")
+
+        if vacuum and db.engine.dialect.name == 'sqlite':
+            db.session.commit()
+            with db.engine.connect() as conn:
+                conn.execute(text('VACUUM'))
+
+        content_after = stored_content_bytes()
+        file_after = database_file_bytes()
+        read_after = time_version_reads(candidate_ids)
+
+        print(f"\n✨ Compaction complete!")
+        print(f"   Versions stored as deltas: {compacted} of {len(candidate_ids)}")
+        print(f"   Stored content: {content_before:,} → {content_after:,} bytes")
+        if file_before is not None:
+            print(f"   Database file: {file_before:,} → {file_after:,} bytes"
+                  + ("" if vacuum else " (run with --vacuum to release free pages)"))
+        print(f"   Cold read of all versions: {read_before * 1000:.1f} → {read_after * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    compact_versions(vacuum='--vacuum' in sys.argv[1:])
@@ -0,0 +1,69 @@
+"""
+Script to precompress the frontend build
+Writes a .gz (and, with the brotli package installed, a .br) sibling next to
+every compressible file in static/ so the server can send them without
+compressing per request. Run it after `npm run build`; files whose siblings
+are already up to date are skipped
+
+Usage: python database/compress_static.py [static-dir] [--min-size 1024]
+"""
+
+import sys
+import os
+import argparse
+import gzip
+import mimetypes
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from src.services.compression import brotli, is_compressible, PRECOMPRESSED_SUFFIXES
+
+def compress_file(path, encoding):
+    with open(path, 'rb') as source:
+        data = source.read()
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=11)
+    else:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) >= len(data):
+        return None
+    with open(path + PRECOMPRESSED_SUFFIXES[encoding], 'wb') as target:
+        target.write(compressed)
+    return len(compressed)
+
+def run(static_dir, min_size):
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    if brotli is None:
+        print("brotli is not installed; writing .gz files only")
+
+    suffixes = tuple(PRECOMPRESSED_SUFFIXES.values())
+    files = written = original_bytes = compressed_bytes = 0
+    for directory, _, names in os.walk(static_dir):
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.endswith(suffixes) or not is_compressible(mimetypes.guess_type(name)[0]):
+                continue
+            size = os.path.getsize(path)
+            if size < min_size:
+                continue
+            files += 1
+            for encoding in encodings:
+                sibling = path + PRECOMPRESSED_SUFFIXES[encoding]
+                if os.path.exists(sibling) and os.path.getmtime(sibling) >= os.path.getmtime(path):
+                    continue
+                compressed = compress_file(path, encoding)
+                if compressed is not None:
+                    written += 1
+                    original_bytes += size
+                    compressed_bytes += compressed
+
+    print(f"✨ {files} compressible files, {written} siblings written "
+          f"({original_bytes:,} -> {compressed_bytes:,} bytes)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('static_dir', nargs='?', default=os.path.join(PROJECT_DIR, 'static'))
+    parser.add_argument('--min-size', type=int, default=1024)
+    args = parser.parse_args()
+    run(args.static_dir, args.min_size)
@@ -0,0 +1,72 @@
+"""
+Script to bulk import prompts from files
+Accepts NDJSON/JSONL files (including /api/export output), CSV files with a
+header row, and folders of Markdown files (front matter is optional; the
+sub-folder name becomes the category)
+
+Usage: python database/import_prompts.py PATH [PATH ...] [--no-dedupe] [--no-create-categories]
+"""
+
+import sys
+import os
+import gzip
+
+# Add parent directory to path to import the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from src.services.ingest import iter_ndjson, iter_csv, iter_markdown_folder
+from src.services.importer import PromptImporter
+
+def iter_path(path):
+    """Records from one file or folder, chosen by its extension"""
+    if os.path.isdir(path):
+        yield from iter_markdown_folder(path)
+        return
+    name = path.lower()
+    opener = gzip.open if name.endswith('.gz') else open
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        reader = iter_ndjson
+    elif name.endswith('.csv'):
+        reader = iter_csv
+    else:
+        raise SystemExit(f"Don't know how to import {path} (expected .ndjson, .jsonl, .csv or a folder)")
+    with opener(path, 'rb') as f:
+        yield from reader(f)
+
+def import_prompts(paths, dedupe=True, create_categories=True):
+    with app.app_context():
+        print("Starting to import prompts...")
+        importer = PromptImporter(dedupe=dedupe, create_categories=create_categories)
+
+        for path in paths:
+            before = importer.imported + len(importer.pending)
+            for number, record, error in iter_path(path):
+                importer.add(f'{path}:{number}', record, error)
+            print(f"  ✓ Read {path} ({importer.imported + len(importer.pending) - before} new prompts)")
+
+        summary = importer.finish()
+
+        print(f"\n✨ Import complete!")
+        print(f"   Imported: {summary['imported']}")
+        print(f"   Duplicates skipped: {summary['duplicates']}")
+        print(f"   Other records skipped: {summary['skipped']}")
+        print(f"   Categories created: {summary['categories_created']}")
+        print(f"   Rejected: {summary['rejected_count']}")
+        for reject in summary['rejected']:
+            print(f"     record {reject['record']}: {reject['error']}")
+        print(f"   Time: {summary['elapsed_seconds']:.2f}s ({summary['rows_per_second'] or 0:,.0f} prompts/s)")
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    paths = [arg for arg in args if not arg.startswith('--')]
+    if not paths:
+        print(__doc__)
+        sys.exit(1)
+    import_prompts(
+        paths,
+        dedupe='--no-dedupe' not in args,
+        create_categories='--no-create-categories' not in args
+    )
@@ -0,0 +1,93 @@
+"""
+Concurrent read/write load test for the database engine profiles
+Runs several worker processes (like gunicorn workers) against a scratch
+SQLite database, once per engine profile, and reports throughput
+
+Writers create prompts, so every writer request commits a write
+transaction and contends with the other workers for the SQLite write lock
+(opening a prompt would not: its use is only recorded in the worker's
+write-behind usage buffer).
+
+Usage: python database/load_test.py [--seconds 10] [--readers 4] [--writers 2]
+"""
+
+import os
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+
+from benchmarking import load_app
+
+SEED_PROMPTS = 500
+
+def seed(database_path, profile):
+    client = load_app(database_path, DB_ENGINE_PROFILE=profile).test_client()
+    for i in range(SEED_PROMPTS):
+        client.post('/api/prompts', json={
+            'title': f'Load test prompt {i}',
+            'content': f'Prompt body {i} ' * 50,
+            'tags': ['load-test']
+        })
+
+def worker(database_path, profile, role, seconds, results):
+    client = load_app(database_path, DB_ENGINE_PROFILE=profile).test_client()
+    ops = errors = 0
+    deadline = time.perf_counter() + seconds
+
+    while time.perf_counter() < deadline:
+        prompt_id = random.randint(1, SEED_PROMPTS)
+        if role == 'reader':
+            response = client.get('/api/prompts?limit=50&fields=id,title,updated_at')
+        else:
+            response = client.post('/api/prompts', json={
+                'title': f'Written by {os.getpid()} #{ops + errors}',
+                'content': f'Prompt body {prompt_id} ' * 50,
+                'tags': ['load-test']
+            })
+        if response.status_code in (200, 201):
+            ops += 1
+        else:
+            errors += 1
+
+    results.put((role, ops, errors))
+
+def run_profile(profile, seconds, readers, writers):
+    with tempfile.TemporaryDirectory() as scratch:
+        database_path = os.path.join(scratch, 'load_test.db')
+
+        process = multiprocessing.Process(target=seed, args=(database_path, profile))
+        process.start()
+        process.join()
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(database_path, profile, role, seconds, results))
+            for role in ['reader'] * readers + ['writer'] * writers
+        ]
+        for process in processes:
+            process.start()
+        totals = {'reader': [0, 0], 'writer': [0, 0]}
+        for _ in processes:
+            role, ops, errors = results.get()
+            totals[role][0] += ops
+            totals[role][1] += errors
+        for process in processes:
+            process.join()
+
+    print(f"\n{profile} profile:")
+    for role, (ops, errors) in totals.items():
+        print(f"   {role}s: {ops / seconds:8.1f} req/s   errors: {errors}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method('spawn')
+    print(f"Load testing with {args.readers} readers and {args.writers} writers for {args.seconds:g}s each...")
+    for profile in ('default', 'tuned'):
+        run_profile(profile, args.seconds, args.readers, args.writers)
@@ -0,0 +1,28 @@
+"""
+Script to refresh the daily analytics rollups
+The analytics routes refresh missing days on demand; run this from cron
+shortly after midnight UTC to keep that work off the first dashboard load,
+or with --rebuild to recompute every day from the raw tables
+
+Usage: python database/refresh_rollups.py [--rebuild]
+"""
+
+import sys
+import os
+import time
+
+# Add parent directory to path to import the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from src.services.rollups import refresh_rollups
+
+def run(rebuild=False):
+    with app.app_context():
+        started = time.perf_counter()
+        days = refresh_rollups(rebuild=rebuild)
+        elapsed = time.perf_counter() - started
+        print(f"✨ Rolled up {days} days in {elapsed * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    run(rebuild='--rebuild' in sys.argv[1:])
@@ -121,27 +121,32 @@ def seed_shortcuts():
         added_count = 0
         skipped_count = 0
         
+        # Look up every example trigger in one query instead of one per shortcut
+        triggers = [shortcut_data['trigger'] for shortcut_data in EXAMPLE_SHORTCUTS]
+        existing_triggers = set(db.session.scalars(
+            db.select(Shortcut.trigger).where(Shortcut.trigger.in_(triggers))
+        ))
+        
+        new_shortcuts = []
         for shortcut_data in EXAMPLE_SHORTCUTS:
-            # Check if trigger already exists
-            existing = Shortcut.query.filter_by(trigger=shortcut_data['trigger']).first()
-            
-            if existing:
+            if shortcut_data['trigger'] in existing_triggers:
                 print(f"  ⚠ Skipping '{shortcut_data['trigger']}' - already exists")
                 skipped_count += 1
                 continue
             
-            # Create new shortcut
-            shortcut = Shortcut(
-                trigger=shortcut_data['trigger'],
-                expansion=shortcut_data['expansion'],
-                description=shortcut_data['description'],
-                is_active=shortcut_data['is_active']
-            )
-            
-            db.session.add(shortcut)
+            new_shortcuts.append({
+                'trigger': shortcut_data['trigger'],
+                'expansion': shortcut_data['expansion'],
+                'description': shortcut_data['description'],
+                'is_active': shortcut_data['is_active']
+            })
             print(f"  ✓ Added '{shortcut_data['trigger']}' -> '{shortcut_data['expansion'][:30]}...'")
             added_count += 1
         
+        # Insert all new shortcuts in one executemany()
+        if new_shortcuts:
+            db.session.execute(db.insert(Shortcut), new_shortcuts)
+        
         # Commit all changes
         db.session.commit()
         
@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 from dotenv import load_dotenv
 
@@ -7,7 +8,7 @@ load_dotenv()
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from src.models.user import db
 from src.models.prompt import Category, Prompt, TestResult, PromptTemplate, Shortcut
@@ -18,9 +19,19 @@ from src.routes.test import test_bp
 from src.routes.template import template_bp
 from src.routes.shortcut import shortcut_bp
 from src.routes.analytics import analytics_bp
+from src.routes.transfer import transfer_bp
+from src.routes.changes import changes_bp
+from src.services.db_engine import engine_options, install_sqlite_pragmas
+from src.services.json_provider import FastJSONProvider
+from src.services.http_cache import init_table_versions
+from src.services.compression import init_compression, send_precompressed
+from src.services.migrations import run_migrations
+from src.services.search import init_search_index
+from src.services.usage import usage_buffer
 
 # Initialize Flask app
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+app.json = FastJSONProvider(app)
 
 # Configuration from environment variables
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -41,12 +52,22 @@ if not database_uri or database_uri.startswith('sqlite:///database/'):
 
 app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_uri)
 app.config['SQLALCHEMY_ECHO'] = os.getenv('ENABLE_SQL_LOGGING', 'False').lower() == 'true'
 
+# Seconds browsers may reuse built static assets before revalidating; index.html is always revalidated
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '3600'))
+# Vite names built assets after a hash of their content (assets/index-BfX3k2aQ.js), so they never change
+HASHED_ASSET = re.compile(r'(^|/)assets/[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+HASHED_ASSET_MAX_AGE = 365 * 24 * 3600
+
 # CORS configuration
 cors_origins = os.getenv('CORS_ORIGINS', 'http://localhost:5173,http://localhost:5002')
 CORS(app, resources={r"/api/*": {"origins": cors_origins.split(',')}})
 
+# Compress API responses for clients that accept it
+init_compression(app)
+
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(prompt_bp, url_prefix='/api')
@@ -55,12 +76,21 @@ app.register_blueprint(test_bp, url_prefix='/api')
 app.register_blueprint(template_bp, url_prefix='/api')
 app.register_blueprint(shortcut_bp, url_prefix='/api')
 app.register_blueprint(analytics_bp, url_prefix='/api')
+app.register_blueprint(transfer_bp, url_prefix='/api')
+app.register_blueprint(changes_bp, url_prefix='/api')
 
 # Initialize database
 db.init_app(app)
 with app.app_context():
+    install_sqlite_pragmas(db.engine)
     db.create_all()
+    for migration in run_migrations():
+        print(f"✓ Applied migration: {migration}")
     print("✓ Database initialized successfully")
+    if init_search_index():
+        print("✓ Full-text search index ready")
+    init_table_versions()
+    usage_buffer.init_app(app)
 
 # Serve React app (for production builds)
 @app.route('/', defaults={'path': ''})
@@ -72,11 +102,18 @@ def serve(path):
         return "Static folder not configured", 404
 
     if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
+        if HASHED_ASSET.search(path):
+            response = send_precompressed(static_folder_path, path, max_age=HASHED_ASSET_MAX_AGE)
+            response.cache_control.immutable = True
+            return response
+        return send_precompressed(static_folder_path, path, max_age=STATIC_MAX_AGE)
     else:
         index_path = os.path.join(static_folder_path, 'index.html')
         if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+            # The entry point names the current asset bundles, so it must never go stale
+            response = send_precompressed(static_folder_path, 'index.html')
+            response.cache_control.no_cache = True
+            return response
         else:
             # In development, show helpful message
             if app.config['DEBUG']:
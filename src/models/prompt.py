@@ -1,7 +1,27 @@
 from .user import db
+from ..services.deltas import MAX_DELTA_CHAIN, make_delta, apply_delta, worth_storing, content_cache
+from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime
+import hashlib
 import json
 
+def normalize_tags(tags_list):
+    """Stripped, non-empty tag names without repeats, in their original order"""
+    names = []
+    for tag in tags_list or []:
+        name = str(tag).strip()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def content_hash(content):
+    """Hex SHA-256 of a text, the key for content-addressed storage"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def _prompt_content_hash(context):
+    # Prompt content never changes after insert (edits create new versions)
+    return content_hash(context.get_current_parameters()['content'])
+
 class Category(db.Model):
     __tablename__ = 'categories'
     id = db.Column(db.Integer, primary_key=True)
@@ -18,11 +38,23 @@ class Category(db.Model):
             'description': self.description,
             'color': self.color,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'prompt_count': len(self.prompts)
+            'prompt_count': self.prompt_count
         }
 
 class Prompt(db.Model):
     __tablename__ = 'prompts'
+    __table_args__ = (
+        # HEAD listing: WHERE is_head [AND category_id] ORDER BY last_used, updated_at
+        db.Index('ix_prompts_head_recent', 'is_head', 'last_used', 'updated_at'),
+        db.Index('ix_prompts_category_head_recent', 'category_id', 'is_head', 'last_used', 'updated_at'),
+        db.Index('ix_prompts_parent_id', 'parent_id'),
+        db.Index('ix_prompts_created_at', 'created_at'),
+        db.Index('ix_prompts_updated_at', 'updated_at'),
+        db.Index('ix_prompts_last_used', 'last_used'),
+        db.Index('ix_prompts_use_count', 'use_count'),
+        db.Index('ix_prompts_is_favorite', 'is_favorite'),
+        db.Index('ix_prompts_content_hash', 'content_hash'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -32,55 +64,175 @@ class Prompt(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
     is_favorite = db.Column(db.Boolean, default=False)
     is_template = db.Column(db.Boolean, default=False)
-    tags = db.Column(db.Text) # Stored as a JSON string
     version = db.Column(db.String(20), default='1.0.0')
     version_message = db.Column(db.String(500))
     parent_id = db.Column(db.Integer, db.ForeignKey('prompts.id'))
     versions = db.relationship('Prompt', backref=db.backref('parent', remote_side=[id]), lazy='dynamic')
+    is_head = db.Column(db.Boolean, default=True, nullable=False) # False once the prompt has a child version
+    root_id = db.Column(db.Integer, index=True) # First prompt of the version chain; NULL for the root itself
+    content_delta = db.Column(db.Text) # Delta against the parent's content; when set, `content` is empty
+    delta_depth = db.Column(db.Integer, default=0, nullable=False) # Deltas to apply from the nearest full snapshot
+    content_hash = db.Column(db.String(64), default=_prompt_content_hash) # content_hash() of the full content
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_used = db.Column(db.DateTime)
     use_count = db.Column(db.Integer, default=0)
     original_creation_date = db.Column(db.DateTime)
 
+    @property
+    def chain_root_id(self):
+        return self.root_id or self.id
+
+    def _content_cache_key(self):
+        return (self.id, self.created_at)
+
+    def get_content(self):
+        """Full content, rebuilt from the parent version when stored as a delta"""
+        if self.content_delta is None:
+            return self.content
+
+        key = self._content_cache_key()
+        content = content_cache.get(key)
+        if content is None:
+            if self.parent is None:
+                raise ValueError(f'Prompt {self.id} is stored as a delta but its parent is missing')
+            content = apply_delta(self.parent.get_content(), self.content_delta)
+            content_cache.put(key, content)
+        return content
+
+    def store_as_delta(self):
+        """
+        Replace the stored content with a delta against the parent version.
+
+        Versions stay in full when they have no parent, would extend a delta
+        chain past MAX_DELTA_CHAIN (a periodic snapshot) or barely shrink.
+        """
+        parent = self.parent
+        if self.content_delta is not None or parent is None:
+            return False
+        if parent.delta_depth >= MAX_DELTA_CHAIN:
+            return False
+
+        delta = make_delta(parent.get_content(), self.content)
+        if not worth_storing(delta, self.content):
+            return False
+
+        content_cache.put(self._content_cache_key(), self.content)
+        self.content = ''
+        self.content_delta = delta
+        self.delta_depth = parent.delta_depth + 1
+        flag_modified(self, 'updated_at')  # storage change, not an edit
+        return True
+
+    def store_full_content(self):
+        """Store the full content again, e.g. before the delta's base version goes away"""
+        if self.content_delta is None:
+            return False
+
+        self.content = self.get_content()
+        self.content_delta = None
+        self.delta_depth = 0
+        flag_modified(self, 'updated_at')
+        return True
+
     def set_tags(self, tags_list):
-        self.tags = json.dumps(tags_list)
+        tags = Tag.for_names(normalize_tags(tags_list))
+        self.tag_links = [PromptTag(tag=tag, position=position) for position, tag in enumerate(tags)]
 
     def get_tags(self):
-        return json.loads(self.tags) if self.tags else []
+        return [link.tag.name for link in self.tag_links]
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'content': self.content,
-            'description': self.description,
-            'author': self.author,
-            'source': self.source,
-            'category_id': self.category_id,
-            'is_favorite': self.is_favorite,
-            'is_template': self.is_template,
-            'tags': self.get_tags(),
-            'version': self.version,
-            'version_message': self.version_message,
-            'parent_id': self.parent_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'last_used': self.last_used.isoformat() if self.last_used else None,
-            'use_count': self.use_count,
-            'original_creation_date': self.original_creation_date.isoformat() if self.original_creation_date else None,
-            'category': self.category.to_dict() if self.category else None
-        }
+    # Keys returned by to_dict(), in response order
+    SERIALIZABLE_FIELDS = (
+        'id', 'title', 'content', 'description', 'author', 'source',
+        'category_id', 'is_favorite', 'is_template', 'tags', 'version',
+        'version_message', 'parent_id', 'is_head', 'root_id', 'content_hash', 'created_at', 'updated_at',
+        'last_used', 'use_count', 'original_creation_date', 'category'
+    )
+
+    def _serialize_field(self, field):
+        if field == 'content':
+            return self.get_content()
+        if field == 'tags':
+            return self.get_tags()
+        if field == 'category':
+            return self.category.to_dict() if self.category else None
+        value = getattr(self, field)
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    def to_dict(self, fields=None):
+        """Serialize the prompt, optionally restricted to a subset of SERIALIZABLE_FIELDS"""
+        return {field: self._serialize_field(field) for field in (fields or self.SERIALIZABLE_FIELDS)}
+
+# Loaded with every Category row as a correlated COUNT, so serializing a
+# category never pulls its full prompt list
+Category.prompt_count = db.column_property(
+    db.select(db.func.count(Prompt.id))
+    .where(Prompt.category_id == Category.id)
+    .correlate_except(Prompt)
+    .scalar_subquery()
+)
+
+class Tag(db.Model):
+    __tablename__ = 'tags'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def for_names(cls, names):
+        """Tag rows for ``names`` in order, adding the missing ones to the session"""
+        found = {tag.name: tag for tag in cls.query.filter(cls.name.in_(names))} if names else {}
+        for name in names:
+            if name not in found:
+                found[name] = cls(name=name)
+                db.session.add(found[name])
+        return [found[name] for name in names]
+
+class PromptTag(db.Model):
+    """A prompt's tag, at its position in the prompt's tag list"""
+    __tablename__ = 'prompt_tags'
+    __table_args__ = (
+        # Tag filters look up prompt ids per tag from this index alone
+        db.Index('ix_prompt_tags_tag_prompt', 'tag_id', 'prompt_id'),
+    )
+    prompt_id = db.Column(db.Integer, db.ForeignKey('prompts.id', ondelete='CASCADE'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    tag = db.relationship(Tag, lazy='joined')
+
+# Load with selectinload(Prompt.tag_links) when serializing many prompts
+Prompt.tag_links = db.relationship(
+    PromptTag, order_by=PromptTag.position, cascade='all, delete-orphan'
+)
+
+class ContentBlob(db.Model):
+    """Text stored once and referenced by its content_hash()"""
+    __tablename__ = 'content_blobs'
+    hash = db.Column(db.String(64), primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    size = db.Column(db.Integer, nullable=False) # UTF-8 bytes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class TestResult(db.Model):
     __tablename__ = 'test_results'
+    __table_args__ = (
+        db.Index('ix_test_results_prompt_created', 'prompt_id', 'created_at'),
+        db.Index('ix_test_results_session_created', 'test_session_id', 'created_at'),
+        db.Index('ix_test_results_model_created', 'model_name', 'created_at'),
+        db.Index('ix_test_results_created_at', 'created_at'),
+        db.Index('ix_test_results_system_message_hash', 'system_message_hash'),
+        db.Index('ix_test_results_user_message_hash', 'user_message_hash'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     prompt_id = db.Column(db.Integer, db.ForeignKey('prompts.id'), nullable=False)
     model_name = db.Column(db.String(100))
     temperature = db.Column(db.Float)
     max_tokens = db.Column(db.Integer)
-    system_message = db.Column(db.Text)
+    system_message = db.Column(db.Text) # Legacy inline text; messages now live in content_blobs
     user_message = db.Column(db.Text)
+    system_message_hash = db.Column(db.String(64), db.ForeignKey('content_blobs.hash'))
+    user_message_hash = db.Column(db.String(64), db.ForeignKey('content_blobs.hash'))
     model_response = db.Column(db.Text)
     response_time = db.Column(db.Float)
     token_count_input = db.Column(db.Integer)
@@ -93,6 +245,14 @@ class TestResult(db.Model):
     test_session_id = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     prompt = db.relationship('Prompt', backref='test_results')
+    system_message_blob = db.relationship('ContentBlob', foreign_keys=[system_message_hash])
+    user_message_blob = db.relationship('ContentBlob', foreign_keys=[user_message_hash])
+
+    def get_system_message(self):
+        return self.system_message_blob.content if self.system_message_hash else self.system_message
+
+    def get_user_message(self):
+        return self.user_message_blob.content if self.user_message_hash else self.user_message
 
     def to_dict(self):
         return {
@@ -101,8 +261,8 @@ class TestResult(db.Model):
             'model_name': self.model_name,
             'temperature': self.temperature,
             'max_tokens': self.max_tokens,
-            'system_message': self.system_message,
-            'user_message': self.user_message,
+            'system_message': self.get_system_message(),
+            'user_message': self.get_user_message(),
             'model_response': self.model_response,
             'response_time': self.response_time,
             'token_count_input': self.token_count_input,
@@ -118,6 +278,10 @@ class TestResult(db.Model):
 
 class PromptTemplate(db.Model):
     __tablename__ = 'prompt_templates'
+    __table_args__ = (
+        db.Index('ix_prompt_templates_popular', 'use_count', 'updated_at'),
+        db.Index('ix_prompt_templates_category_id', 'category_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False, unique=True)
     content = db.Column(db.Text, nullable=False)
@@ -152,6 +316,9 @@ class PromptTemplate(db.Model):
 class Shortcut(db.Model):
     """Text expansion shortcuts (Espanso-style)"""
     __tablename__ = 'shortcuts'
+    __table_args__ = (
+        db.Index('ix_shortcuts_active_popular', 'is_active', 'use_count'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     trigger = db.Column(db.String(50), nullable=False, unique=True)
     expansion = db.Column(db.Text, nullable=False)
@@ -1,16 +1,82 @@
+import os
 from flask import Blueprint, request, jsonify
 from ..models.user import db
 from ..models.prompt import Prompt, Category, PromptTemplate, Shortcut, TestResult
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
+from ..services.usage import usage_buffer
+from ..services.rollups import ensure_rollups, collect_metrics, utc_today, daily_rollups, TEST_VALUE_METRICS, USAGE_METRICS
+from ..services.cache import WriteInvalidatedCache
+from ..services.timeseries import BucketSpec, time_series, BUCKET_SECONDS, SERIES_METRICS, USAGE_SERIES, MAX_BUCKETS, MAX_OFFSET_MINUTES
+from sqlalchemy import func, desc, or_, case
 
 analytics_bp = Blueprint('analytics', __name__)
 
-def get_date_range(days=30):
-    """Helper function to get date range for filtering"""
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
-    return start_date, end_date
+def get_day_range(days=30):
+    """The last ``days`` UTC calendar days, today included, as (first_day, today)"""
+    today = utc_today()
+    return today - timedelta(days=max(days, 1) - 1), today
+
+def metric_count(metrics, metric):
+    return sum(count for (day, name, dimension), (count, total) in metrics.items() if name == metric)
+
+# Overview figures per ``days`` and time series per bucket range; see WriteInvalidatedCache
+overview_cache = WriteInvalidatedCache(32, float(os.getenv('ANALYTICS_CACHE_TTL', '30')))
+series_cache = WriteInvalidatedCache(128, float(os.getenv('ANALYTICS_CACHE_TTL', '30')))
+
+def count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def overview_counts(days):
+    """
+    Library totals plus prompts created / uses in the period, in one statement.
+
+    Totals are scalar subqueries SQLite answers from the smallest covering
+    index; both period prompt counts come from one range scan of the
+    created_at index with conditional SUMs, and uses per period from the
+    daily rollups (written as the usage buffer flushes, so no refresh).
+    """
+    first_day, today = get_day_range(days)
+    prev_first_day = first_day - timedelta(days=max(days, 1))
+    period_start = datetime.combine(first_day, datetime.min.time())
+    prev_start = datetime.combine(prev_first_day, datetime.min.time())
+    period_end = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    
+    def total(model, *criteria):
+        return db.select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+    
+    def uses_of(model):
+        return db.select(func.coalesce(func.sum(model.use_count), 0)).scalar_subquery()
+    
+    totals = [
+        total(Prompt).label('total_prompts'),
+        total(Prompt, Prompt.is_favorite == True).label('total_favorites'),
+        uses_of(Prompt).label('total_prompt_uses'),
+        total(PromptTemplate).label('total_templates'),
+        uses_of(PromptTemplate).label('total_template_uses'),
+        total(Shortcut).label('total_shortcuts'),
+        uses_of(Shortcut).label('total_shortcut_uses'),
+        total(Category).label('total_categories'),
+        total(TestResult).label('total_tests'),
+    ]
+    
+    created = db.select(
+        count_where(Prompt.created_at >= period_start).label('prompts_in_period'),
+        count_where(Prompt.created_at < period_start).label('prompts_in_previous_period')
+    ).where(Prompt.created_at >= prev_start, Prompt.created_at < period_end).subquery()
+    
+    uses = db.select(*(
+        func.coalesce(func.sum(case((daily_rollups.c.metric == metric, daily_rollups.c.count), else_=0)), 0)
+        .label(f'{kind}_uses_in_period')
+        for kind, metric in USAGE_METRICS.items()
+    )).where(
+        daily_rollups.c.day >= first_day, daily_rollups.c.day <= today,
+        daily_rollups.c.metric.in_(list(USAGE_METRICS.values()))
+    ).subquery()
+    
+    row = db.session.execute(
+        db.select(*totals, *created.c, *uses.c).select_from(created.join(uses, db.true()))
+    ).one()
+    return {key: int(value) for key, value in row._mapping.items()}
 
 @analytics_bp.route('/analytics/overview', methods=['GET'])
 def get_overview():
@@ -18,57 +84,28 @@ def get_overview():
     try:
         # Get date range from query params (default 30 days)
         days = request.args.get('days', 30, type=int)
-        start_date, end_date = get_date_range(days)
-        
-        # Total counts
-        total_prompts = Prompt.query.count()
-        total_templates = PromptTemplate.query.count()
-        total_shortcuts = Shortcut.query.count()
-        total_categories = Category.query.count()
-        total_tests = TestResult.query.count()
-        
-        # Prompts in time range
-        prompts_in_range = Prompt.query.filter(
-            Prompt.created_at >= start_date,
-            Prompt.created_at <= end_date
-        ).count()
-        
-        # Previous period for comparison
-        prev_start = start_date - timedelta(days=days)
-        prev_prompts = Prompt.query.filter(
-            Prompt.created_at >= prev_start,
-            Prompt.created_at < start_date
-        ).count()
+        
+        # One query per cache miss; cached until this worker commits a write
+        overview = dict(overview_cache.get_or_compute(days, lambda: overview_counts(days)))
         
         # Calculate growth percentage
+        prompts_in_range = overview['prompts_in_period']
+        prev_prompts = overview.pop('prompts_in_previous_period')
         prompts_growth = 0
         if prev_prompts > 0:
             prompts_growth = ((prompts_in_range - prev_prompts) / prev_prompts) * 100
         elif prompts_in_range > 0:
             prompts_growth = 100
+        overview['prompts_growth'] = round(prompts_growth, 1)
         
-        # Usage statistics
-        total_prompt_uses = db.session.query(func.sum(Prompt.use_count)).scalar() or 0
-        total_template_uses = db.session.query(func.sum(PromptTemplate.use_count)).scalar() or 0
-        total_shortcut_uses = db.session.query(func.sum(Shortcut.use_count)).scalar() or 0
-        
-        # Favorites
-        total_favorites = Prompt.query.filter_by(is_favorite=True).count()
+        # Uses still waiting in the write-behind buffer; they all happened within the period
+        for kind in ('prompt', 'template', 'shortcut'):
+            pending = usage_buffer.pending_total(kind)
+            overview[f'total_{kind}_uses'] += pending
+            overview[f'{kind}_uses_in_period'] += pending
         
-        return jsonify({
-            'total_prompts': total_prompts,
-            'total_templates': total_templates,
-            'total_shortcuts': total_shortcuts,
-            'total_categories': total_categories,
-            'total_tests': total_tests,
-            'total_favorites': total_favorites,
-            'prompts_in_period': prompts_in_range,
-            'prompts_growth': round(prompts_growth, 1),
-            'total_prompt_uses': total_prompt_uses,
-            'total_template_uses': total_template_uses,
-            'total_shortcut_uses': total_shortcut_uses,
-            'period_days': days
-        })
+        overview['period_days'] = days
+        return jsonify(overview)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -77,32 +114,71 @@ def get_prompt_usage_over_time():
     """Get prompt creation and usage over time"""
     try:
         days = request.args.get('days', 30, type=int)
-        start_date, end_date = get_date_range(days)
+        first_day, today = get_day_range(days)
         
-        # Get prompts created per day
-        prompts_by_day = db.session.query(
-            func.date(Prompt.created_at).label('date'),
-            func.count(Prompt.id).label('count')
-        ).filter(
-            Prompt.created_at >= start_date,
-            Prompt.created_at <= end_date
-        ).group_by(func.date(Prompt.created_at)).all()
+        # Prompts created and uses per day, from the daily rollups
+        ensure_rollups()
+        metrics = collect_metrics(('prompts_created', 'prompt_uses'), first_day, today, per_day=True)
         
         # Format data for charts
-        usage_data = []
-        for date, count in prompts_by_day:
-            usage_data.append({
-                'date': date.strftime('%Y-%m-%d') if date else None,
-                'count': count
-            })
+        by_day = {}
+        for (day, metric, dimension), (count, total) in metrics.items():
+            entry = by_day.setdefault(day, {'date': day.isoformat(), 'count': 0, 'uses': 0})
+            entry['count' if metric == 'prompts_created' else 'uses'] += count
+        
+        # Uses still in the write-behind buffer happened today
+        pending_uses = usage_buffer.pending_total('prompt')
+        if pending_uses:
+            by_day.setdefault(today, {'date': today.isoformat(), 'count': 0, 'uses': 0})['uses'] += pending_uses
         
         # Sort by date
-        usage_data.sort(key=lambda x: x['date'])
+        usage_data = sorted(by_day.values(), key=lambda x: x['date'])
         
         return jsonify(usage_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@analytics_bp.route('/analytics/timeseries', methods=['GET'])
+def get_time_series():
+    """Get several metrics per hour/day/week bucket, empty buckets included"""
+    try:
+        days = request.args.get('days', 30, type=int)
+        bucket = request.args.get('bucket', 'day')
+        tz_offset = request.args.get('tz_offset', 0, type=int)
+        metrics = list(dict.fromkeys(m.strip() for m in request.args.get('metrics', 'creations,uses').split(',') if m.strip()))
+        
+        if bucket not in BUCKET_SECONDS:
+            return jsonify({'error': f"bucket must be one of: {', '.join(BUCKET_SECONDS)}"}), 400
+        unknown = [m for m in metrics if m not in SERIES_METRICS]
+        if not metrics or unknown:
+            return jsonify({'error': f"Unknown metrics: {', '.join(unknown)}; available: {', '.join(SERIES_METRICS)}"}), 400
+        if abs(tz_offset) > MAX_OFFSET_MINUTES:
+            return jsonify({'error': 'tz_offset is minutes east of UTC, at most 840'}), 400
+        
+        spec = BucketSpec(bucket, tz_offset)
+        first, last = spec.range_for_days(days)
+        if last - first + 1 > MAX_BUCKETS:
+            return jsonify({'error': f'At most {MAX_BUCKETS} buckets per request'}), 400
+        
+        # Cached per bucket range, so the key moves on when a new bucket starts
+        key = (tuple(metrics), bucket, tz_offset, first, last)
+        series = series_cache.get_or_compute(key, lambda: time_series(metrics, spec, first, last))
+        series = [dict(point) for point in series]
+        
+        # Uses still in the write-behind buffer fall in the current bucket
+        for metric, kind in USAGE_SERIES.items():
+            if metric in metrics and series:
+                series[-1][metric] += usage_buffer.pending_total(kind)
+        
+        return jsonify({
+            'bucket': bucket,
+            'tz_offset': tz_offset,
+            'metrics': metrics,
+            'series': series
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @analytics_bp.route('/analytics/prompts/popular', methods=['GET'])
 def get_popular_prompts():
     """Get most used prompts"""
@@ -110,18 +186,21 @@ def get_popular_prompts():
         limit = request.args.get('limit', 10, type=int)
         
         popular_prompts = Prompt.query.filter(
-            Prompt.use_count > 0
+            or_(Prompt.use_count > 0, Prompt.id.in_(usage_buffer.pending_ids('prompt')))
         ).order_by(desc(Prompt.use_count)).limit(limit).all()
         
         result = []
         for prompt in popular_prompts:
-            result.append({
+            result.append(usage_buffer.merge_into('prompt', {
                 'id': prompt.id,
                 'title': prompt.title,
                 'use_count': prompt.use_count,
                 'category': prompt.category.name if prompt.category else 'Uncategorized',
                 'is_favorite': prompt.is_favorite
-            })
+            }))
+        
+        # Re-sort with buffered uses merged in
+        result.sort(key=lambda x: x['use_count'], reverse=True)
         
         return jsonify(result)
     except Exception as e:
@@ -165,15 +244,15 @@ def get_recent_activity():
                     'category': p.category.name if p.category else 'Uncategorized'
                 } for p in recent_updated
             ],
-            'recent_used': [
-                {
+            'recent_used': sorted([
+                usage_buffer.merge_into('prompt', {
                     'id': p.id,
                     'title': p.title,
                     'last_used': p.last_used.isoformat() if p.last_used else None,
                     'use_count': p.use_count,
                     'category': p.category.name if p.category else 'Uncategorized'
-                } for p in recent_used
-            ]
+                }) for p in recent_used
+            ], key=lambda x: x['last_used'] or '', reverse=True)
         }
         
         return jsonify(result)
@@ -184,18 +263,18 @@ def get_recent_activity():
 def get_category_distribution():
     """Get category distribution"""
     try:
-        categories = Category.query.all()
+        prompt_counts = db.session.query(
+            Category.id,
+            Category.name,
+            Category.color,
+            func.count(Prompt.id).label('count')
+        ).join(Prompt, Prompt.category_id == Category.id).group_by(Category.id).all()
         
-        result = []
-        for category in categories:
-            prompt_count = len(category.prompts)
-            if prompt_count > 0:  # Only include categories with prompts
-                result.append({
-                    'id': category.id,
-                    'name': category.name,
-                    'count': prompt_count,
-                    'color': category.color
-                })
+        # Only categories with prompts come back from the inner join
+        result = [
+            {'id': category_id, 'name': name, 'count': count, 'color': color}
+            for category_id, name, color, count in prompt_counts
+        ]
         
         # Add uncategorized
         uncategorized_count = Prompt.query.filter_by(category_id=None).count()
@@ -221,17 +300,19 @@ def get_template_stats():
         limit = request.args.get('limit', 10, type=int)
         
         templates = PromptTemplate.query.filter(
-            PromptTemplate.use_count > 0
+            or_(PromptTemplate.use_count > 0, PromptTemplate.id.in_(usage_buffer.pending_ids('template')))
         ).order_by(desc(PromptTemplate.use_count)).limit(limit).all()
         
         result = []
         for template in templates:
-            result.append({
+            result.append(usage_buffer.merge_into('template', {
                 'id': template.id,
                 'name': template.name,
                 'use_count': template.use_count,
                 'category': template.category.name if template.category else 'Uncategorized'
-            })
+            }))
+        
+        result.sort(key=lambda x: x['use_count'], reverse=True)
         
         return jsonify(result)
     except Exception as e:
@@ -244,18 +325,20 @@ def get_shortcut_stats():
         limit = request.args.get('limit', 10, type=int)
         
         shortcuts = Shortcut.query.filter(
-            Shortcut.use_count > 0
+            or_(Shortcut.use_count > 0, Shortcut.id.in_(usage_buffer.pending_ids('shortcut')))
         ).order_by(desc(Shortcut.use_count)).limit(limit).all()
         
         result = []
         for shortcut in shortcuts:
-            result.append({
+            result.append(usage_buffer.merge_into('shortcut', {
                 'id': shortcut.id,
                 'trigger': shortcut.trigger,
                 'use_count': shortcut.use_count,
                 'description': shortcut.description,
                 'is_active': shortcut.is_active
-            })
+            }))
+        
+        result.sort(key=lambda x: x['use_count'], reverse=True)
         
         return jsonify(result)
     except Exception as e:
@@ -266,40 +349,32 @@ def get_test_stats():
     """Get test results statistics"""
     try:
         days = request.args.get('days', 30, type=int)
-        start_date, end_date = get_date_range(days)
-        
-        # Total tests
-        total_tests = TestResult.query.count()
-        
-        # Tests in range
-        tests_in_range = TestResult.query.filter(
-            TestResult.created_at >= start_date,
-            TestResult.created_at <= end_date
-        ).count()
-        
-        # Average scores
-        avg_quality = db.session.query(
-            func.avg(TestResult.quality_score)
-        ).filter(TestResult.quality_score.isnot(None)).scalar() or 0
-        
-        avg_consistency = db.session.query(
-            func.avg(TestResult.consistency_score)
-        ).filter(TestResult.consistency_score.isnot(None)).scalar() or 0
-        
-        # Average rating
-        avg_rating = db.session.query(
-            func.avg(TestResult.user_rating)
-        ).filter(TestResult.user_rating.isnot(None)).scalar() or 0
+        first_day, today = get_day_range(days)
+        
+        # Totals, averages and per-model counts all come from the daily rollups
+        ensure_rollups()
+        metrics = ('tests',) + tuple(TEST_VALUE_METRICS)
+        all_time = collect_metrics(metrics, datetime.min.date(), today)
+        in_period = collect_metrics(('tests',), first_day, today)
+        
+        total_tests = metric_count(all_time, 'tests')
+        tests_in_range = metric_count(in_period, 'tests')
+        
+        # Average scores over the tests that have one
+        averages = {}
+        for metric in TEST_VALUE_METRICS:
+            count = total = 0
+            for (day, name, dimension), (row_count, row_total) in all_time.items():
+                if name == metric:
+                    count += row_count
+                    total += row_total
+            averages[metric] = total / count if count else 0
         
         # Tests by model
-        tests_by_model = db.session.query(
-            TestResult.model_name,
-            func.count(TestResult.id).label('count')
-        ).group_by(TestResult.model_name).all()
-        
         models_data = [
-            {'model': model or 'Unknown', 'count': count}
-            for model, count in tests_by_model
+            {'model': dimension or 'Unknown', 'count': count}
+            for (day, name, dimension), (count, total) in all_time.items()
+            if name == 'tests'
         ]
         
         # Recent tests
@@ -320,9 +395,9 @@ def get_test_stats():
         return jsonify({
             'total_tests': total_tests,
             'tests_in_period': tests_in_range,
-            'avg_quality_score': round(avg_quality, 2),
-            'avg_consistency_score': round(avg_consistency, 2),
-            'avg_user_rating': round(avg_rating, 2),
+            'avg_quality_score': round(averages['quality_score'], 2),
+            'avg_consistency_score': round(averages['consistency_score'], 2),
+            'avg_user_rating': round(averages['user_rating'], 2),
             'tests_by_model': models_data,
             'recent_tests': recent_data
         })
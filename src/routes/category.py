@@ -1,10 +1,13 @@
 from flask import Blueprint, request, jsonify
 from ..models.user import db
 from ..models.prompt import Category
+from ..services.http_cache import conditional
+from ..services.changes import record_change
 
 category_bp = Blueprint('category', __name__)
 
 @category_bp.route('/categories', methods=['GET'])
+@conditional('categories', 'prompts')
 def get_categories():
     """Get all categories"""
     try:
@@ -31,6 +34,7 @@ def create_category():
         )
         
         db.session.add(category)
+        record_change('category', 'create', category)
         db.session.commit()
         
         return jsonify(category.to_dict()), 201
@@ -68,6 +72,7 @@ def update_category(category_id):
         if 'color' in data:
             category.color = data['color']
         
+        record_change('category', 'update', category)
         db.session.commit()
         
         return jsonify(category.to_dict())
@@ -82,12 +87,13 @@ def delete_category(category_id):
         category = Category.query.get_or_404(category_id)
         
         # Check if category has prompts
-        if category.prompts:
+        if category.prompt_count:
             return jsonify({
                 'error': 'Cannot delete category with prompts. Move or delete prompts first.'
             }), 400
         
         db.session.delete(category)
+        record_change('category', 'delete', category_id)
         db.session.commit()
         
         return jsonify({'message': 'Category deleted successfully'})
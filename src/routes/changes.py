@@ -0,0 +1,100 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from ..models.user import db
+from ..services.changes import changes_since, latest_seq
+from ..services.json_provider import dumps
+import os
+import time
+
+changes_bp = Blueprint('changes', __name__)
+
+CHANGE_PAGE_SIZE = 500
+# Seconds between checks of the change log while a stream is idle
+CHANGE_POLL_INTERVAL = float(os.getenv('CHANGE_POLL_INTERVAL', '1'))
+# A stream ends after this many seconds and the browser reconnects with Last-Event-ID,
+# so a long-lived connection never pins a worker indefinitely
+CHANGE_STREAM_TIMEOUT = float(os.getenv('CHANGE_STREAM_TIMEOUT', '300'))
+HEARTBEAT_SECONDS = 15
+RECONNECT_MS = 1000
+
+def parse_since(value):
+    """A change sequence number from a query argument or header, or None when absent"""
+    if value in (None, ''):
+        return None
+    since = int(value)
+    if since < 0:
+        raise ValueError('since must not be negative')
+    return since
+
+def sse_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+@changes_bp.route('/changes', methods=['GET'])
+def get_changes():
+    """
+    Changes after ``since``, oldest first, each with the entity's current state.
+
+    Without ``since`` only the current ``last_seq`` is returned: read it
+    before loading the collections, then poll with it. Follow ``last_seq``
+    while ``has_more``; on ``reset`` reload everything.
+    """
+    try:
+        try:
+            since = parse_since(request.args.get('since'))
+            limit = max(1, min(request.args.get('limit', CHANGE_PAGE_SIZE, type=int), CHANGE_PAGE_SIZE))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if since is None:
+            return jsonify({'changes': [], 'last_seq': latest_seq(), 'has_more': False, 'reset': False})
+        return jsonify(changes_since(since, limit))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@changes_bp.route('/changes/stream', methods=['GET'])
+def stream_changes():
+    """
+    Server-Sent Events stream of changes: one ``change`` event per change
+    (its ``id`` is the sequence number), ``reset`` when the client must
+    reload, and comment heartbeats. Resumes from ``Last-Event-ID`` or
+    ``since``; without either it starts at the newest change.
+    """
+    try:
+        since = parse_since(request.headers.get('Last-Event-ID') or request.args.get('since'))
+        timeout = min(request.args.get('timeout', CHANGE_STREAM_TIMEOUT, type=float), CHANGE_STREAM_TIMEOUT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if since is None:
+        since = latest_seq()
+
+    def generate(since):
+        yield f'retry: {RECONNECT_MS}\n\n'
+        deadline = time.monotonic() + timeout
+        next_heartbeat = time.monotonic() + HEARTBEAT_SECONDS
+        while True:
+            batch = changes_since(since, CHANGE_PAGE_SIZE)
+            # End the read transaction so the next poll sees newer commits
+            db.session.close()
+
+            if batch['reset']:
+                yield sse_event('reset', {'last_seq': batch['last_seq']}, batch['last_seq'])
+            for change in batch['changes']:
+                yield sse_event('change', change, change['seq'])
+            since = batch['last_seq']
+            if batch['has_more']:
+                continue
+
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if now >= next_heartbeat:
+                yield ': heartbeat\n\n'
+                next_heartbeat = now + HEARTBEAT_SECONDS
+            time.sleep(min(CHANGE_POLL_INTERVAL, deadline - now))
+
+    return Response(stream_with_context(generate(since)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # stop nginx from buffering the stream
+    })
@@ -1,27 +1,97 @@
 from flask import Blueprint, request, jsonify
 from ..models.user import db
-from ..models.prompt import Prompt, Category
+from ..models.prompt import Prompt, Category, content_hash
+from ..services.search import apply_text_search, prompt_snippet
+from ..services.usage import usage_buffer
+from ..services.blobs import content_usage
+from ..services.rollups import invalidate_days
+from ..services.tags import parse_tag_list, tag_filter, tag_counts
+from ..services.serializers import PromptRowSerializer
+from ..services.http_cache import conditional
+from ..services.changes import record_change, record_changes, record_prompt_count_change
+from ..services.pagination import (
+    DEFAULT_PAGE_SIZE, parse_page_size, order_clauses, encode_cursor, decode_cursor, paginate
+)
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload, defer
 from datetime import datetime
 import json
 
 prompt_bp = Blueprint('prompt', __name__)
 
+def parse_fields(fields_param):
+    """Parse a comma-separated ``fields=`` projection, or None for all fields"""
+    if not fields_param:
+        return None
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in Prompt.SERIALIZABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+def serialize_prompt_rows(rows, serializer, fts):
+    """Serialize listing rows, attaching search snippets when present"""
+    data = serializer.to_dicts(rows)
+    if fts is not None:
+        for item, row in zip(data, rows):
+            item['snippet'] = row.snippet
+    return data
+
+def set_head(prompt_id, is_head):
+    """Flag or unflag a prompt as the HEAD of its chain without touching updated_at"""
+    Prompt.query.filter(Prompt.id == prompt_id).update(
+        {Prompt.is_head: is_head, Prompt.updated_at: Prompt.updated_at},
+        synchronize_session='fetch'
+    )
+
+def reroot_subtree(top_id):
+    """
+    Make ``top_id`` the root of its chain after its parent was deleted,
+    pointing the root_id of every version below it at it. Returns the ids changed.
+    """
+    subtree = db.select(Prompt.id).where(Prompt.parent_id == top_id).cte('subtree', recursive=True)
+    subtree = subtree.union_all(db.select(Prompt.id).where(Prompt.parent_id == subtree.c.id))
+    descendant_ids = db.session.execute(db.select(subtree.c.id)).scalars().all()
+    
+    Prompt.query.filter(Prompt.id == top_id).update(
+        {Prompt.root_id: None, Prompt.updated_at: Prompt.updated_at}, synchronize_session='fetch'
+    )
+    if descendant_ids:
+        Prompt.query.filter(Prompt.id.in_(descendant_ids)).update(
+            {Prompt.root_id: top_id, Prompt.updated_at: Prompt.updated_at}, synchronize_session='fetch'
+        )
+    return [top_id] + descendant_ids
+
 @prompt_bp.route('/prompts', methods=['GET'])
+@conditional('prompts', 'categories', 'tags', 'prompt_tags')
 def get_prompts():
-    """Get all prompts with optional filtering, returning only the 'HEAD' version of each prompt chain."""
-    try:
-        # Subquery to find all prompts that are parents
-        parent_ids_subquery = db.session.query(Prompt.parent_id).filter(Prompt.parent_id.isnot(None)).distinct()
+    """
+    Get all prompts with optional filtering, returning only the 'HEAD' version of each prompt chain.
 
-        # Main query starts by filtering out any prompt whose ID is in the parent list
-        query = Prompt.query.filter(Prompt.id.notin_(parent_ids_subquery))
+    Pass ``limit`` (and then ``cursor`` from the ``X-Next-Cursor`` header) to
+    page through the list, and ``fields`` to choose which keys each prompt
+    carries. The first page reports the filtered total in ``X-Total-Count``.
+    """
+    try:
+        # HEAD versions are flagged on write, so this is an indexed lookup
+        query = Prompt.query.filter(Prompt.is_head.is_(True))
 
         # --- The rest of the filtering logic remains the same ---
         category_id = request.args.get('category_id', type=int)
         is_favorite = request.args.get('is_favorite', type=bool)
         is_template = request.args.get('is_template', type=bool)
         search = request.args.get('search', '')
-        tags = request.args.get('tags', '')
+        tags = parse_tag_list(request.args.get('tags', ''))
+        match_all = request.args.get('tag_mode', 'all') != 'any'
+        limit = parse_page_size(request.args.get('limit', type=int))
+        cursor = request.args.get('cursor')
+        
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if category_id:
             query = query.filter(Prompt.category_id == category_id)
@@ -29,22 +99,55 @@ def get_prompts():
             query = query.filter(Prompt.is_favorite == is_favorite)
         if is_template is not None:
             query = query.filter(Prompt.is_template == is_template)
+        fts = None
         if search:
-            query = query.filter(
-                (Prompt.title.contains(search)) |
-                (Prompt.content.contains(search)) |
-                (Prompt.description.contains(search))
-            )
+            query, fts = apply_text_search(query, search, ('title', 'content', 'description'), superseded=False)
         if tags:
-            tag_list = tags.split(',')
-            for tag in tag_list:
-                query = query.filter(Prompt.tags.contains(tag.strip()))
+            query = query.filter(tag_filter(tags, match_all))
         
-        # Order by last used, then by updated date
-        prompts = query.order_by(Prompt.last_used.desc().nullslast(), 
-                                Prompt.updated_at.desc()).all()
+        if fts is not None:
+            # Best matches first, with a highlighted excerpt per prompt
+            ordering = [(fts.c.rank, False), (Prompt.id, True)]
+            cursor_types = (float, int)
+        else:
+            # Order by last used, then by updated date
+            ordering = [(Prompt.last_used, True), (Prompt.updated_at, True), (Prompt.id, True)]
+            cursor_types = (datetime, datetime, int)
         
-        return jsonify([prompt.to_dict() for prompt in prompts])
+        # Plain columns, serialized without building Prompt instances
+        serializer = PromptRowSerializer(fields, hidden=[Prompt.last_used, Prompt.updated_at])
+        query = query.with_entities(*serializer.columns)
+        if fts is not None:
+            query = query.add_columns(fts.c.rank, fts.c.snippet)
+        
+        if limit is None and cursor is None:
+            rows = query.order_by(*order_clauses(ordering)).all()
+            return jsonify(serialize_prompt_rows(rows, serializer, fts))
+        
+        cursor_values = None
+        if cursor:
+            try:
+                cursor_values = decode_cursor(cursor, cursor_types)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        total = None
+        if cursor_values is None:
+            # Counted once per listing on the first page, without ordering or eager loads
+            total = query.order_by(None).with_entities(func.count(Prompt.id)).scalar()
+        
+        rows, has_more = paginate(query, ordering, limit or DEFAULT_PAGE_SIZE, cursor_values)
+        
+        response = jsonify(serialize_prompt_rows(rows, serializer, fts))
+        if total is not None:
+            response.headers['X-Total-Count'] = str(total)
+        if has_more:
+            last = rows[-1]
+            if fts is not None:
+                response.headers['X-Next-Cursor'] = encode_cursor([last.rank, last.id])
+            else:
+                response.headers['X-Next-Cursor'] = encode_cursor([last.last_used, last.updated_at, last.id])
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -77,6 +180,8 @@ def create_prompt():
             )
         
         db.session.add(prompt)
+        record_change('prompt', 'create', prompt)
+        record_prompt_count_change(prompt.category_id)
         db.session.commit()
         
         return jsonify(prompt.to_dict()), 201
@@ -90,12 +195,10 @@ def get_prompt(prompt_id):
     try:
         prompt = Prompt.query.get_or_404(prompt_id)
         
-        # Update last used timestamp
-        prompt.last_used = datetime.utcnow()
-        prompt.use_count = (prompt.use_count or 0) + 1
-        db.session.commit()
+        # Update last used timestamp (buffered, so reads stay read-only transactions)
+        usage_buffer.record('prompt', prompt.id)
         
-        return jsonify(prompt.to_dict())
+        return jsonify(usage_buffer.merge_into('prompt', prompt.to_dict()))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -113,7 +216,7 @@ def update_prompt(prompt_id):
         # Create a new Prompt object for the new version.
         new_version = Prompt(
             title=data.get('title', parent_prompt.title),
-            content=data.get('content', parent_prompt.content),
+            content=data.get('content', parent_prompt.get_content()),
             description=data.get('description', parent_prompt.description),
             author=data.get('author', parent_prompt.author),
             source=data.get('source', parent_prompt.source),
@@ -123,6 +226,7 @@ def update_prompt(prompt_id):
             version=data.get('version', parent_prompt.version), # Version might be incremented on the frontend
             version_message=data.get('version_message'),
             parent_id=parent_prompt.id,
+            root_id=parent_prompt.chain_root_id,
             original_creation_date=parent_prompt.original_creation_date or parent_prompt.created_at
         )
 
@@ -132,6 +236,11 @@ def update_prompt(prompt_id):
             new_version.set_tags(parent_prompt.get_tags())
 
         db.session.add(new_version)
+        set_head(parent_prompt.id, False)
+        parent_prompt.store_as_delta()
+        record_change('prompt', 'create', new_version)
+        record_change('prompt', 'update', parent_prompt.id)
+        record_prompt_count_change(new_version.category_id)
         db.session.commit()
 
         return jsonify(new_version.to_dict()), 201 # Return 201 Created for the new resource
@@ -145,7 +254,35 @@ def delete_prompt(prompt_id):
     """Delete a prompt"""
     try:
         prompt = Prompt.query.get_or_404(prompt_id)
+        parent_id = prompt.parent_id
+        child_ids = [child.id for child in prompt.versions]
+        
+        # Child versions stored as deltas against this prompt need their full text first
+        for child in prompt.versions.filter(Prompt.content_delta.isnot(None)):
+            child.store_full_content()
+        
+        # A delta-stored version is indexed by its full text, which the index needs to remove it
+        if prompt.store_full_content():
+            db.session.flush()
         db.session.delete(prompt)
+        invalidate_days([prompt.created_at])
+        record_change('prompt', 'delete', prompt_id)
+        record_prompt_count_change(prompt.category_id)
+        db.session.flush()
+        
+        # Deleting a version detaches its children (parent_id is cleared), so each
+        # child now starts a chain of its own; keep root_id on the surviving tree
+        for child_id in child_ids:
+            record_changes('prompt', 'update', reroot_subtree(child_id))
+        
+        # The parent becomes HEAD again once its last child version is gone
+        if parent_id and not db.session.query(
+            Prompt.query.filter(Prompt.parent_id == parent_id).exists()
+        ).scalar():
+            set_head(parent_id, True)
+            Prompt.query.get(parent_id).store_full_content()
+            record_change('prompt', 'update', parent_id)
+        
         db.session.commit()
         
         return jsonify({'message': 'Prompt deleted successfully'})
@@ -162,7 +299,7 @@ def duplicate_prompt(prompt_id):
         
         duplicate = Prompt(
             title=data.get('title', f"{original.title} (Copy)"),
-            content=original.content,
+            content=original.get_content(),
             description=original.description,
             author=original.author,
             source=original.source,
@@ -170,13 +307,19 @@ def duplicate_prompt(prompt_id):
             is_favorite=False,
             is_template=original.is_template,
             version='1.0.0',
-            parent_id=original.id
+            parent_id=original.id,
+            root_id=original.chain_root_id
         )
         
         # Copy tags
         duplicate.set_tags(original.get_tags())
         
         db.session.add(duplicate)
+        set_head(original.id, False)
+        original.store_as_delta()
+        record_change('prompt', 'create', duplicate)
+        record_change('prompt', 'update', original.id)
+        record_prompt_count_change(duplicate.category_id)
         db.session.commit()
         
         return jsonify(duplicate.to_dict()), 201
@@ -203,6 +346,113 @@ def get_prompt_versions(prompt_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def lineage_cte(prompt_id):
+    """
+    Recursive CTE of (id, depth) for every prompt in the version tree containing ``prompt_id``.
+
+    Walks parent_id up to the topmost surviving ancestor, then back down
+    through all of its descendants, so edits and duplicates (branches) on
+    any level are included. Depth is relative to that ancestor.
+    """
+    ancestors = db.select(
+        Prompt.id, Prompt.parent_id, db.literal(0).label('level')
+    ).where(Prompt.id == prompt_id).cte('ancestors', recursive=True)
+    ancestors = ancestors.union_all(
+        db.select(Prompt.id, Prompt.parent_id, ancestors.c.level + 1)
+        .where(Prompt.id == ancestors.c.parent_id)
+    )
+    top_id = db.select(ancestors.c.id).order_by(ancestors.c.level.desc()).limit(1).scalar_subquery()
+
+    tree = db.select(Prompt.id, db.literal(0).label('depth')).where(Prompt.id == top_id).cte('tree', recursive=True)
+    return tree.union_all(
+        db.select(Prompt.id, tree.c.depth + 1).where(Prompt.parent_id == tree.c.id)
+    )
+
+@prompt_bp.route('/prompts/<int:prompt_id>/history', methods=['GET'])
+def get_prompt_history(prompt_id):
+    """
+    Get the full version tree of a prompt (ancestors, descendants and branches) in one query.
+
+    Versions come oldest first, each with its ``depth`` below the chain root.
+    Paginate with ``limit`` and the ``X-Next-Cursor`` header; pass
+    ``include_content=false`` to leave out prompt bodies.
+    """
+    try:
+        limit = parse_page_size(request.args.get('limit', type=int)) or DEFAULT_PAGE_SIZE
+        cursor = request.args.get('cursor')
+        include_content = request.args.get('include_content', 'true').lower() != 'false'
+        
+        cursor_values = None
+        if cursor:
+            try:
+                cursor_values = decode_cursor(cursor, (int,))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        tree = lineage_cte(prompt_id)
+        query = db.session.query(Prompt, tree.c.depth, func.count().over().label('total')).join(
+            tree, tree.c.id == Prompt.id
+        ).options(joinedload(Prompt.category), selectinload(Prompt.tag_links))
+        
+        fields = None
+        if not include_content:
+            fields = [field for field in Prompt.SERIALIZABLE_FIELDS if field != 'content']
+            query = query.options(defer(Prompt.content), defer(Prompt.content_delta))
+        
+        rows, has_more = paginate(query, [(Prompt.id, False)], limit, cursor_values)
+        if not rows and cursor_values is None:
+            return jsonify({'error': 'Prompt not found'}), 404
+        
+        response = jsonify([dict(prompt.to_dict(fields), depth=depth) for prompt, depth, total in rows])
+        if rows and cursor_values is None:
+            # The window count covers the whole tree only before a cursor narrows it
+            response.headers['X-Total-Count'] = str(rows[0].total)
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_cursor([rows[-1][0].id])
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Fields listed for prompts sharing content; the content itself is the same for all
+SHARED_CONTENT_FIELDS = ['id', 'title', 'category_id', 'parent_id', 'is_head', 'root_id', 'created_at', 'updated_at']
+
+def shared_content_response(digest, heads_only, exclude_id=None):
+    prompts, test_results = content_usage(digest, heads_only)
+    return jsonify({
+        'content_hash': digest,
+        'prompts': [prompt.to_dict(SHARED_CONTENT_FIELDS) for prompt in prompts if prompt.id != exclude_id],
+        'test_results': test_results
+    })
+
+@prompt_bp.route('/prompts/<int:prompt_id>/shared-content', methods=['GET'])
+def get_shared_content(prompt_id):
+    """
+    Find other prompts with exactly this prompt's content, plus how many test
+    results sent it as their system or user message. ``heads_only=true``
+    leaves out older versions.
+    """
+    try:
+        prompt = Prompt.query.get_or_404(prompt_id)
+        heads_only = request.args.get('heads_only', 'false').lower() == 'true'
+        digest = prompt.content_hash or content_hash(prompt.get_content())
+        return shared_content_response(digest, heads_only, exclude_id=prompt.id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@prompt_bp.route('/prompts/shared-content', methods=['POST'])
+def find_shared_content():
+    """Find prompts and test results whose text is exactly the given ``content``"""
+    try:
+        data = request.get_json()
+        content = data.get('content')
+        if not isinstance(content, str):
+            return jsonify({'error': 'content is required'}), 400
+        
+        heads_only = bool(data.get('heads_only', False))
+        return shared_content_response(content_hash(content), heads_only)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @prompt_bp.route('/prompts/search', methods=['POST'])
 def search_prompts():
     """Advanced search for prompts"""
@@ -211,24 +461,20 @@ def search_prompts():
         query_text = data.get('query', '')
         filters = data.get('filters', {})
         
-        query = Prompt.query
+        query = Prompt.query.options(joinedload(Prompt.category), selectinload(Prompt.tag_links))
         
         # Text search across multiple fields
+        fts = None
         if query_text:
-            query = query.filter(
-                (Prompt.title.contains(query_text)) |
-                (Prompt.content.contains(query_text)) |
-                (Prompt.description.contains(query_text)) |
-                (Prompt.author.contains(query_text)) |
-                (Prompt.source.contains(query_text))
-            )
+            query, fts = apply_text_search(query, query_text)
         
         # Apply filters
         if filters.get('category_ids'):
             query = query.filter(Prompt.category_id.in_(filters['category_ids']))
         if filters.get('tags'):
-            for tag in filters['tags']:
-                query = query.filter(Prompt.tags.contains(tag))
+            tags = parse_tag_list(filters['tags'])
+            if tags:
+                query = query.filter(tag_filter(tags, filters.get('tag_mode', 'all') != 'any'))
         if filters.get('is_favorite') is not None:
             query = query.filter(Prompt.is_favorite == filters['is_favorite'])
         if filters.get('is_template') is not None:
@@ -240,19 +486,48 @@ def search_prompts():
             date_to = datetime.fromisoformat(filters['date_to'].replace('Z', '+00:00'))
             query = query.filter(Prompt.created_at <= date_to)
         
-        # Sorting
-        sort_by = data.get('sort_by', 'updated_at')
+        # Sorting (text searches default to relevance)
+        sort_by = data.get('sort_by', 'relevance' if fts is not None else 'updated_at')
         sort_order = data.get('sort_order', 'desc')
         
-        if hasattr(Prompt, sort_by):
+        if sort_by == 'relevance':
+            if fts is not None:
+                query = query.order_by(fts.c.rank)
+        elif hasattr(Prompt, sort_by):
             column = getattr(Prompt, sort_by)
             if sort_order == 'desc':
                 query = query.order_by(column.desc())
             else:
                 query = query.order_by(column.asc())
         
+        if fts is not None:
+            rows = query.add_columns(fts.c.snippet).all()
+            # Content matches in delta-stored versions have no stored text to excerpt
+            return jsonify([
+                dict(prompt.to_dict(), snippet=prompt_snippet(prompt, snippet, query_text))
+                for prompt, snippet in rows
+            ])
+        
         prompts = query.all()
         return jsonify([prompt.to_dict() for prompt in prompts])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@prompt_bp.route('/tags', methods=['GET'])
+def get_tag_counts():
+    """
+    Every tag in use with the number of prompts carrying it, most used first.
+
+    Counts HEAD versions unless ``heads_only=false``; ``prefix`` narrows the
+    list (e.g. for autocomplete) and ``limit`` caps it.
+    """
+    try:
+        heads_only = request.args.get('heads_only', 'true').lower() != 'false'
+        prefix = request.args.get('prefix', '').strip()
+        limit = request.args.get('limit', type=int)
+        
+        counts = tag_counts(heads_only, prefix or None, limit)
+        return jsonify([{'name': name, 'count': count} for name, count in counts])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
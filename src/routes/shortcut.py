@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from ..models.user import db
 from ..models.prompt import Shortcut
+from ..services.usage import usage_buffer
+from ..services.shortcut_matcher import shortcut_matcher
+from ..services.changes import record_change
 from datetime import datetime
 
 shortcut_bp = Blueprint('shortcut', __name__)
@@ -61,7 +64,9 @@ def create_shortcut():
         )
         
         db.session.add(shortcut)
+        record_change('shortcut', 'create', shortcut)
         db.session.commit()
+        shortcut_matcher.invalidate()
         
         return jsonify(shortcut.to_dict()), 201
     except Exception as e:
@@ -111,7 +116,9 @@ def update_shortcut(shortcut_id):
         
         shortcut.updated_at = datetime.utcnow()
         
+        record_change('shortcut', 'update', shortcut)
         db.session.commit()
+        shortcut_matcher.invalidate()
         
         return jsonify(shortcut.to_dict())
     except Exception as e:
@@ -124,7 +131,9 @@ def delete_shortcut(shortcut_id):
     try:
         shortcut = Shortcut.query.get_or_404(shortcut_id)
         db.session.delete(shortcut)
+        record_change('shortcut', 'delete', shortcut_id)
         db.session.commit()
+        shortcut_matcher.invalidate()
         
         return jsonify({'message': 'Shortcut deleted successfully'})
     except Exception as e:
@@ -133,26 +142,29 @@ def delete_shortcut(shortcut_id):
 
 @shortcut_bp.route('/shortcuts/test', methods=['POST'])
 def test_shortcut():
-    """Test if text contains a shortcut trigger and return its expansion"""
+    """
+    Test if text ends with a shortcut trigger and return its expansion.
+
+    The longest matching trigger wins. Send ``texts`` (a list) instead of
+    ``text`` to check many texts at once; results come back in order.
+    """
     try:
         data = request.get_json()
-        text = data.get('text', '')
         
+        if 'texts' in data:
+            texts = data['texts'] or []
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                return jsonify({'error': 'texts must be a list of strings'}), 400
+            return jsonify({'matches': shortcut_matcher.match_many(texts)})
+        
+        text = data.get('text', '')
+        if not isinstance(text, str):
+            return jsonify({'error': 'text must be a string'}), 400
         if not text:
             return jsonify({'match': None})
         
-        # Get all active shortcuts
-        shortcuts = Shortcut.query.filter_by(is_active=True).all()
-        
-        # Find matching shortcut (check if text ends with any trigger)
-        for shortcut in shortcuts:
-            if text.endswith(shortcut.trigger):
-                return jsonify({
-                    'match': shortcut.to_dict(),
-                    'position': len(text) - len(shortcut.trigger)
-                })
-        
-        return jsonify({'match': None})
+        # Matched against a cached suffix trie of the active shortcuts
+        return jsonify(shortcut_matcher.match(text))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -161,11 +173,8 @@ def increment_use_count(shortcut_id):
     """Increment the use count for a shortcut"""
     try:
         shortcut = Shortcut.query.get_or_404(shortcut_id)
-        shortcut.use_count = (shortcut.use_count or 0) + 1
-        
-        db.session.commit()
+        usage_buffer.record('shortcut', shortcut.id)
         
-        return jsonify(shortcut.to_dict())
+        return jsonify(usage_buffer.merge_into('shortcut', shortcut.to_dict()))
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
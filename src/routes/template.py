@@ -1,6 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from ..models.user import db
 from ..models.prompt import PromptTemplate, Prompt, Category
+from ..services.usage import usage_buffer
+from ..services.templating import render_template, compile_template, render
+from ..services.ingest import record_reader, ndjson_line, INSERT_BATCH_SIZE
+from ..services.serializers import TemplateRowSerializer
+from ..services.http_cache import conditional
+from ..services.changes import record_change, record_prompt_count_change
 from datetime import datetime
 import re
 
@@ -28,6 +34,8 @@ def extract_variables(content):
     return variables
 
 @template_bp.route('/templates', methods=['GET'])
+# Category dicts carry prompt counts, so prompt changes count too
+@conditional('prompt_templates', 'categories', 'prompts')
 def get_templates():
     """Get all templates with optional filtering"""
     try:
@@ -47,12 +55,13 @@ def get_templates():
             )
         
         # Order by use count (popular first), then by updated date
-        templates = query.order_by(
+        serializer = TemplateRowSerializer()
+        rows = query.with_entities(*serializer.columns).order_by(
             PromptTemplate.use_count.desc(),
             PromptTemplate.updated_at.desc()
         ).all()
         
-        return jsonify([template.to_dict() for template in templates])
+        return jsonify(serializer.to_dicts(rows))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -78,6 +87,7 @@ def create_template():
         template.set_variables(variables)
         
         db.session.add(template)
+        record_change('template', 'create', template)
         db.session.commit()
         
         return jsonify(template.to_dict()), 201
@@ -117,6 +127,7 @@ def update_template(template_id):
         
         template.updated_at = datetime.utcnow()
         
+        record_change('template', 'update', template)
         db.session.commit()
         
         return jsonify(template.to_dict())
@@ -130,6 +141,7 @@ def delete_template(template_id):
     try:
         template = PromptTemplate.query.get_or_404(template_id)
         db.session.delete(template)
+        record_change('template', 'delete', template_id)
         db.session.commit()
         
         return jsonify({'message': 'Template deleted successfully'})
@@ -145,12 +157,8 @@ def instantiate_template(template_id):
         data = request.get_json()
         variable_values = data.get('variables', {})
         
-        # Replace variables in content
-        content = template.content
-        for var_name, var_value in variable_values.items():
-            # Replace {{variable}} or {{variable|default}}
-            pattern = r'\{\{' + re.escape(var_name) + r'(?:\|[^}]*)?\}\}'
-            content = re.sub(pattern, str(var_value), content)
+        # Replace {{variable}} or {{variable|default}} in a single pass
+        content, missing = render_template(template, variable_values)
         
         # Create new prompt from template
         prompt = Prompt(
@@ -168,13 +176,14 @@ def instantiate_template(template_id):
             prompt.set_tags(data['tags'])
         
         db.session.add(prompt)
+        record_change('prompt', 'create', prompt)
+        record_prompt_count_change(prompt.category_id)
+        db.session.commit()
         
         # Increment template use count
-        template.use_count = (template.use_count or 0) + 1
-        
-        db.session.commit()
+        usage_buffer.record('template', template.id)
         
-        return jsonify(prompt.to_dict()), 201
+        return jsonify(dict(prompt.to_dict(), missing_variables=missing)), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -188,14 +197,88 @@ def preview_template(template_id):
         variable_values = data.get('variables', {})
         
         # Replace variables in content for preview
-        content = template.content
-        for var_name, var_value in variable_values.items():
-            pattern = r'\{\{' + re.escape(var_name) + r'(?:\|[^}]*)?\}\}'
-            content = re.sub(pattern, str(var_value), content)
+        content, missing = render_template(template, variable_values)
         
         return jsonify({
             'content': content,
-            'variables': template.get_variables()
+            'variables': template.get_variables(),
+            'missing_variables': missing
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@template_bp.route('/templates/<int:template_id>/render-batch', methods=['POST'])
+def render_template_batch(template_id):
+    """
+    Render a template against many variable rows, streaming NDJSON results.
+
+    The body is NDJSON (one object of variable values per line) or CSV (a
+    header row of variable names), read as it arrives. Each row yields
+    ``{"row", "content", "missing_variables"}`` or ``{"row", "error"}``,
+    followed by a final ``{"summary": ...}`` line. With ``?persist=true``
+    every rendered row is also saved as a prompt, inserted and committed in
+    batches so the write lock is never held while the upload streams in.
+    """
+    try:
+        template = PromptTemplate.query.get_or_404(template_id)
+        reader = record_reader(request.content_type)
+        if reader is None:
+            return jsonify({'error': 'Send rows as application/x-ndjson or text/csv'}), 415
+        
+        persist = request.args.get('persist', 'false').lower() == 'true'
+        title = request.args.get('title', template.name)
+        segments = compile_template(template)
+        defaults = {
+            'description': template.description,
+            'category_id': template.category_id,
+            'is_favorite': False,
+            'is_template': False,
+            'version': '1.0.0'
+        }
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        rendered = errors = persisted = 0
+        pending = []
+        
+        def save(rows):
+            # One short write transaction per batch, as test result ingestion does
+            db.session.execute(db.insert(Prompt), rows)
+            record_change('prompt', 'create')
+            db.session.commit()
+            usage_buffer.record('template', template_id, count=len(rows))
+            return len(rows)
+        
+        try:
+            for number, values, error in reader(request.stream):
+                if error:
+                    errors += 1
+                    yield ndjson_line({'row': number, 'error': error})
+                    continue
+                
+                content, missing = render(segments, values)
+                rendered += 1
+                yield ndjson_line({'row': number, 'content': content, 'missing_variables': missing})
+                
+                if persist:
+                    pending.append(dict(defaults, title=f"{title} #{number}", content=content))
+                    if len(pending) >= INSERT_BATCH_SIZE:
+                        persisted += save(pending)
+                        pending = []
+            
+            if pending:
+                persisted += save(pending)
+        except Exception as e:
+            db.session.rollback()
+            # Batches committed before the failure stay saved
+            yield ndjson_line({'error': str(e), 'persisted': persisted})
+            return
+        
+        yield ndjson_line({'summary': {
+            'rendered': rendered,
+            'errors': errors,
+            'persisted': persisted
+        }})
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
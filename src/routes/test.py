@@ -1,6 +1,13 @@
 from flask import Blueprint, request, jsonify
 from ..models.user import db
 from ..models.prompt import TestResult, Prompt
+from ..services.blobs import message_hashes, intern_texts
+from ..services.ingest import record_reader
+from ..services.test_ingest import TestResultIngester, session_summary
+from ..services.test_stats import test_stats
+from ..services.rollups import invalidate_days
+from ..services.serializers import TestRowSerializer
+from ..services.changes import record_change, record_changes
 from datetime import datetime
 import uuid
 
@@ -27,8 +34,10 @@ def get_tests():
         if test_session_id:
             query = query.filter(TestResult.test_session_id == test_session_id)
         
-        tests = query.order_by(TestResult.created_at.desc()).all()
-        return jsonify([test.to_dict() for test in tests])
+        # Messages are joined in from content_blobs; no TestResult instances are built
+        serializer = TestRowSerializer()
+        rows = serializer.select_from(query).order_by(TestResult.created_at.desc()).all()
+        return jsonify(serializer.to_dicts(rows))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -43,8 +52,7 @@ def create_test():
             model_name=data.get('model_name'),
             temperature=data.get('temperature', 0.7),
             max_tokens=data.get('max_tokens'),
-            system_message=data.get('system_message'),
-            user_message=data.get('user_message'),
+            **message_hashes(data.get('system_message'), data.get('user_message')),
             model_response=data.get('model_response'),
             response_time=data.get('response_time'),
             token_count_input=data.get('token_count_input'),
@@ -58,6 +66,7 @@ def create_test():
         )
         
         db.session.add(test_result)
+        record_change('test', 'create', test_result)
         db.session.commit()
         
         return jsonify(test_result.to_dict()), 201
@@ -89,6 +98,9 @@ def update_test(test_id):
         if 'consistency_score' in data:
             test.consistency_score = data['consistency_score']
         
+        # The test's day is rolled up with its old scores
+        invalidate_days([test.created_at])
+        record_change('test', 'update', test)
         db.session.commit()
         
         return jsonify(test.to_dict())
@@ -102,6 +114,8 @@ def delete_test(test_id):
     try:
         test = TestResult.query.get_or_404(test_id)
         db.session.delete(test)
+        invalidate_days([test.created_at])
+        record_change('test', 'delete', test_id)
         db.session.commit()
         
         return jsonify({'message': 'Test result deleted successfully'})
@@ -117,14 +131,20 @@ def create_batch_tests():
         test_session_id = str(uuid.uuid4())
         
         tests = []
-        for test_data in data.get('tests', []):
+        tests_data = data.get('tests', [])
+        # Store every distinct message once, up front
+        hashes = intern_texts(
+            message for test_data in tests_data
+            for message in (test_data.get('system_message'), test_data.get('user_message'))
+        )
+        for test_data in tests_data:
             test_result = TestResult(
                 prompt_id=test_data.get('prompt_id'),
                 model_name=test_data.get('model_name'),
                 temperature=test_data.get('temperature', 0.7),
                 max_tokens=test_data.get('max_tokens'),
-                system_message=test_data.get('system_message'),
-                user_message=test_data.get('user_message'),
+                system_message_hash=hashes.get(test_data.get('system_message')),
+                user_message_hash=hashes.get(test_data.get('user_message')),
                 model_response=test_data.get('model_response'),
                 response_time=test_data.get('response_time'),
                 token_count_input=test_data.get('token_count_input'),
@@ -136,50 +156,89 @@ def create_batch_tests():
             tests.append(test_result)
             db.session.add(test_result)
         
+        db.session.flush()
+        record_changes('test', 'create', [test.id for test in tests])
         db.session.commit()
         
+        # Read back in one query with the messages joined in, instead of
+        # refreshing each instance and lazy-loading its blobs
+        serializer = TestRowSerializer()
+        rows = serializer.select_from(
+            TestResult.query.filter(TestResult.test_session_id == test_session_id)
+        ).order_by(TestResult.id).all()
+        
         return jsonify({
             'test_session_id': test_session_id,
-            'tests': [test.to_dict() for test in tests]
+            'tests': serializer.to_dicts(rows)
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@test_bp.route('/tests/ingest', methods=['POST'])
+def ingest_tests():
+    """
+    Stream test results in as NDJSON or CSV, one result per record.
+
+    Rows are inserted in chunks; the response holds only the new ids, any
+    rejected rows and a summary of the session. Pass ``test_session_id`` to
+    append to an existing session, otherwise a new session is started.
+    """
+    reader = record_reader(request.content_type)
+    if reader is None:
+        return jsonify({'error': 'Send application/x-ndjson or text/csv'}), 415
+    
+    try:
+        test_session_id = request.args.get('test_session_id')
+        if test_session_id:
+            exists = db.session.query(TestResult.id).filter_by(test_session_id=test_session_id).first()
+            if exists is None:
+                return jsonify({'error': 'Test session not found'}), 404
+        else:
+            test_session_id = str(uuid.uuid4())
+        
+        ingester = TestResultIngester(test_session_id, default_test_type=request.args.get('test_type', 'automated'))
+        for number, record, error in reader(request.stream):
+            ingester.add(number, record, error)
+        
+        result = ingester.finish()
+        result['session'] = session_summary(test_session_id)
+        return jsonify(result), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @test_bp.route('/tests/sessions/<session_id>/analyze', methods=['POST'])
 def analyze_test_session(session_id):
     """Analyze a test session for consistency and quality metrics"""
     try:
-        tests = TestResult.query.filter_by(test_session_id=session_id).all()
+        in_session = TestResult.test_session_id == session_id
+        overall, model_stats = test_stats(in_session)
         
-        if not tests:
+        if not overall['count']:
             return jsonify({'error': 'Test session not found'}), 404
         
-        # Calculate metrics
-        total_tests = len(tests)
-        avg_response_time = sum(t.response_time for t in tests if t.response_time) / total_tests
-        total_cost = sum(t.cost for t in tests if t.cost)
-        avg_input_tokens = sum(t.token_count_input for t in tests if t.token_count_input) / total_tests
-        avg_output_tokens = sum(t.token_count_output for t in tests if t.token_count_output) / total_tests
-        
-        # Quality metrics
-        rated_tests = [t for t in tests if t.user_rating]
-        avg_rating = sum(t.user_rating for t in rated_tests) / len(rated_tests) if rated_tests else None
-        
-        quality_tests = [t for t in tests if t.quality_score]
-        avg_quality = sum(t.quality_score for t in quality_tests) / len(quality_tests) if quality_tests else None
+        test_types = db.session.execute(
+            db.select(TestResult.test_type).where(in_session).distinct()
+        ).scalars().all()
         
         analysis = {
             'session_id': session_id,
-            'total_tests': total_tests,
-            'avg_response_time': avg_response_time,
-            'total_cost': total_cost,
-            'avg_input_tokens': avg_input_tokens,
-            'avg_output_tokens': avg_output_tokens,
-            'avg_rating': avg_rating,
-            'avg_quality_score': avg_quality,
-            'models_tested': list(set(t.model_name for t in tests)),
-            'test_types': list(set(t.test_type for t in tests))
+            'total_tests': overall['count'],
+            'avg_response_time': overall['avg_response_time'],
+            'p50_response_time': overall['p50_response_time'],
+            'p95_response_time': overall['p95_response_time'],
+            'p99_response_time': overall['p99_response_time'],
+            'total_cost': overall['total_cost'],
+            'cost_per_1k_tokens': overall['cost_per_1k_tokens'],
+            'avg_input_tokens': overall['avg_input_tokens'],
+            'avg_output_tokens': overall['avg_output_tokens'],
+            'avg_rating': overall['avg_rating'],
+            'avg_quality_score': overall['avg_quality'],
+            'avg_consistency_score': overall['avg_consistency'],
+            'models_tested': list(model_stats),
+            'test_types': test_types,
+            'model_stats': model_stats
         }
         
         return jsonify(analysis)
@@ -190,52 +249,20 @@ def analyze_test_session(session_id):
 def get_prompt_test_stats(prompt_id):
     """Get testing statistics for a specific prompt"""
     try:
-        prompt = Prompt.query.get_or_404(prompt_id)
-        tests = TestResult.query.filter_by(prompt_id=prompt_id).all()
+        Prompt.query.get_or_404(prompt_id)
+        overall, model_stats = test_stats(TestResult.prompt_id == prompt_id)
         
-        if not tests:
+        if not model_stats:
             return jsonify({
                 'prompt_id': prompt_id,
                 'total_tests': 0,
                 'stats': {}
             })
         
-        # Group by model
-        model_stats = {}
-        for test in tests:
-            model = test.model_name
-            if model not in model_stats:
-                model_stats[model] = {
-                    'count': 0,
-                    'avg_response_time': 0,
-                    'total_cost': 0,
-                    'avg_rating': 0,
-                    'avg_quality': 0
-                }
-            
-            stats = model_stats[model]
-            stats['count'] += 1
-            if test.response_time:
-                stats['avg_response_time'] += test.response_time
-            if test.cost:
-                stats['total_cost'] += test.cost
-            if test.user_rating:
-                stats['avg_rating'] += test.user_rating
-            if test.quality_score:
-                stats['avg_quality'] += test.quality_score
-        
-        # Calculate averages
-        for model, stats in model_stats.items():
-            count = stats['count']
-            stats['avg_response_time'] = stats['avg_response_time'] / count
-            stats['avg_rating'] = stats['avg_rating'] / count if stats['avg_rating'] > 0 else None
-            stats['avg_quality'] = stats['avg_quality'] / count if stats['avg_quality'] > 0 else None
-        
         return jsonify({
             'prompt_id': prompt_id,
-            'total_tests': len(tests),
+            'total_tests': overall['count'],
             'model_stats': model_stats
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
@@ -0,0 +1,114 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from ..models.user import db
+from ..models.prompt import Prompt, Category, PromptTemplate, Shortcut, TestResult
+from ..services.ingest import ndjson_line, record_reader
+from ..services.importer import PromptImporter
+from sqlalchemy.orm import selectinload
+from datetime import datetime
+import zlib
+
+transfer_bp = Blueprint('transfer', __name__)
+
+# Rows fetched per round-trip while exporting
+EXPORT_BATCH_SIZE = 500
+
+# Export sections in dependency order: (type, model, to_dict fields)
+EXPORT_SECTIONS = [
+    ('category', Category, None),
+    # Categories are exported on their own, so prompts skip the nested copy
+    ('prompt', Prompt, [field for field in Prompt.SERIALIZABLE_FIELDS if field != 'category']),
+    ('template', PromptTemplate, None),
+    ('shortcut', Shortcut, None),
+    ('test_result', TestResult, None),
+]
+
+# Relationships serialized by to_dict(), loaded once per batch
+EXPORT_EAGER_LOADS = {
+    Prompt: [selectinload(Prompt.tag_links)],
+    TestResult: [selectinload(TestResult.system_message_blob), selectinload(TestResult.user_message_blob)],
+}
+
+def export_records(model, fields=None):
+    """Serialized rows of a model, fetched from the database in batches"""
+    result = db.session.execute(
+        db.select(model).options(*EXPORT_EAGER_LOADS.get(model, ()))
+        .order_by(model.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for row in result.scalars():
+        yield row.to_dict(fields) if fields else row.to_dict()
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@transfer_bp.route('/export', methods=['GET'])
+def export_library():
+    """
+    Stream the whole library as NDJSON.
+
+    The first line describes the export; every following line is
+    ``{"type": ..., "data": {...}}`` for a category, prompt (every version),
+    template, shortcut or test result. ``types=prompt,template`` limits the
+    sections and ``gzip=true`` downloads a compressed .ndjson.gz file.
+    """
+    requested = request.args.get('types')
+    sections = EXPORT_SECTIONS
+    if requested:
+        types = {t.strip() for t in requested.split(',') if t.strip()}
+        unknown = types - {name for name, _, _ in EXPORT_SECTIONS}
+        if unknown:
+            return jsonify({'error': f"Unknown types: {', '.join(sorted(unknown))}"}), 400
+        sections = [section for section in EXPORT_SECTIONS if section[0] in types]
+    
+    compress = request.args.get('gzip', 'false').lower() == 'true'
+    
+    def generate():
+        yield ndjson_line({'type': 'export', 'data': {
+            'format': 'promptlab-ndjson',
+            'version': 1,
+            'exported_at': datetime.utcnow().isoformat(),
+            'types': [name for name, _, _ in sections]
+        }})
+        for name, model, fields in sections:
+            for record in export_records(model, fields):
+                yield ndjson_line({'type': name, 'data': record})
+    
+    filename = 'promptlab-export.ndjson'
+    if compress:
+        response = Response(stream_with_context(gzip_stream(generate())), mimetype='application/gzip')
+        filename += '.gz'
+    else:
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@transfer_bp.route('/import', methods=['POST'])
+def import_prompts():
+    """
+    Import prompts from an NDJSON or CSV body (including /api/export files).
+
+    Rows are deduplicated by content against the library and each other,
+    categories are matched by name (``create_categories=false`` rejects
+    unknown names) and inserts are committed in batches. Returns counts,
+    throughput and the rejected rows.
+    """
+    reader = record_reader(request.content_type)
+    if reader is None:
+        return jsonify({'error': 'Send application/x-ndjson or text/csv'}), 415
+    
+    try:
+        importer = PromptImporter(
+            create_categories=request.args.get('create_categories', 'true').lower() == 'true',
+            dedupe=request.args.get('dedupe', 'true').lower() == 'true'
+        )
+        for number, record, error in reader(request.stream):
+            importer.add(number, record, error)
+        
+        return jsonify(importer.finish())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
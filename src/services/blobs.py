@@ -0,0 +1,88 @@
+"""
+Content-addressed text storage.
+
+Test results repeat the same system and user messages run after run, so
+messages are stored once in ``content_blobs`` under their SHA-256 and rows
+keep only the hash. Prompts keep their text inline (the search index and
+version deltas read it from ``prompts.content``) but record the same hash,
+so identical content can be found with an index lookup.
+"""
+
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from ..models.user import db
+from ..models.prompt import ContentBlob, Prompt, TestResult, content_hash
+
+# Hashes per IN (...) lookup
+LOOKUP_BATCH_SIZE = 500
+
+def _insert_ignoring_duplicates(dialect_name):
+    """INSERT that skips blobs another writer stored first"""
+    if dialect_name == 'sqlite':
+        return sqlite.insert(ContentBlob).on_conflict_do_nothing()
+    if dialect_name == 'postgresql':
+        return postgresql.insert(ContentBlob).on_conflict_do_nothing()
+    return db.insert(ContentBlob)
+
+def intern_texts(texts, conn=None):
+    """
+    Store each distinct text once, returning ``{text: hash}``.
+
+    Runs on ``conn`` when given (e.g. inside a migration), otherwise in the
+    current session's transaction. ``None`` texts are left out.
+    """
+    hashes = {}
+    for text in texts:
+        if text is not None and text not in hashes:
+            hashes[text] = content_hash(text)
+    if not hashes:
+        return hashes
+
+    executor = conn if conn is not None else db.session
+    by_hash = {digest: text for text, digest in hashes.items()}
+    digests = list(by_hash)
+    now = datetime.utcnow()
+    for start in range(0, len(digests), LOOKUP_BATCH_SIZE):
+        batch = digests[start:start + LOOKUP_BATCH_SIZE]
+        existing = set(executor.execute(
+            db.select(ContentBlob.hash).where(ContentBlob.hash.in_(batch))
+        ).scalars())
+        new_blobs = [
+            {'hash': digest, 'content': by_hash[digest], 'size': len(by_hash[digest].encode('utf-8')), 'created_at': now}
+            for digest in batch if digest not in existing
+        ]
+        if new_blobs:
+            dialect_name = executor.get_bind().dialect.name if conn is None else conn.dialect.name
+            executor.execute(_insert_ignoring_duplicates(dialect_name), new_blobs)
+    return hashes
+
+def message_hashes(system_message, user_message):
+    """Column values for a test result's messages"""
+    hashes = intern_texts((system_message, user_message))
+    return {
+        'system_message_hash': hashes.get(system_message),
+        'user_message_hash': hashes.get(user_message),
+    }
+
+def prune_blobs(conn=None):
+    """Delete blobs no test result references any more, returning how many went"""
+    executor = conn if conn is not None else db.session
+    referenced = db.union(
+        db.select(TestResult.system_message_hash).where(TestResult.system_message_hash.isnot(None)),
+        db.select(TestResult.user_message_hash).where(TestResult.user_message_hash.isnot(None))
+    )
+    result = executor.execute(db.delete(ContentBlob).where(ContentBlob.hash.not_in(referenced)))
+    return result.rowcount
+
+def content_usage(digest, heads_only=False):
+    """Prompts and test results whose content or messages have this hash"""
+    query = Prompt.query.filter(Prompt.content_hash == digest)
+    if heads_only:
+        query = query.filter(Prompt.is_head.is_(True))
+    prompts = query.order_by(Prompt.id).all()
+
+    test_counts = db.session.execute(db.select(
+        db.select(db.func.count()).where(TestResult.system_message_hash == digest).scalar_subquery(),
+        db.select(db.func.count()).where(TestResult.user_message_hash == digest).scalar_subquery()
+    )).one()
+    return prompts, {'system_message': test_counts[0], 'user_message': test_counts[1]}
@@ -0,0 +1,102 @@
+"""Small in-process caches shared by the services."""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import TextClause
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with explicit invalidation"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class WriteInvalidatedCache:
+    """
+    TTL cache emptied whenever this process commits a database write.
+
+    Writes committed by other workers are only picked up once entries
+    expire, so ``ttl`` (seconds) bounds how stale a cached value can be.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.ttl = ttl
+        self._entries = LRUCache(maxsize)
+        self._generation = 0
+        self._lock = Lock()
+        _write_invalidated.append(self)
+
+    def get_or_compute(self, key, compute):
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] == self._generation and entry[1] > now:
+            return entry[2]
+
+        generation = self._generation
+        value = compute()
+        # Not stored if a write committed while computing: it may predate it
+        if self.ttl > 0 and generation == self._generation:
+            self._entries.put(key, (generation, now + self.ttl, value))
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+        self._entries.clear()
+
+_write_invalidated = []
+
+READ_ONLY_PREFIXES = ('SELECT', 'PRAGMA', 'EXPLAIN')
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _note_write(conn, cursor, statement, parameters, context, executemany):
+    if conn.info.get('pending_write'):
+        return
+    if context is not None and context.compiled is not None and not isinstance(context.compiled.statement, TextClause):
+        wrote = context.isinsert or context.isupdate or context.isdelete or context.isddl
+    else:
+        # Raw SQL (driver strings and text() constructs) is classified by its first keyword
+        wrote = not statement.lstrip().upper().startswith(READ_ONLY_PREFIXES)
+    if wrote:
+        conn.info['pending_write'] = True
+
+@event.listens_for(Engine, 'commit')
+def _invalidate_on_commit(conn):
+    if conn.info.pop('pending_write', False):
+        for cache in _write_invalidated:
+            cache.invalidate()
+
+@event.listens_for(Engine, 'rollback')
+def _forget_write(conn):
+    conn.info.pop('pending_write', None)
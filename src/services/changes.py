@@ -0,0 +1,148 @@
+"""
+Change log for incremental client sync.
+
+Mutation routes append ``(entity, entity_id, action)`` rows to
+``change_log`` in the same transaction as the change itself, so a change
+is visible in the log exactly when it is committed. ``seq`` is an
+AUTOINCREMENT key: SQLite serializes writers, so sequence numbers appear
+in commit order and are never reused, and a client that has seen ``seq``
+N only needs the rows after N. Bulk paths (imports, NDJSON ingest,
+persisted template renders) log one row with a NULL ``entity_id``,
+meaning "many rows changed": a client reaching one is told to reset.
+Creating or deleting a prompt also logs an update to its category, whose
+``prompt_count`` changed. Use counts are buffered (see usage) and not
+logged.
+
+The log keeps the last CHANGE_LOG_MAX_ROWS rows; a client whose cursor
+predates them is told to reset and reload everything.
+"""
+
+import os
+from datetime import datetime
+from ..models.user import db
+from ..models.prompt import Prompt, Category, PromptTemplate, Shortcut, TestResult
+from .serializers import PromptRowSerializer, TemplateRowSerializer, TestRowSerializer
+
+CHANGE_LOG_MAX_ROWS = int(os.getenv('CHANGE_LOG_MAX_ROWS', '100000'))
+# Trim the log once per this many appended rows
+PRUNE_EVERY = 1000
+
+ACTIONS = ('create', 'update', 'delete')
+ENTITIES = ('prompt', 'template', 'test', 'category', 'shortcut')
+
+change_log = db.Table(
+    'change_log',
+    db.Column('seq', db.Integer, primary_key=True, autoincrement=True),
+    db.Column('entity', db.String(20), nullable=False),
+    db.Column('entity_id', db.Integer), # NULL when a bulk operation changed many rows
+    db.Column('action', db.String(10), nullable=False),
+    db.Column('created_at', db.DateTime, nullable=False, default=datetime.utcnow),
+    sqlite_autoincrement=True
+)
+
+def record_change(entity, action, target=None):
+    """
+    Log a change to one ``entity`` row in the current transaction.
+
+    ``target`` is the row's id or a model instance (flushed first when it has
+    no id yet); leave it out for bulk operations.
+    """
+    entity_id = target
+    if target is not None and not isinstance(target, int):
+        if target.id is None:
+            db.session.flush()
+        entity_id = target.id
+    record_changes(entity, action, [entity_id])
+
+def record_changes(entity, action, entity_ids):
+    """Log the same change to several rows in one executemany"""
+    if entity not in ENTITIES or action not in ACTIONS:
+        raise ValueError(f'Unknown change: {entity} {action}')
+    if not entity_ids:
+        return
+    now = datetime.utcnow()
+    result = db.session.execute(change_log.insert(), [
+        {'entity': entity, 'entity_id': entity_id, 'action': action, 'created_at': now}
+        for entity_id in entity_ids
+    ])
+    last_seq = latest_seq() if len(entity_ids) > 1 else result.inserted_primary_key[0]
+    if last_seq // PRUNE_EVERY != (last_seq - len(entity_ids)) // PRUNE_EVERY:
+        db.session.execute(change_log.delete().where(change_log.c.seq <= last_seq - CHANGE_LOG_MAX_ROWS))
+
+def record_prompt_count_change(*category_ids):
+    """Log an update to each category whose ``prompt_count`` a prompt create or delete changed"""
+    record_changes('category', 'update', sorted({category_id for category_id in category_ids if category_id is not None}))
+
+def latest_seq():
+    """Sequence number of the newest logged change (0 for an empty log)"""
+    return db.session.execute(db.select(db.func.coalesce(db.func.max(change_log.c.seq), 0))).scalar()
+
+def _columns_loader(serializer, model):
+    def load(ids):
+        rows = db.session.execute(db.select(*serializer.columns).where(model.id.in_(ids))).all()
+        return {data['id']: data for data in serializer.to_dicts(rows)}
+    return load
+
+def _tests_loader(ids):
+    serializer = TestRowSerializer()
+    rows = serializer.select_from(TestResult.query.filter(TestResult.id.in_(ids))).all()
+    return {data['id']: data for data in serializer.to_dicts(rows)}
+
+def _model_loader(model):
+    return lambda ids: {row.id: row.to_dict() for row in model.query.filter(model.id.in_(ids))}
+
+# entity -> function returning ``{id: current dict}`` for a list of ids
+RECORD_LOADERS = {
+    'prompt': _columns_loader(PromptRowSerializer(), Prompt),
+    'template': _columns_loader(TemplateRowSerializer(), PromptTemplate),
+    'test': _tests_loader,
+    'category': _model_loader(Category),
+    'shortcut': _model_loader(Shortcut),
+}
+
+def changes_since(since, limit):
+    """
+    Up to ``limit`` changes after ``since``, each carrying the entity's current
+    state as ``data`` (None once deleted, and for bulk entries).
+
+    Returns ``{'changes', 'last_seq', 'has_more', 'reset'}``; ``reset`` means
+    the log no longer covers ``since`` (pruned, or a different database) or
+    a bulk entry follows it, and the client must reload everything before
+    following ``last_seq``.
+    """
+    oldest, latest = db.session.execute(
+        db.select(db.func.min(change_log.c.seq), db.func.coalesce(db.func.max(change_log.c.seq), 0))
+    ).one()
+    if since > latest or (oldest is not None and since < oldest - 1):
+        return {'changes': [], 'last_seq': latest, 'has_more': False, 'reset': True}
+
+    rows = db.session.execute(
+        db.select(change_log).where(change_log.c.seq > since).order_by(change_log.c.seq).limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if any(row.entity_id is None for row in rows):
+        # Bulk entries do not say which rows changed
+        return {'changes': [], 'last_seq': latest, 'has_more': False, 'reset': True}
+
+    # Current state of each changed row, loaded once per entity
+    wanted = {}
+    for row in rows:
+        if row.entity_id is not None and row.action != 'delete':
+            wanted.setdefault(row.entity, set()).add(row.entity_id)
+    records = {entity: RECORD_LOADERS[entity](list(ids)) for entity, ids in wanted.items()}
+
+    changes = [{
+        'seq': row.seq,
+        'entity': row.entity,
+        'id': row.entity_id,
+        'action': row.action,
+        'at': row.created_at,
+        'data': records.get(row.entity, {}).get(row.entity_id),
+    } for row in rows]
+    return {
+        'changes': changes,
+        'last_seq': rows[-1].seq if rows else since,
+        'has_more': has_more,
+        'reset': False,
+    }
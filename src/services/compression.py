@@ -0,0 +1,104 @@
+"""
+Response compression.
+
+Buffered responses of a compressible type and at least COMPRESS_MIN_SIZE
+bytes are compressed on the fly with brotli (when the optional ``brotli``
+package is installed) or gzip, whichever the client's Accept-Encoding
+prefers. Streamed responses and files are left alone: NDJSON exports
+compress themselves on request, and static files are sent from
+precompressed ``.br`` / ``.gz`` siblings (see send_precompressed and
+database/compress_static.py).
+
+A compressed response's ETag gets the encoding appended ("<etag>-gzip"),
+so each representation keeps a distinct strong validator;
+encoded_etags() lists the variants a conditional request may carry.
+"""
+
+import gzip
+import mimetypes
+import os
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is offered instead
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+# Moderate levels: responses are compressed per request, and higher levels
+# cost large lists more time than they save on the wire
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '4'))
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'image/svg+xml', 'text/',
+)
+
+# Content-Encoding -> file suffix of a precompressed static sibling
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+def available_encodings():
+    """Encodings this process can produce, most preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate(encodings):
+    """The encoding among ``encodings`` the client accepts best, or None"""
+    return request.accept_encodings.best_match(encodings) if encodings else None
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical input, as a strong ETag requires
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def encoded_etags(etag):
+    """``etag`` and the variants compressed responses carry"""
+    return [etag] + [f'{etag}-{encoding}' for encoding in PRECOMPRESSED_SUFFIXES]
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+def compress_response(response):
+    """after_request hook compressing buffered responses the client can decode"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or not is_compressible(response.mimetype)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if request.method == 'HEAD' or response.calculate_content_length() < COMPRESS_MIN_SIZE:
+        return response
+    encoding = negotiate(available_encodings())
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+def init_compression(app):
+    app.after_request(compress_response)
+
+def send_precompressed(directory, path, **kwargs):
+    """send_from_directory(), preferring a ``.br`` / ``.gz`` sibling the client accepts"""
+    siblings = []
+    for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+        sibling = safe_join(directory, path + suffix)
+        if sibling and os.path.isfile(sibling):
+            siblings.append(encoding)
+    encoding = negotiate(siblings)
+    if encoding is None:
+        response = send_from_directory(directory, path, **kwargs)
+    else:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = send_from_directory(directory, path + PRECOMPRESSED_SUFFIXES[encoding], mimetype=mimetype, **kwargs)
+        response.headers['Content-Encoding'] = encoding
+    if siblings:
+        response.vary.add('Accept-Encoding')
+    return response
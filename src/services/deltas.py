@@ -0,0 +1,50 @@
+"""
+Line-based deltas for prompt version storage.
+
+A delta is a JSON list describing the new text in terms of its base: a
+``[start, end]`` pair copies base lines ``start:end`` and a string is
+inserted verbatim. Reconstructed texts are kept in a small LRU cache since
+stored versions never change.
+"""
+
+import json
+import os
+from difflib import SequenceMatcher
+from .cache import LRUCache
+
+# Longest run of deltas before a version is stored in full again
+MAX_DELTA_CHAIN = int(os.getenv('PROMPT_MAX_DELTA_CHAIN', '16'))
+
+# Only store a delta when it is meaningfully smaller than the full text
+MIN_DELTA_SAVINGS = 0.8
+
+def make_delta(base, text):
+    """Encode ``text`` as a delta against ``base``"""
+    base_lines = base.splitlines(keepends=True)
+    text_lines = text.splitlines(keepends=True)
+
+    ops = []
+    matcher = SequenceMatcher(None, base_lines, text_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            inserted = ''.join(text_lines[j1:j2])
+            if ops and isinstance(ops[-1], str):
+                ops[-1] += inserted
+            else:
+                ops.append(inserted)
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+def apply_delta(base, delta):
+    """Rebuild the text a delta was made from"""
+    base_lines = base.splitlines(keepends=True)
+    return ''.join(
+        op if isinstance(op, str) else ''.join(base_lines[op[0]:op[1]])
+        for op in json.loads(delta)
+    )
+
+def worth_storing(delta, text):
+    return len(delta) < len(text) * MIN_DELTA_SAVINGS
+
+content_cache = LRUCache(int(os.getenv('PROMPT_CONTENT_CACHE_SIZE', '1024')))
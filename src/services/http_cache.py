@@ -0,0 +1,125 @@
+"""
+HTTP conditional requests for list endpoints.
+
+On SQLite each table a list is built from has a row in ``table_versions``
+whose counter is bumped by triggers on every insert, update and delete.
+A list's strong ETag hashes the request URL with the counters of the
+tables it reads, so ``If-None-Match`` is checked with one small query and
+an unchanged list is answered with 304 before it is queried or
+serialized. Counters start at the creation time in milliseconds, so a
+recreated database never hands out an old ETag for different data.
+Other databases skip the check and always send the body.
+"""
+
+import hashlib
+import time
+from datetime import datetime
+from functools import wraps
+from flask import request, current_app
+from sqlalchemy import text
+from ..models.user import db
+from .compression import encoded_etags
+
+# Tables whose changes invalidate list ETags
+TRACKED_TABLES = ('prompts', 'categories', 'prompt_templates', 'tags', 'prompt_tags')
+
+table_versions = db.Table(
+    'table_versions',
+    db.Column('name', db.String(100), primary_key=True),
+    db.Column('version', db.Integer, nullable=False),
+    db.Column('changed_at', db.DateTime, nullable=False)
+)
+
+_BUMP = "UPDATE table_versions SET version = version + 1, changed_at = CURRENT_TIMESTAMP WHERE name = '{table}'"
+
+_versions_enabled = False
+
+def _trigger_statements(table):
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS table_versions_{table}_{suffix} AFTER {event} ON {table} BEGIN
+            {_BUMP.format(table=table)};
+        END
+        """
+        for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+    ]
+
+def init_table_versions():
+    """Seed the change counters and create their triggers (SQLite only)"""
+    global _versions_enabled
+    _versions_enabled = False
+
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    started = int(time.time() * 1000)
+    with db.engine.begin() as conn:
+        for table in TRACKED_TABLES:
+            conn.execute(
+                text("INSERT OR IGNORE INTO table_versions (name, version, changed_at) VALUES (:name, :version, :now)"),
+                {'name': table, 'version': started, 'now': datetime.utcnow()}
+            )
+            for statement in _trigger_statements(table):
+                conn.execute(text(statement))
+
+    _versions_enabled = True
+    return True
+
+def current_versions(tables):
+    """``(versions, last changed_at)`` for the given tables, or None when counters are unavailable"""
+    if not _versions_enabled:
+        return None
+    # Read in the request's transaction, before the list itself, so on
+    # SQLite the ETag describes the same snapshot the body is built from
+    rows = db.session.execute(
+        db.select(table_versions.c.version, table_versions.c.changed_at)
+        .where(table_versions.c.name.in_(tables))
+        .order_by(table_versions.c.name)
+    ).all()
+    return [version for version, _ in rows], max(changed_at for _, changed_at in rows)
+
+def list_etag(versions):
+    """Strong ETag for the current request URL at the given table versions"""
+    digest = hashlib.sha1(f'{request.full_path}|{versions}'.encode('utf-8')).hexdigest()
+    return digest[:32]
+
+def _validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Cacheable, but revalidated on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    # The body may be compressed per Accept-Encoding (a 304 skips compress_response)
+    response.vary.add('Accept-Encoding')
+    return response
+
+def conditional(*tables):
+    """
+    Answer GET requests for a list built from ``tables`` with ETag /
+    Last-Modified validators, and with 304 when the client's copy is current.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            state = current_versions(tables)
+            if state is None:
+                return view(*args, **kwargs)
+
+            versions, last_modified = state
+            etag = list_etag(versions)
+            # If-Modified-Since only counts when no ETag was sent
+            if request.if_none_match:
+                # The client may hold a compressed representation; answer with its ETag
+                matched = next((tag for tag in encoded_etags(etag) if request.if_none_match.contains_weak(tag)), None)
+            elif request.if_modified_since and last_modified <= request.if_modified_since.replace(tzinfo=None):
+                matched = etag
+            else:
+                matched = None
+            if matched:
+                return _validators(current_app.response_class(status=304), matched, last_modified)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,207 @@
+"""
+Bulk prompt import.
+
+Records from any ingest reader (NDJSON, CSV, Markdown folders, or the
+``/api/export`` format) are validated, deduplicated by a hash of their
+content and inserted with one executemany() and one commit per batch,
+instead of a session round-trip and commit per prompt. Categories are
+resolved by name from a single lookup and created on first use.
+"""
+
+import json
+import time
+from datetime import datetime
+from ..models.user import db
+from ..models.prompt import Prompt, Category, content_hash, normalize_tags
+from .ingest import INSERT_BATCH_SIZE
+from .tags import link_tags
+from .changes import record_change
+
+# Rejected rows reported back in full; the rest are only counted
+MAX_REPORTED_REJECTS = 100
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+
+def parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_VALUES
+    return bool(value)
+
+def parse_tags(value):
+    """Tags from a JSON list, a JSON-encoded list or a comma-separated string"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith('['):
+            try:
+                value = json.loads(text)
+            except ValueError:
+                value = text.strip('[]').split(',')
+        else:
+            value = text.split(',')
+    if not isinstance(value, list):
+        raise ValueError('tags must be a list or a comma-separated string')
+    return [str(tag).strip().strip('"\'') for tag in value if str(tag).strip().strip('"\'')]
+
+def parse_datetime(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+class PromptImporter:
+    """
+    Accumulates prompt records and writes them in batches.
+
+    Call add() for each ``(record_number, record, error)`` from a reader
+    and finish() once at the end; summary() reports what happened.
+    """
+
+    def __init__(self, batch_size=INSERT_BATCH_SIZE, create_categories=True, dedupe=True):
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.dedupe = dedupe
+        self.pending = []
+        self.pending_tags = []  # tag names per pending row
+        self.imported = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.rejected = []
+        self.rejected_count = 0
+        self.categories_created = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        # Lower-cased name -> id for every category, loaded once
+        self.category_ids = {
+            name.lower(): category_id
+            for category_id, name in db.session.execute(db.select(Category.id, Category.name))
+        }
+        # Category ids of an imported export file -> names, from its category lines
+        self.export_categories = {}
+        self.seen_hashes = self._existing_hashes() if dedupe else set()
+
+    def _existing_hashes(self):
+        """Content hashes of the current HEAD prompts"""
+        return set(db.session.execute(
+            db.select(Prompt.content_hash).where(Prompt.is_head.is_(True))
+        ).scalars())
+
+    def reject(self, number, error):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTS:
+            self.rejected.append({'record': number, 'error': error})
+
+    def resolve_category(self, name):
+        key = name.strip().lower()
+        if not key:
+            return None
+        if key not in self.category_ids:
+            if not self.create_categories:
+                raise ValueError(f"Unknown category '{name.strip()}'")
+            category = Category(name=name.strip())
+            db.session.add(category)
+            db.session.flush()
+            record_change('category', 'create', category.id)
+            self.category_ids[key] = category.id
+            self.categories_created += 1
+        return self.category_ids[key]
+
+    def unwrap(self, record):
+        """The prompt inside an export line, or None for lines that are not imported"""
+        if 'type' not in record or 'data' not in record:
+            return record
+        data = record['data']
+        if record['type'] == 'category' and isinstance(data, dict):
+            self.export_categories[data.get('id')] = data.get('name')
+            return None
+        if record['type'] != 'prompt' or not isinstance(data, dict) or data.get('is_head') is False:
+            # Older versions and non-prompt records are not imported
+            return None
+        data = dict(data)
+        if not data.get('category') and data.get('category_id') in self.export_categories:
+            data['category'] = self.export_categories[data['category_id']]
+        return data
+
+    def prompt_row(self, record):
+        content = record.get('content')
+        if not isinstance(content, str) or not content.strip():
+            raise ValueError('content is required')
+        title = (record.get('title') or '').strip() or content.strip().split('\n', 1)[0][:200]
+        if len(title) > 200:
+            raise ValueError('title is longer than 200 characters')
+
+        category = record.get('category')
+        if isinstance(category, dict):
+            category = category.get('name')
+        category_id = self.resolve_category(str(category)) if category else None
+
+        return {
+            'title': title,
+            'content': content,
+            'description': record.get('description') or None,
+            'author': record.get('author') or None,
+            'source': record.get('source') or None,
+            'category_id': category_id,
+            'is_favorite': parse_bool(record.get('is_favorite', False)),
+            'is_template': parse_bool(record.get('is_template', False)),
+            'version': record.get('version') or '1.0.0',
+            'original_creation_date': parse_datetime(record.get('original_creation_date')),
+        }
+
+    def add(self, number, record, error=None):
+        if error:
+            self.reject(number, error)
+            return
+        record = self.unwrap(record)
+        if record is None:
+            self.skipped += 1
+            return
+        try:
+            row = self.prompt_row(record)
+            tags = normalize_tags(parse_tags(record.get('tags')))
+        except (ValueError, TypeError) as e:
+            self.reject(number, str(e))
+            return
+
+        digest = row['content_hash'] = content_hash(row['content'])
+        if self.dedupe:
+            if digest in self.seen_hashes:
+                self.duplicates += 1
+                return
+            self.seen_hashes.add(digest)
+
+        self.pending.append(row)
+        self.pending_tags.append(tags)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert the pending rows (and their tags) in one executemany() each and commit them"""
+        if self.pending:
+            table = Prompt.__table__
+            # Ids come back in insertion order within the transaction
+            ids = sorted(db.session.execute(table.insert().returning(table.c.id), self.pending).scalars())
+            link_tags({prompt_id: tags for prompt_id, tags in zip(ids, self.pending_tags) if tags})
+            self.imported += len(self.pending)
+            self.pending = []
+            self.pending_tags = []
+            record_change('prompt', 'create')
+        db.session.commit()
+
+    def finish(self):
+        self.flush()
+        self.elapsed = time.perf_counter() - self.started
+        return self.summary()
+
+    def summary(self):
+        elapsed = self.elapsed or (time.perf_counter() - self.started)
+        return {
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'skipped': self.skipped,
+            'rejected_count': self.rejected_count,
+            'rejected': self.rejected,
+            'categories_created': self.categories_created,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.imported / elapsed, 1) if elapsed else None
+        }
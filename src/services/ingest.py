@@ -0,0 +1,126 @@
+"""
+Streaming readers for bulk request bodies and import files.
+
+Bodies are consumed record by record from the request stream, so memory
+use does not grow with the upload. Each reader yields
+``(record_number, record, error)`` with exactly one of ``record`` / ``error``
+set, letting callers report bad rows without aborting the whole upload.
+"""
+
+import csv
+import io
+import json
+import os
+from .json_provider import dumps
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+# Rows per executemany() for bulk inserts
+INSERT_BATCH_SIZE = 1000
+
+def text_stream(binary_stream):
+    return io.TextIOWrapper(binary_stream, encoding='utf-8', newline='')
+
+def iter_ndjson(binary_stream):
+    """One JSON object per line; blank lines are skipped"""
+    for number, line in enumerate(text_stream(binary_stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield number, None, 'Expected a JSON object'
+            continue
+        yield number, record, None
+
+def iter_csv(binary_stream):
+    """CSV with a header row naming the fields"""
+    reader = csv.DictReader(text_stream(binary_stream))
+    for number, row in enumerate(reader, start=1):
+        if None in row:
+            yield number, None, 'More values than header columns'
+            continue
+        if None in row.values():
+            yield number, None, 'Fewer values than header columns'
+            continue
+        yield number, row, None
+
+def record_reader(content_type):
+    """Reader for a request Content-Type, or None when unsupported"""
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    if mimetype in NDJSON_TYPES:
+        return iter_ndjson
+    if mimetype in CSV_TYPES:
+        return iter_csv
+    return None
+
+def ndjson_line(payload):
+    return dumps(payload) + '\n'
+
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+
+def parse_front_matter(text):
+    """
+    Split ``---`` delimited front matter from a Markdown document.
+
+    Only flat ``key: value`` lines are understood; ``[a, b]`` and
+    comma-separated values are left as strings for the caller to split.
+    """
+    lines = text.split('\n')
+    if not lines or lines[0].strip() != '---':
+        return {}, text
+    for end in range(1, len(lines)):
+        if lines[end].strip() == '---':
+            break
+    else:
+        return {}, text
+    meta = {}
+    for line in lines[1:end]:
+        key, sep, value = line.partition(':')
+        if sep and key.strip():
+            meta[key.strip().lower()] = value.strip().strip('"\'')
+    return meta, '\n'.join(lines[end + 1:]).lstrip('\n')
+
+def markdown_record(path, root):
+    """
+    Prompt record for one Markdown file: front matter fields, a title from
+    the front matter, first ``# heading`` or file name, and the category
+    from the front matter or the file's folder below ``root``.
+    """
+    with open(path, encoding='utf-8') as f:
+        meta, body = parse_front_matter(f.read().replace('\r\n', '\n'))
+    record = dict(meta)
+    if 'title' not in record:
+        first_line = body.split('\n', 1)[0]
+        if first_line.startswith('# '):
+            record['title'] = first_line[2:].strip()
+            body = body.split('\n', 1)[1].lstrip('\n') if '\n' in body else ''
+        else:
+            record['title'] = os.path.splitext(os.path.basename(path))[0]
+    if 'category' not in record:
+        folder = os.path.relpath(os.path.dirname(path), root)
+        if folder != os.curdir:
+            record['category'] = folder.split(os.sep)[0]
+    record['content'] = body.strip('\n')
+    record.setdefault('source', os.path.relpath(path, root))
+    return record
+
+def iter_markdown_folder(root):
+    """Every Markdown file below a folder, in a stable order"""
+    number = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(MARKDOWN_SUFFIXES):
+                continue
+            number += 1
+            path = os.path.join(dirpath, filename)
+            try:
+                yield number, markdown_record(path, root), None
+            except (OSError, UnicodeDecodeError) as e:
+                yield number, None, f'{path}: {e}'
@@ -0,0 +1,83 @@
+"""
+JSON encoding for API responses.
+
+FastJSONProvider replaces Flask's default provider. It encodes with orjson
+when that package is installed (set ``JSON_ENCODER=stdlib`` to opt out)
+and falls back to the stdlib encoder otherwise, or for values orjson
+rejects such as integers beyond 64 bits. Either way dates and datetimes
+are written as ISO 8601, so serializers can hand datetime values straight
+to the encoder instead of calling isoformat() per field.
+"""
+
+import json
+import os
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+def use_orjson():
+    return orjson is not None and os.getenv('JSON_ENCODER', 'orjson').lower() != 'stdlib'
+
+def dumps(obj):
+    """Compact JSON text for non-response output such as NDJSON lines"""
+    if use_orjson():
+        try:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, default=_default)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that encodes with orjson when available"""
+
+    default = staticmethod(_default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.fast = use_orjson()
+
+    def _options(self, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # Only plain calls take the fast path; custom arguments need the stdlib encoder
+        if self.fast and not kwargs:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+            except orjson.JSONEncodeError:
+                pass
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.fast and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not self.fast:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self._options(pretty) | orjson.OPT_APPEND_NEWLINE)
+        except orjson.JSONEncodeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
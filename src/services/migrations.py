@@ -0,0 +1,249 @@
+"""
+Versioned schema migrations for existing databases.
+
+``db.create_all()`` only creates missing tables, so new columns and indexes
+on existing tables are added here. Each migration runs once, in order, at
+startup and is recorded in ``schema_migrations``. Migrations must also be
+safe on a fresh database, where ``create_all()`` already built the latest
+schema.
+"""
+
+import json
+from datetime import datetime
+from sqlalchemy import inspect, text
+from ..models.user import db
+from ..models.prompt import Prompt, TestResult, PromptTemplate, Shortcut, Tag, PromptTag, content_hash, normalize_tags
+from .blobs import intern_texts
+from .cache import LRUCache
+from .deltas import apply_delta
+from .rollups import rollup_days
+from .search import FTS_TABLE, index_delta_versions
+
+# Rows read and rewritten per statement by data migrations
+BACKFILL_BATCH_SIZE = 1000
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('name', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+def _column_names(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+def _create_indexes(conn, model):
+    """Create a model's missing indexes, skipping those on columns a later migration adds"""
+    existing_columns = _column_names(conn, model.__tablename__)
+    for index in model.__table__.indexes:
+        if all(column.name in existing_columns for column in index.columns):
+            index.create(conn, checkfirst=True)
+
+def add_prompt_head_columns(conn):
+    """Add and backfill prompts.is_head / prompts.root_id for version chains"""
+    if 'is_head' in _column_names(conn, 'prompts'):
+        return
+
+    conn.execute(text("ALTER TABLE prompts ADD COLUMN is_head BOOLEAN NOT NULL DEFAULT TRUE"))
+    conn.execute(text("ALTER TABLE prompts ADD COLUMN root_id INTEGER"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_prompts_is_head ON prompts (is_head)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_prompts_root_id ON prompts (root_id)"))
+
+    # A prompt is HEAD while no other prompt names it as parent
+    conn.execute(text("""
+        UPDATE prompts SET is_head = NOT EXISTS (
+            SELECT 1 FROM prompts AS child WHERE child.parent_id = prompts.id
+        )
+    """))
+
+    # Walk each chain from its root (no parent, or a deleted parent) down
+    conn.execute(text("""
+        WITH RECURSIVE chain(id, root_id) AS (
+            SELECT id, id FROM prompts
+            WHERE parent_id IS NULL OR parent_id NOT IN (SELECT id FROM prompts)
+            UNION ALL
+            SELECT prompts.id, chain.root_id
+            FROM prompts JOIN chain ON prompts.parent_id = chain.id
+        )
+        UPDATE prompts SET root_id = (
+            SELECT NULLIF(chain.root_id, prompts.id) FROM chain WHERE chain.id = prompts.id
+        )
+    """))
+
+def add_prompt_delta_columns(conn):
+    """Add prompts.content_delta / prompts.delta_depth; existing versions stay stored in full"""
+    if 'content_delta' in _column_names(conn, 'prompts'):
+        return
+
+    conn.execute(text("ALTER TABLE prompts ADD COLUMN content_delta TEXT"))
+    conn.execute(text("ALTER TABLE prompts ADD COLUMN delta_depth INTEGER NOT NULL DEFAULT 0"))
+
+def add_query_indexes(conn):
+    """Create the indexes declared on the models for the routes' filter/sort patterns"""
+    # Superseded by the composite ix_prompts_head_recent
+    conn.execute(text("DROP INDEX IF EXISTS ix_prompts_is_head"))
+
+    for model in (Prompt, TestResult, PromptTemplate, Shortcut):
+        _create_indexes(conn, model)
+
+    if conn.dialect.name == 'sqlite':
+        # Give the planner row estimates for the new indexes
+        conn.execute(text("ANALYZE"))
+
+def backfill_prompt_hashes(conn):
+    """Set prompts.content_hash where missing, rebuilding delta-stored versions"""
+    contents = LRUCache(4096)
+
+    def full_content(prompt_id):
+        content = contents.get(prompt_id)
+        if content is None:
+            row = conn.execute(
+                text("SELECT parent_id, content, content_delta FROM prompts WHERE id = :id"), {'id': prompt_id}
+            ).one()
+            content = row.content if row.content_delta is None else apply_delta(full_content(row.parent_id), row.content_delta)
+            contents.put(prompt_id, content)
+        return content
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT id, parent_id, content, content_delta FROM prompts
+            WHERE content_hash IS NULL AND id > :last_id ORDER BY id LIMIT :batch_size
+        """), {'last_id': last_id, 'batch_size': BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            return
+
+        updates = []
+        for row in rows:
+            content = row.content if row.content_delta is None else apply_delta(full_content(row.parent_id), row.content_delta)
+            contents.put(row.id, content)
+            updates.append({'id': row.id, 'content_hash': content_hash(content)})
+        conn.execute(text("UPDATE prompts SET content_hash = :content_hash WHERE id = :id"), updates)
+        last_id = rows[-1].id
+
+def move_inline_test_messages(conn):
+    """Replace inline test result messages with content_blobs references, returning rows moved"""
+    moved = 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT id, system_message, user_message FROM test_results
+            WHERE system_message IS NOT NULL OR user_message IS NOT NULL
+            ORDER BY id LIMIT :batch_size
+        """), {'batch_size': BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            return moved
+
+        hashes = intern_texts((message for row in rows for message in (row.system_message, row.user_message)), conn)
+        conn.execute(text("""
+            UPDATE test_results SET
+                system_message_hash = COALESCE(:system_message_hash, system_message_hash),
+                user_message_hash = COALESCE(:user_message_hash, user_message_hash),
+                system_message = NULL,
+                user_message = NULL
+            WHERE id = :id
+        """), [
+            {'id': row.id, 'system_message_hash': hashes.get(row.system_message), 'user_message_hash': hashes.get(row.user_message)}
+            for row in rows
+        ])
+        moved += len(rows)
+
+def add_content_hashes(conn):
+    """Hash prompt content and move test result messages into content_blobs"""
+    if 'content_hash' not in _column_names(conn, 'prompts'):
+        conn.execute(text("ALTER TABLE prompts ADD COLUMN content_hash VARCHAR(64)"))
+    if 'system_message_hash' not in _column_names(conn, 'test_results'):
+        conn.execute(text("ALTER TABLE test_results ADD COLUMN system_message_hash VARCHAR(64) REFERENCES content_blobs (hash)"))
+        conn.execute(text("ALTER TABLE test_results ADD COLUMN user_message_hash VARCHAR(64) REFERENCES content_blobs (hash)"))
+
+    backfill_prompt_hashes(conn)
+    move_inline_test_messages(conn)
+
+    for model in (Prompt, TestResult):
+        _create_indexes(conn, model)
+
+def recompute_rollups(conn):
+    """Have the next refresh recompute every rolled-up day (test cost was added)"""
+    conn.execute(rollup_days.delete())
+
+def _legacy_tag_names(value):
+    try:
+        names = json.loads(value)
+    except ValueError:
+        names = value.split(',')
+    if names is None:
+        return []
+    return normalize_tags(names if isinstance(names, list) else [names])
+
+def move_prompt_tags(conn):
+    """Copy the JSON prompts.tags column into tags / prompt_tags and drop it"""
+    if 'tags' not in _column_names(conn, 'prompts'):
+        return
+    tags, links = Tag.__table__, PromptTag.__table__
+    tag_ids = dict(conn.execute(db.select(tags.c.name, tags.c.id)).all())
+    created_at = datetime.utcnow()
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT id, tags FROM prompts
+            WHERE id > :last_id AND tags IS NOT NULL AND tags NOT IN ('', '[]')
+            ORDER BY id LIMIT :limit
+        """), {'last_id': last_id, 'limit': BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+        batch = []
+        for row in rows:
+            for position, name in enumerate(_legacy_tag_names(row.tags)):
+                if name not in tag_ids:
+                    tag_ids[name] = conn.execute(
+                        tags.insert().values(name=name, created_at=created_at)
+                    ).inserted_primary_key[0]
+                batch.append({'prompt_id': row.id, 'tag_id': tag_ids[name], 'position': position})
+        if batch:
+            conn.execute(links.insert(), batch)
+        last_id = rows[-1].id
+
+    # SQLite can drop columns from 3.35 on; older versions just keep the unused column
+    if conn.dialect.name != 'sqlite' or conn.dialect.server_version_info >= (3, 35):
+        conn.execute(text("ALTER TABLE prompts DROP COLUMN tags"))
+
+def reindex_delta_versions(conn):
+    """Index the rebuilt content of delta-stored versions; init_search_index recreates the triggers"""
+    if conn.dialect.name != 'sqlite' or not conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+    ).first():
+        return
+
+    conn.execute(text("DROP TRIGGER IF EXISTS prompts_fts_ad"))
+    conn.execute(text("DROP TRIGGER IF EXISTS prompts_fts_au"))
+    index_delta_versions(conn)
+
+# (version, name, upgrade function) - append only, never renumber
+MIGRATIONS = [
+    (1, 'prompt version heads', add_prompt_head_columns),
+    (2, 'prompt content deltas', add_prompt_delta_columns),
+    (3, 'hot query indexes', add_query_indexes),
+    (4, 'content-addressed blobs', add_content_hashes),
+    (5, 'test cost rollups', recompute_rollups),
+    (6, 'normalized prompt tags', move_prompt_tags),
+    (7, 'search delta-stored versions', reindex_delta_versions),
+]
+
+def run_migrations():
+    """Apply pending migrations in order, returning the names of those applied"""
+    schema_migrations.create(db.engine, checkfirst=True)
+
+    with db.engine.connect() as conn:
+        applied_versions = set(conn.execute(db.select(schema_migrations.c.version)).scalars())
+
+    applied = []
+    for version, name, upgrade in MIGRATIONS:
+        if version in applied_versions:
+            continue
+        with db.engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        applied.append(name)
+    return applied
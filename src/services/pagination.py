@@ -0,0 +1,97 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints.
+
+A page is described by an ordering spec: a list of ``(column, descending)``
+pairs ending in a unique column. Descending columns sort NULLs last and
+ascending ones NULLs first, matching SQLite's native ordering. The cursor is
+an opaque token holding the sort values of the last row on the page, so the
+next page is a range seek on the ordering columns instead of an OFFSET scan.
+"""
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_, false
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def parse_page_size(limit):
+    """Clamp a requested page size, or return None when pagination was not requested"""
+    if limit is None:
+        return None
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def order_clauses(ordering):
+    """ORDER BY clauses for an ordering spec"""
+    return [
+        column.desc().nullslast() if descending else column.asc().nullsfirst()
+        for column, descending in ordering
+    ]
+
+def encode_cursor(values):
+    """Encode the sort values of a row into an opaque cursor token"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, types):
+    """
+    Decode a cursor token back into sort values.
+
+    ``types`` gives the Python type of each value so datetimes can be
+    restored. Raises ValueError for malformed or mismatched tokens.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError('Invalid cursor')
+
+    try:
+        return [_cursor_value(value, value_type) for value, value_type in zip(payload, types)]
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def _cursor_value(value, value_type):
+    """One decoded cursor slot as ``value_type``; raises TypeError when it has the wrong type"""
+    if value is None:
+        return None
+    if value_type is datetime:
+        return datetime.fromisoformat(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float) if value_type is float else value_type):
+        raise TypeError(f'Expected {value_type.__name__}, got {type(value).__name__}')
+    return value
+
+def _after(column, descending, value):
+    """Rows strictly after ``value`` in one column's sort order"""
+    if descending:
+        # NULLs sort last, so nothing follows a NULL
+        return false() if value is None else or_(column < value, column.is_(None))
+    return column.isnot(None) if value is None else column > value
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+def keyset_filter(ordering, values):
+    """Filter selecting the rows that follow the cursor position"""
+    clauses = []
+    for i, (column, descending) in enumerate(ordering):
+        prefix = [_equal(col, val) for (col, _), val in zip(ordering[:i], values[:i])]
+        clauses.append(and_(*prefix, _after(column, descending, values[i])))
+    return or_(*clauses)
+
+def paginate(query, ordering, limit, cursor_values=None):
+    """
+    Fetch one page of ``query`` in ``ordering`` order, starting after the cursor.
+
+    Returns the page rows and whether more rows follow; callers build the
+    next cursor from the sort values of the last row.
+    """
+    if cursor_values is not None:
+        query = query.filter(keyset_filter(ordering, cursor_values))
+    rows = query.order_by(*order_clauses(ordering)).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,255 @@
+"""
+Daily rollups for the analytics dashboard.
+
+``daily_rollups`` holds one row per (day, metric, dimension) with a count
+and a running total, so dashboard queries read a few rows per day instead
+of scanning the raw tables. Two kinds of metrics live there:
+
+* Usage metrics (``prompt_uses`` ...) are incremented when the usage buffer
+  flushes, in the same transaction as the use_count updates. Raw tables
+  only keep cumulative counters, so these cannot be recomputed.
+* Derived metrics (prompts created, tests per model, score/cost sums) are
+  recomputed from the raw tables for each closed UTC day by
+  refresh_rollups(). Days are marked in ``rollup_days`` once computed;
+  writes that change a past day (deletes, score edits, back-dated test
+  imports) call invalidate_days() so the next refresh recomputes it.
+
+Today is never rolled up for derived metrics; readers add it live from
+the raw tables, which stays cheap thanks to the created_at indexes.
+"""
+
+from datetime import datetime, date, timedelta
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from ..models.user import db
+from ..models.prompt import Prompt, TestResult
+
+USAGE_METRICS = {
+    'prompt': 'prompt_uses',
+    'template': 'template_uses',
+    'shortcut': 'shortcut_uses',
+}
+
+# Test columns rolled up per model as (non-NULL count, sum)
+TEST_VALUE_METRICS = {
+    'quality_score': TestResult.quality_score,
+    'consistency_score': TestResult.consistency_score,
+    'user_rating': TestResult.user_rating,
+    'cost': TestResult.cost,
+}
+
+DERIVED_METRICS = ('prompts_created', 'tests') + tuple(TEST_VALUE_METRICS)
+
+# Days per IN (...) list when rewriting rollups
+DAY_BATCH_SIZE = 500
+
+daily_rollups = db.Table(
+    'daily_rollups',
+    db.Column('day', db.Date, primary_key=True),
+    db.Column('metric', db.String(50), primary_key=True),
+    db.Column('dimension', db.String(100), primary_key=True), # e.g. model name; '' when unused
+    db.Column('count', db.Integer, nullable=False, default=0),
+    db.Column('total', db.Float, nullable=False, default=0)
+)
+
+rollup_days = db.Table(
+    'rollup_days',
+    db.Column('day', db.Date, primary_key=True),
+    db.Column('refreshed_at', db.DateTime, nullable=False)
+)
+
+def utc_today():
+    return datetime.utcnow().date()
+
+def as_date(value):
+    """func.date() returns strings on SQLite and dates elsewhere"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def _increment_statement(dialect_name):
+    """INSERT that adds to an existing (day, metric, dimension) row"""
+    if dialect_name in ('sqlite', 'postgresql'):
+        dialect = sqlite if dialect_name == 'sqlite' else postgresql
+        insert = dialect.insert(daily_rollups)
+        return insert.on_conflict_do_update(
+            index_elements=['day', 'metric', 'dimension'],
+            set_={
+                'count': daily_rollups.c.count + insert.excluded.count,
+                'total': daily_rollups.c.total + insert.excluded.total,
+            }
+        )
+    return None
+
+def record_daily_usage(conn, batch):
+    """Add a flushed usage batch (``{(kind, id): (count, last_used)}``) to the day it happened"""
+    per_day = {}
+    for (kind, target_id), (count, last_used) in batch.items():
+        key = (last_used.date(), USAGE_METRICS[kind])
+        per_day[key] = per_day.get(key, 0) + count
+    if not per_day:
+        return
+
+    rows = [
+        {'day': day, 'metric': metric, 'dimension': '', 'count': count, 'total': count}
+        for (day, metric), count in per_day.items()
+    ]
+    statement = _increment_statement(conn.dialect.name)
+    if statement is not None:
+        conn.execute(statement, rows)
+        return
+    for row in rows:
+        updated = conn.execute(daily_rollups.update().where(
+            daily_rollups.c.day == row['day'],
+            daily_rollups.c.metric == row['metric'],
+            daily_rollups.c.dimension == ''
+        ).values(count=daily_rollups.c.count + row['count'], total=daily_rollups.c.total + row['total']))
+        if not updated.rowcount:
+            conn.execute(daily_rollups.insert().values(**row))
+
+def invalidate_days(days):
+    """Have the next refresh recompute these days; runs in the caller's transaction"""
+    days = {as_date(day) for day in days if day is not None}
+    days.discard(utc_today())
+    if days:
+        db.session.execute(rollup_days.delete().where(rollup_days.c.day.in_(days)))
+
+def _derived_rows(conn, start, end, metrics=DERIVED_METRICS):
+    """Derived metric rows for the days in [start, end), computed from the raw tables"""
+    start_at = datetime.combine(start, datetime.min.time())
+    end_at = datetime.combine(end, datetime.min.time())
+
+    if 'prompts_created' in metrics:
+        yield from _prompt_rows(conn, start_at, end_at)
+    if any(metric in metrics for metric in ('tests',) + tuple(TEST_VALUE_METRICS)):
+        yield from (row for row in _test_rows(conn, start_at, end_at) if row['metric'] in metrics)
+
+def _prompt_rows(conn, start_at, end_at):
+    prompt_day = func.date(Prompt.created_at)
+    for day, count in conn.execute(
+        db.select(prompt_day, func.count(Prompt.id))
+        .where(Prompt.created_at >= start_at, Prompt.created_at < end_at)
+        .group_by(prompt_day)
+    ):
+        yield {'day': as_date(day), 'metric': 'prompts_created', 'dimension': '', 'count': count, 'total': count}
+
+def _test_rows(conn, start_at, end_at):
+    test_day = func.date(TestResult.created_at)
+    columns = [func.count(TestResult.id)]
+    for column in TEST_VALUE_METRICS.values():
+        columns += [func.count(column), func.coalesce(func.sum(column), 0)]
+    for day, model_name, tests, *scores in conn.execute(
+        db.select(test_day, TestResult.model_name, *columns)
+        .where(TestResult.created_at >= start_at, TestResult.created_at < end_at)
+        .group_by(test_day, TestResult.model_name)
+    ):
+        dimension = model_name or ''
+        yield {'day': as_date(day), 'metric': 'tests', 'dimension': dimension, 'count': tests, 'total': tests}
+        for index, metric in enumerate(TEST_VALUE_METRICS):
+            count, total = scores[2 * index], scores[2 * index + 1]
+            if count:
+                yield {'day': as_date(day), 'metric': metric, 'dimension': dimension, 'count': count, 'total': total}
+
+def refresh_rollups(rebuild=False):
+    """
+    Compute derived metrics for every closed day not yet rolled up.
+
+    Only missing or invalidated days are recomputed, so a regular refresh
+    touches one day of raw rows. Returns the number of days refreshed.
+    """
+    today = utc_today()
+    with db.engine.begin() as conn:
+        if rebuild:
+            conn.execute(daily_rollups.delete().where(daily_rollups.c.metric.in_(DERIVED_METRICS)))
+            conn.execute(rollup_days.delete())
+
+        first_created = conn.execute(db.select(
+            func.min(Prompt.created_at), db.select(func.min(TestResult.created_at)).scalar_subquery()
+        )).one()
+        first_day = min((as_date(value) for value in first_created if value is not None), default=None)
+        if first_day is None or first_day >= today:
+            return 0
+
+        # Usually every closed day is already marked; check that with one COUNT
+        closed_days = (today - first_day).days
+        marked = conn.execute(db.select(func.count()).select_from(rollup_days).where(
+            rollup_days.c.day >= first_day, rollup_days.c.day < today
+        )).scalar()
+        if marked >= closed_days:
+            return 0
+
+        done = set(as_date(day) for day in conn.execute(
+            db.select(rollup_days.c.day).where(rollup_days.c.day >= first_day)
+        ).scalars())
+        missing = [
+            first_day + timedelta(days=offset)
+            for offset in range(closed_days)
+            if first_day + timedelta(days=offset) not in done
+        ]
+        if not missing:
+            return 0
+
+        refreshed_at = datetime.utcnow()
+        for start in range(0, len(missing), DAY_BATCH_SIZE):
+            days = missing[start:start + DAY_BATCH_SIZE]
+            conn.execute(daily_rollups.delete().where(
+                daily_rollups.c.day.in_(days), daily_rollups.c.metric.in_(DERIVED_METRICS)
+            ))
+            conn.execute(rollup_days.insert(), [{'day': day, 'refreshed_at': refreshed_at} for day in days])
+
+        # Scan the raw tables once per run of consecutive missing days
+        run_start = previous = missing[0]
+        for day in missing[1:] + [None]:
+            if day is not None and day == previous + timedelta(days=1):
+                previous = day
+                continue
+            rows = list(_derived_rows(conn, run_start, previous + timedelta(days=1)))
+            if rows:
+                conn.execute(daily_rollups.insert(), rows)
+            run_start = previous = day
+        return len(missing)
+
+def ensure_rollups():
+    """Refresh before reading rollups; losing a race to another worker's refresh is fine"""
+    try:
+        return refresh_rollups()
+    except IntegrityError:
+        return 0
+
+def collect_metrics(metrics, start_day, end_day, per_day=False):
+    """
+    Sum rolled-up metrics over the days in [start_day, end_day].
+
+    Returns ``{(day, metric, dimension): [count, total]}``; ``day`` is None
+    unless ``per_day``. Derived metrics for today come from the raw tables.
+    """
+    today = utc_today()
+    usage = [metric for metric in metrics if metric not in DERIVED_METRICS]
+    derived = [metric for metric in metrics if metric in DERIVED_METRICS]
+    results = {}
+
+    def add(day, metric, dimension, count, total):
+        entry = results.setdefault((day if per_day else None, metric, dimension), [0, 0])
+        entry[0] += count or 0
+        entry[1] += total or 0
+
+    stored = db.or_(
+        daily_rollups.c.metric.in_(usage),
+        db.and_(daily_rollups.c.metric.in_(derived), daily_rollups.c.day < today)
+    )
+    group = [daily_rollups.c.metric, daily_rollups.c.dimension] + ([daily_rollups.c.day] if per_day else [])
+    for row in db.session.execute(
+        db.select(*group, func.sum(daily_rollups.c.count), func.sum(daily_rollups.c.total))
+        .where(stored, daily_rollups.c.day >= start_day, daily_rollups.c.day <= end_day)
+        .group_by(*group)
+    ):
+        add(as_date(row[2]) if per_day else None, row[0], row[1], row[-2], row[-1])
+
+    if derived and start_day <= today <= end_day:
+        for row in _derived_rows(db.session, today, today + timedelta(days=1), derived):
+            add(today, row['metric'], row['dimension'], row['count'], row['total'])
+    return results
+
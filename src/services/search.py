@@ -0,0 +1,263 @@
+"""
+Full-text search over prompts.
+
+On SQLite the prompts table is mirrored into an FTS5 index (``prompts_fts``)
+kept in sync by triggers, so searches are BM25-ranked index lookups instead
+of ``LIKE '%x%'`` scans. Other databases fall back to the LIKE filters.
+
+Superseded versions stored as deltas keep an empty ``content`` column, so
+the index holds their rebuilt content instead: the triggers leave a row's
+index entry alone when only its storage changes (prompt text never changes
+after insert), and ``index_delta_versions`` reindexes delta rows after a
+rebuild. A delta row must be stored in full again before it is deleted, so
+the delete trigger removes the tokens it was indexed with. Snippets read
+the stored column and have nothing to highlight for content matches in
+such rows; ``prompt_snippet`` builds those in Python.
+"""
+
+import re
+from sqlalchemy import text, or_
+from sqlalchemy.exc import OperationalError
+from ..models.user import db
+from ..models.prompt import Prompt
+from .cache import LRUCache
+from .deltas import apply_delta
+
+FTS_TABLE = 'prompts_fts'
+FTS_COLUMNS = ('title', 'content', 'description', 'author', 'source')
+
+# BM25 weight per column, in FTS_COLUMNS order (title matches rank highest)
+BM25_WEIGHTS = (10.0, 1.0, 4.0, 2.0, 1.0)
+
+SNIPPET_OPEN = '<mark>'
+SNIPPET_CLOSE = '</mark>'
+SNIPPET_TOKENS = 16
+
+# Delta-stored rows reindexed per statement
+REINDEX_BATCH_SIZE = 1000
+
+_fts_enabled = False
+
+_TOKEN_PATTERN = re.compile(r'"([^"]*)"?|(\S+)')
+_WORD_PATTERN = re.compile(r'\w', re.UNICODE)
+
+_FTS_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, description, author, source,
+        content='prompts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS prompts_fts_ai AFTER INSERT ON prompts BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content, description, author, source)
+        VALUES (new.id, new.title, new.content, new.description, new.author, new.source);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS prompts_fts_ad AFTER DELETE ON prompts
+    WHEN old.content_delta IS NULL BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, description, author, source)
+        VALUES ('delete', old.id, old.title, old.content, old.description, old.author, old.source);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS prompts_fts_au
+    AFTER UPDATE OF title, content, description, author, source ON prompts
+    WHEN old.content_delta IS NULL AND new.content_delta IS NULL BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, description, author, source)
+        VALUES ('delete', old.id, old.title, old.content, old.description, old.author, old.source);
+        INSERT INTO {FTS_TABLE}(rowid, title, content, description, author, source)
+        VALUES (new.id, new.title, new.content, new.description, new.author, new.source);
+    END
+    """,
+]
+
+def init_search_index():
+    """Create the FTS5 index and sync triggers, backfilling existing prompts on first run"""
+    global _fts_enabled
+    _fts_enabled = False
+
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).first() is not None
+
+            for statement in _FTS_SCHEMA:
+                conn.execute(text(statement))
+
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                index_delta_versions(conn)
+    except OperationalError:
+        # SQLite build without FTS5; searches use the LIKE fallback
+        return False
+
+    _fts_enabled = True
+    return True
+
+def index_delta_versions(conn):
+    """
+    Reindex delta-stored versions with their rebuilt content, replacing the
+    empty ``content`` a rebuild (or an older trigger) indexed them with
+    """
+    contents = LRUCache(4096)
+
+    def full_content(prompt_id):
+        content = contents.get(prompt_id)
+        if content is None:
+            row = conn.execute(
+                text("SELECT parent_id, content, content_delta FROM prompts WHERE id = :id"), {'id': prompt_id}
+            ).one()
+            content = row.content if row.content_delta is None else apply_delta(full_content(row.parent_id), row.content_delta)
+            contents.put(prompt_id, content)
+        return content
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT id, parent_id, title, content, content_delta, description, author, source FROM prompts
+            WHERE content_delta IS NOT NULL AND id > :last_id ORDER BY id LIMIT :batch_size
+        """), {'last_id': last_id, 'batch_size': REINDEX_BATCH_SIZE}).all()
+        if not rows:
+            return
+
+        stored = [dict(row._mapping) for row in rows]
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, description, author, source) "
+            f"VALUES ('delete', :id, :title, :content, :description, :author, :source)"
+        ), stored)
+        for values in stored:
+            values['content'] = apply_delta(full_content(values['parent_id']), values['content_delta'])
+            contents.put(values['id'], values['content'])
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, content, description, author, source) "
+            f"VALUES (:id, :title, :content, :description, :author, :source)"
+        ), stored)
+        last_id = rows[-1].id
+
+def search_index_enabled():
+    """Whether searches can use the FTS5 index"""
+    return _fts_enabled
+
+def build_match_expression(query_text):
+    """
+    Translate user search text into an FTS5 MATCH expression.
+
+    Quoted text is matched as an exact phrase; every other word is matched
+    as a prefix so partially typed words still hit. All terms must match.
+    Returns None when the text contains nothing searchable.
+    """
+    terms = []
+    for phrase, word in _TOKEN_PATTERN.findall(query_text or ''):
+        if phrase:
+            if _WORD_PATTERN.search(phrase):
+                terms.append('"' + phrase.replace('"', '""') + '"')
+        elif word:
+            word = word.strip('*')
+            if _WORD_PATTERN.search(word):
+                terms.append('"' + word.replace('"', '""') + '"*')
+
+    return ' AND '.join(terms) if terms else None
+
+def fts_subquery(match_expression, columns=None):
+    """
+    Subquery of (prompt_id, rank, snippet) for prompts matching the expression.
+
+    ``rank`` is the weighted BM25 score (lower is better) and ``snippet`` an
+    excerpt of the best matching column with the hits wrapped in <mark> tags.
+    """
+    if columns:
+        match_expression = '{' + ' '.join(columns) + '} : (' + match_expression + ')'
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    statement = text(
+        f"SELECT rowid AS prompt_id, "
+        f"bm25({FTS_TABLE}, {weights}) AS rank, "
+        f"snippet({FTS_TABLE}, -1, :snippet_open, :snippet_close, '…', :snippet_tokens) AS snippet "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+    ).bindparams(
+        match=match_expression,
+        snippet_open=SNIPPET_OPEN,
+        snippet_close=SNIPPET_CLOSE,
+        snippet_tokens=SNIPPET_TOKENS
+    ).columns(
+        prompt_id=db.Integer,
+        rank=db.Float,
+        snippet=db.Text
+    )
+    return statement.subquery('fts')
+
+def delta_content_matches(query_text):
+    """Ids of delta-stored versions whose rebuilt content contains the text"""
+    needle = query_text.lower()
+    return [
+        prompt.id for prompt in Prompt.query.filter(Prompt.content_delta.isnot(None))
+        if needle in prompt.get_content().lower()
+    ]
+
+def like_filter(query_text, columns, superseded=True):
+    """
+    LIKE-based fallback filter used when the FTS5 index is unavailable.
+
+    The stored content of delta versions is empty, so with ``superseded``
+    their rebuilt content is matched in Python; HEAD-only queries skip that.
+    """
+    conditions = [getattr(Prompt, column).contains(query_text) for column in columns]
+    if superseded and 'content' in columns:
+        conditions.append(Prompt.id.in_(delta_content_matches(query_text)))
+    return or_(*conditions)
+
+def prompt_snippet(prompt, snippet, query_text):
+    """The FTS5 ``snippet`` for a search hit, or one built from the rebuilt content of a delta row"""
+    if prompt.content_delta is None or SNIPPET_OPEN in (snippet or ''):
+        return snippet
+    return content_snippet(prompt.get_content(), query_text)
+
+def content_snippet(content, query_text):
+    """An excerpt of ``content`` around the first search term, highlighted like FTS5 snippets"""
+    patterns = []
+    for phrase, word in _TOKEN_PATTERN.findall(query_text or ''):
+        term = (phrase or word).strip('*')
+        if _WORD_PATTERN.search(term):
+            patterns.append(re.escape(term) + ('' if phrase else r'\w*'))
+    if not patterns:
+        return ''
+    pattern = re.compile(r'\b(?:' + '|'.join(patterns) + ')', re.IGNORECASE)
+    match = pattern.search(content)
+    if match is None:
+        return ''
+
+    # A window of SNIPPET_TOKENS words starting a few words before the first hit
+    words = list(re.finditer(r'\S+', content))
+    first = next(i for i, word in enumerate(words) if word.end() > match.start())
+    start = max(0, first - SNIPPET_TOKENS // 4)
+    end = min(len(words), start + SNIPPET_TOKENS)
+    excerpt = content[words[start].start():words[end - 1].end()]
+    excerpt = pattern.sub(lambda hit: SNIPPET_OPEN + hit.group(0) + SNIPPET_CLOSE, excerpt)
+    return ('…' if start > 0 else '') + excerpt + ('…' if end < len(words) else '')
+
+def apply_text_search(query, query_text, columns=FTS_COLUMNS, superseded=True):
+    """
+    Restrict a Prompt query to rows matching the search text.
+
+    Returns ``(query, fts)`` where ``fts`` is the joined FTS subquery (use
+    ``fts.c.rank`` to order by relevance and ``fts.c.snippet`` for
+    highlights), or None when the LIKE fallback was used. Pass
+    ``superseded=False`` when the query only returns HEAD versions.
+    """
+    if not search_index_enabled():
+        return query.filter(like_filter(query_text, columns, superseded)), None
+
+    match_expression = build_match_expression(query_text)
+    if match_expression is None:
+        return query, None
+
+    fts = fts_subquery(match_expression, columns)
+    return query.join(fts, fts.c.prompt_id == Prompt.id), fts
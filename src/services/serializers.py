@@ -0,0 +1,162 @@
+"""
+Column-level serializers for read-only list endpoints.
+
+List endpoints select plain columns and build response dicts straight from
+the result rows instead of constructing an ORM instance per row and calling
+its to_dict(). The dicts carry the same keys and values as to_dict(), with
+two shortcuts: datetimes are left as datetime objects for the JSON provider
+to write as ISO 8601 (see json_provider), and related data (tags, category
+dicts, message blobs) is fetched once per page instead of per row.
+"""
+
+import json
+from sqlalchemy.orm import aliased
+from ..models.user import db
+from ..models.prompt import Prompt, Category, Tag, PromptTag, TestResult, PromptTemplate, ContentBlob
+
+# Prompt ids per tag lookup, well under SQLite's bound parameter limit
+TAG_LOOKUP_CHUNK = 500
+
+def json_list(value):
+    return json.loads(value) if value else []
+
+class RowSerializer:
+    """
+    Turns rows of selected columns into dicts without building ORM instances.
+
+    ``fields`` is a list of ``(key, column, converter)``; the converter (or
+    None) is applied to the column's value. ``hidden`` columns are selected
+    after the output columns and readable by name on each row (e.g. keyset
+    ordering values for a pagination cursor) but left out of the dicts.
+    """
+
+    def __init__(self, fields, hidden=()):
+        self.keys = [key for key, _, _ in fields]
+        self.converters = [(key, converter) for key, _, converter in fields if converter]
+        self.columns = [column.label(key) for key, column, _ in fields]
+        self.columns += [column for column in hidden if column.key not in self.keys]
+
+    def to_dict(self, row):
+        data = dict(zip(self.keys, row))
+        for key, converter in self.converters:
+            data[key] = converter(data[key])
+        return data
+
+    def to_dicts(self, rows):
+        return [self.to_dict(row) for row in rows]
+
+def category_dicts(category_ids):
+    """``{id: Category.to_dict()}`` for the given ids, in one query"""
+    category_ids = {category_id for category_id in category_ids if category_id is not None}
+    if not category_ids:
+        return {}
+    categories = Category.query.filter(Category.id.in_(category_ids))
+    return {category.id: category.to_dict() for category in categories}
+
+def tag_names(prompt_ids):
+    """``{prompt_id: [tag name, ...]}`` in each prompt's tag order"""
+    names = {}
+    prompt_ids = list(prompt_ids)
+    for start in range(0, len(prompt_ids), TAG_LOOKUP_CHUNK):
+        rows = db.session.execute(
+            db.select(PromptTag.prompt_id, Tag.name)
+            .join(Tag, Tag.id == PromptTag.tag_id)
+            .where(PromptTag.prompt_id.in_(prompt_ids[start:start + TAG_LOOKUP_CHUNK]))
+            .order_by(PromptTag.prompt_id, PromptTag.position)
+        )
+        for prompt_id, name in rows:
+            names.setdefault(prompt_id, []).append(name)
+    return names
+
+class PromptRowSerializer(RowSerializer):
+    """Prompt.to_dict() from columns, for a subset of SERIALIZABLE_FIELDS"""
+
+    RELATED_FIELDS = ('tags', 'category')
+
+    def __init__(self, fields=None, hidden=()):
+        self.fields = list(fields or Prompt.SERIALIZABLE_FIELDS)
+        hidden = [Prompt.id, *hidden]
+        if 'content' in self.fields:
+            hidden.append(Prompt.content_delta)
+        if 'category' in self.fields:
+            hidden.append(Prompt.category_id)
+        super().__init__(
+            [(field, getattr(Prompt, field), None) for field in self.fields if field not in self.RELATED_FIELDS],
+            hidden
+        )
+
+    def to_dicts(self, rows):
+        tags = tag_names(row.id for row in rows) if 'tags' in self.fields else None
+        categories = category_dicts(row.category_id for row in rows) if 'category' in self.fields else None
+
+        result = []
+        for row in rows:
+            data = self.to_dict(row)
+            if 'content' in data and row.content_delta is not None:
+                # Older versions stored as deltas are rebuilt through the model
+                data['content'] = db.session.get(Prompt, row.id).get_content()
+            if tags is not None:
+                data['tags'] = tags.get(row.id, [])
+            if categories is not None:
+                data['category'] = categories.get(row.category_id)
+            result.append(data)
+        return result
+
+class TemplateRowSerializer(RowSerializer):
+    """PromptTemplate.to_dict() from columns"""
+
+    def __init__(self):
+        super().__init__([
+            ('id', PromptTemplate.id, None),
+            ('name', PromptTemplate.name, None),
+            ('content', PromptTemplate.content, None),
+            ('description', PromptTemplate.description, None),
+            ('variables', PromptTemplate.variables, json_list),
+            ('category_id', PromptTemplate.category_id, None),
+            ('created_at', PromptTemplate.created_at, None),
+            ('updated_at', PromptTemplate.updated_at, None),
+            ('use_count', PromptTemplate.use_count, None),
+        ])
+
+    def to_dicts(self, rows):
+        categories = category_dicts(row.category_id for row in rows)
+        result = []
+        for row in rows:
+            data = self.to_dict(row)
+            data['category'] = categories.get(row.category_id)
+            result.append(data)
+        return result
+
+system_blob = aliased(ContentBlob)
+user_blob = aliased(ContentBlob)
+
+class TestRowSerializer(RowSerializer):
+    """TestResult.to_dict() from columns, with messages resolved by outer joins on content_blobs"""
+
+    def __init__(self):
+        super().__init__([
+            ('id', TestResult.id, None),
+            ('prompt_id', TestResult.prompt_id, None),
+            ('model_name', TestResult.model_name, None),
+            ('temperature', TestResult.temperature, None),
+            ('max_tokens', TestResult.max_tokens, None),
+            ('system_message', db.func.coalesce(system_blob.content, TestResult.system_message), None),
+            ('user_message', db.func.coalesce(user_blob.content, TestResult.user_message), None),
+            ('model_response', TestResult.model_response, None),
+            ('response_time', TestResult.response_time, None),
+            ('token_count_input', TestResult.token_count_input, None),
+            ('token_count_output', TestResult.token_count_output, None),
+            ('cost', TestResult.cost, None),
+            ('user_rating', TestResult.user_rating, None),
+            ('quality_score', TestResult.quality_score, None),
+            ('consistency_score', TestResult.consistency_score, None),
+            ('test_type', TestResult.test_type, None),
+            ('test_session_id', TestResult.test_session_id, None),
+            ('created_at', TestResult.created_at, None),
+        ])
+
+    def select_from(self, query):
+        """``query`` (a TestResult query) reduced to this serializer's columns"""
+        return (query.with_entities(*self.columns)
+                .outerjoin(system_blob, system_blob.hash == TestResult.system_message_hash)
+                .outerjoin(user_blob, user_blob.hash == TestResult.user_message_hash))
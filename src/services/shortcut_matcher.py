@@ -0,0 +1,122 @@
+"""
+In-memory shortcut trigger matching.
+
+Active shortcuts are loaded once into a trie keyed on the *reversed*
+trigger, so finding the trigger a text ends with walks at most
+len(longest trigger) characters from the end of the text, independent of
+how many shortcuts exist. The trie is rebuilt after local shortcut changes
+and, at most every ``SHORTCUT_CACHE_CHECK_INTERVAL`` seconds, when a cheap
+fingerprint query shows another worker changed the table. The trie only
+holds shortcut ids; matched shortcuts are read from the table per request,
+so their use_count and last_used are current.
+"""
+
+import os
+import threading
+import time
+from sqlalchemy import func
+from ..models.user import db
+from ..models.prompt import Shortcut
+from .usage import usage_buffer
+
+CHECK_INTERVAL = float(os.getenv('SHORTCUT_CACHE_CHECK_INTERVAL', '1'))
+# Matched shortcut ids per lookup, well under SQLite's bound parameter limit
+LOAD_CHUNK = 500
+
+class SuffixTrie:
+    """Trie of reversed triggers supporting longest-suffix lookup"""
+
+    __slots__ = ('root', 'size')
+
+    def __init__(self, items=()):
+        self.root = {}
+        self.size = 0
+        for trigger, value in items:
+            self.add(trigger, value)
+
+    def add(self, trigger, value):
+        node = self.root
+        for char in reversed(trigger):
+            node = node.setdefault(char, {})
+        if None not in node:
+            self.size += 1
+        node[None] = value  # None never collides with a character key
+
+    def longest_suffix(self, text):
+        """(trigger length, value) of the longest trigger ``text`` ends with, or None"""
+        node = self.root
+        best = None
+        depth = 0
+        for char in reversed(text):
+            node = node.get(char)
+            if node is None:
+                break
+            depth += 1
+            if None in node:
+                best = (depth, node[None])
+        return best
+
+class ShortcutMatcher:
+    """Caches a SuffixTrie of active shortcuts and keeps it in sync with the table"""
+
+    def __init__(self):
+        self._trie = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Drop the cached trie; call after creating, updating or deleting shortcuts"""
+        with self._lock:
+            self._trie = None
+
+    def match(self, text):
+        """Longest active trigger ``text`` ends with, as {'match', 'position'}"""
+        return self.match_many([text])[0]
+
+    def match_many(self, texts):
+        trie = self._current_trie()
+        found = [trie.longest_suffix(text) if text else None for text in texts]
+        shortcuts = _load_shortcuts({hit[1] for hit in found if hit is not None})
+
+        results = []
+        for text, hit in zip(texts, found):
+            shortcut = shortcuts.get(hit[1]) if hit is not None else None
+            if shortcut is None:
+                results.append({'match': None})
+            else:
+                results.append({'match': shortcut, 'position': len(text) - hit[0]})
+        return results
+
+    def _current_trie(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._trie is not None and now - self._checked_at < CHECK_INTERVAL:
+                return self._trie
+
+            fingerprint = _table_fingerprint()
+            if self._trie is None or fingerprint != self._fingerprint:
+                self._trie = SuffixTrie(db.session.query(Shortcut.trigger, Shortcut.id).filter_by(is_active=True))
+                self._fingerprint = fingerprint
+            self._checked_at = now
+            return self._trie
+
+def _load_shortcuts(shortcut_ids):
+    """Current ``{id: to_dict()}`` of the matched shortcuts, with unflushed usage added"""
+    shortcut_ids = list(shortcut_ids)
+    shortcuts = {}
+    for start in range(0, len(shortcut_ids), LOAD_CHUNK):
+        rows = Shortcut.query.filter(
+            Shortcut.id.in_(shortcut_ids[start:start + LOAD_CHUNK]), Shortcut.is_active.is_(True)
+        )
+        for shortcut in rows:
+            shortcuts[shortcut.id] = usage_buffer.merge_into('shortcut', shortcut.to_dict())
+    return shortcuts
+
+def _table_fingerprint():
+    """Changes whenever a shortcut is created, updated or deleted (routes bump updated_at)"""
+    return tuple(db.session.query(
+        func.count(Shortcut.id), func.max(Shortcut.id), func.max(Shortcut.updated_at)
+    ).one())
+
+shortcut_matcher = ShortcutMatcher()
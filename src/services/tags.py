@@ -0,0 +1,72 @@
+"""
+Tag queries over the normalized ``tags`` / ``prompt_tags`` tables.
+
+``prompt_tags`` is an inverted index from tag to prompt: its
+(tag_id, prompt_id) index answers "which prompts carry this tag" with a
+single range read. Matching all of several tags INTERSECTs one such range
+per tag; matching any of them reads the ranges of every tag at once.
+Tags are compared by exact name.
+"""
+
+from sqlalchemy import func
+from ..models.user import db
+from ..models.prompt import Prompt, Tag, PromptTag
+
+def parse_tag_list(value):
+    """Tag names from a comma-separated string or a list"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    names = []
+    for name in value:
+        name = str(name).strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def _tag_id(name):
+    return db.select(Tag.id).where(Tag.name == name).scalar_subquery()
+
+def tag_filter(names, match_all=True):
+    """Criterion for prompts tagged with all (or, with ``match_all=False``, any) of ``names``"""
+    if match_all:
+        ranges = [db.select(PromptTag.prompt_id).where(PromptTag.tag_id == _tag_id(name)) for name in names]
+        prompt_ids = ranges[0] if len(ranges) == 1 else db.intersect(*ranges)
+    else:
+        prompt_ids = db.select(PromptTag.prompt_id).where(
+            PromptTag.tag_id.in_(db.select(Tag.id).where(Tag.name.in_(names)))
+        )
+    return Prompt.id.in_(prompt_ids)
+
+def tag_counts(heads_only=True, prefix=None, limit=None):
+    """``[(name, prompt count)]`` for tags in use, most used first"""
+    count = func.count(PromptTag.prompt_id)
+    query = db.select(Tag.name, count).join(PromptTag, PromptTag.tag_id == Tag.id)
+    if heads_only:
+        query = query.join(Prompt, Prompt.id == PromptTag.prompt_id).where(Prompt.is_head.is_(True))
+    if prefix:
+        query = query.where(Tag.name.startswith(prefix, autoescape=True))
+    query = query.group_by(Tag.id, Tag.name).order_by(count.desc(), Tag.name)
+    if limit:
+        query = query.limit(limit)
+    return db.session.execute(query).all()
+
+def link_tags(tags_by_prompt):
+    """Insert prompt_tags rows for ``{prompt_id: [name, ...]}`` in one executemany"""
+    names = []
+    for tag_names in tags_by_prompt.values():
+        names.extend(name for name in tag_names if name not in names)
+    if not names:
+        return 0
+
+    tags = Tag.for_names(names)
+    db.session.flush()
+    tag_ids = {tag.name: tag.id for tag in tags}
+    rows = [
+        {'prompt_id': prompt_id, 'tag_id': tag_ids[name], 'position': position}
+        for prompt_id, tag_names in tags_by_prompt.items()
+        for position, name in enumerate(tag_names)
+    ]
+    db.session.execute(PromptTag.__table__.insert(), rows)
+    return len(rows)
@@ -0,0 +1,76 @@
+"""
+Compiled rendering for prompt templates.
+
+Template content is parsed once into a tuple of segments - literal text and
+``(name, default)`` variable slots for ``{{name}}`` / ``{{name|default}}`` -
+and cached per (template id, updated_at). Rendering is then a single pass
+over the segments instead of one regex substitution per variable.
+"""
+
+import os
+import re
+from .cache import LRUCache
+
+VARIABLE_PATTERN = re.compile(r'\{\{([^}|]+)(?:\|([^}]*))?\}\}')
+
+# Marks a slot without a default (an empty default `{{name|}}` is allowed)
+NO_DEFAULT = object()
+
+compiled_cache = LRUCache(int(os.getenv('TEMPLATE_CACHE_SIZE', '256')))
+
+def compile_content(content):
+    """Parse template content into literal strings and (name, default, raw) variable slots"""
+    segments = []
+    position = 0
+    for match in VARIABLE_PATTERN.finditer(content):
+        if match.start() > position:
+            segments.append(content[position:match.start()])
+        default = match.group(2)
+        segments.append((
+            match.group(1).strip(),
+            default.strip() if default is not None else NO_DEFAULT,
+            match.group(0)
+        ))
+        position = match.end()
+    if position < len(content):
+        segments.append(content[position:])
+    return tuple(segments)
+
+def compile_template(template):
+    """Compiled segments for a PromptTemplate, cached until the template is updated"""
+    key = (template.id, template.updated_at)
+    segments = compiled_cache.get(key)
+    if segments is None:
+        segments = compile_content(template.content)
+        compiled_cache.put(key, segments)
+    return segments
+
+def render(segments, values):
+    """
+    Render compiled segments in one pass.
+
+    Variables missing from ``values`` fall back to their inline default;
+    those without one are left as written and reported. Returns
+    ``(content, missing_variable_names)``.
+    """
+    parts = []
+    missing = []
+    for segment in segments:
+        if isinstance(segment, str):
+            parts.append(segment)
+            continue
+
+        name, default, raw = segment
+        if name in values:
+            parts.append(str(values[name]))
+        elif default is not NO_DEFAULT:
+            parts.append(default)
+        else:
+            parts.append(raw)
+            if name not in missing:
+                missing.append(name)
+    return ''.join(parts), missing
+
+def render_template(template, values):
+    """Render a PromptTemplate with the given variable values"""
+    return render(compile_template(template), values)
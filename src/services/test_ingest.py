@@ -0,0 +1,174 @@
+"""
+Streaming test result ingestion.
+
+Automated eval runs push tens of thousands of results, so rows are read
+one at a time from an NDJSON/CSV body, validated, and written with one
+multi-row Core INSERT ... RETURNING per chunk. Messages are interned into
+content_blobs once per chunk, and only the new ids go back to the caller.
+"""
+
+import time
+from datetime import datetime
+from ..models.user import db
+from ..models.prompt import Prompt, TestResult
+from .blobs import intern_texts
+from .importer import MAX_REPORTED_REJECTS, parse_datetime
+from .ingest import INSERT_BATCH_SIZE
+from .rollups import invalidate_days
+from .changes import record_change
+
+# Column -> type the value is coerced to; CSV bodies send everything as text
+NUMERIC_FIELDS = {
+    'temperature': float,
+    'max_tokens': int,
+    'response_time': float,
+    'token_count_input': int,
+    'token_count_output': int,
+    'cost': float,
+    'user_rating': int,
+    'quality_score': float,
+    'consistency_score': float,
+}
+TEXT_FIELDS = ('model_name', 'model_response', 'test_type')
+
+def _coerce(value, kind):
+    if value is None or value == '':
+        return None
+    if kind is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f'{value} is not a whole number')
+    return kind(value)
+
+class TestResultIngester:
+    """
+    Buffers validated test results for one session and inserts them in chunks.
+
+    Call add() for each ``(record_number, record, error)`` from a reader and
+    finish() once at the end.
+    """
+
+    def __init__(self, test_session_id, batch_size=INSERT_BATCH_SIZE, default_test_type='automated'):
+        self.test_session_id = test_session_id
+        self.batch_size = batch_size
+        self.default_test_type = default_test_type
+        self.pending = []
+        self.ids = []
+        self.rejected = []
+        self.rejected_count = 0
+        self.started = time.perf_counter()
+
+    def reject(self, number, error):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTS:
+            self.rejected.append({'record': number, 'error': error})
+
+    def test_row(self, record):
+        try:
+            prompt_id = int(record.get('prompt_id'))
+        except (TypeError, ValueError):
+            raise ValueError('prompt_id is required')
+
+        row = {'prompt_id': prompt_id, 'test_session_id': self.test_session_id}
+        for field, kind in NUMERIC_FIELDS.items():
+            try:
+                row[field] = _coerce(record.get(field), kind)
+            except (TypeError, ValueError):
+                raise ValueError(f'{field} must be a number')
+        for field in TEXT_FIELDS + ('system_message', 'user_message'):
+            value = record.get(field)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f'{field} must be a string')
+            row[field] = value or None
+        if row['temperature'] is None:
+            row['temperature'] = 0.7
+        row['test_type'] = row['test_type'] or self.default_test_type
+        row['created_at'] = parse_datetime(record.get('created_at')) or datetime.utcnow()
+        return row
+
+    def add(self, number, record, error=None):
+        if error:
+            self.reject(number, error)
+            return
+        try:
+            row = self.test_row(record)
+        except ValueError as e:
+            self.reject(number, str(e))
+            return
+
+        self.pending.append((number, row))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert the pending rows with one statement and commit them"""
+        if not self.pending:
+            return
+
+        # One lookup validates every prompt id in the chunk
+        prompt_ids = {row['prompt_id'] for number, row in self.pending}
+        existing = set(db.session.execute(
+            db.select(Prompt.id).where(Prompt.id.in_(prompt_ids))
+        ).scalars())
+
+        rows = []
+        for number, row in self.pending:
+            if row['prompt_id'] in existing:
+                rows.append(row)
+            else:
+                self.reject(number, f"Prompt {row['prompt_id']} not found")
+        self.pending = []
+
+        if rows:
+            hashes = intern_texts(
+                message for row in rows for message in (row['system_message'], row['user_message'])
+            )
+            for row in rows:
+                row['system_message_hash'] = hashes.get(row.pop('system_message'))
+                row['user_message_hash'] = hashes.get(row.pop('user_message'))
+            # Core insert on the table: skips the ORM's per-row bookkeeping
+            table = TestResult.__table__
+            result = db.session.execute(
+                table.insert().returning(table.c.id), rows
+            )
+            # Back-dated results change days that may already be rolled up
+            invalidate_days({row['created_at'].date() for row in rows})
+            # Ids are assigned in row order within one INSERT, so sorting
+            # restores parameter order without a row-at-a-time RETURNING
+            self.ids.extend(sorted(result.scalars()))
+            record_change('test', 'create')
+        db.session.commit()
+
+    def finish(self):
+        self.flush()
+        elapsed = time.perf_counter() - self.started
+        return {
+            'inserted': len(self.ids),
+            'ids': self.ids,
+            'rejected_count': self.rejected_count,
+            'rejected': self.rejected,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(len(self.ids) / elapsed, 1) if elapsed else None
+        }
+
+def session_summary(test_session_id):
+    """Totals for a whole test session, computed in the database"""
+    totals = db.session.execute(
+        db.select(
+            db.func.count(TestResult.id),
+            db.func.min(TestResult.created_at),
+            db.func.max(TestResult.created_at),
+            db.func.sum(TestResult.cost)
+        ).where(TestResult.test_session_id == test_session_id)
+    ).one()
+    models = db.session.execute(
+        db.select(TestResult.model_name, db.func.count(TestResult.id))
+        .where(TestResult.test_session_id == test_session_id)
+        .group_by(TestResult.model_name)
+    ).all()
+    return {
+        'test_session_id': test_session_id,
+        'total_tests': totals[0],
+        'first_test_at': totals[1].isoformat() if totals[1] else None,
+        'last_test_at': totals[2].isoformat() if totals[2] else None,
+        'total_cost': totals[3] or 0,
+        'tests_per_model': {model_name or 'unknown': count for model_name, count in models}
+    }
@@ -0,0 +1,124 @@
+"""
+SQL aggregates over test results.
+
+Statistics are computed in the database from the numeric columns only,
+so message and response text is never loaded. Averages ignore NULLs
+(only tests that reported a value count), and latency percentiles use the
+nearest-rank method over a window so they work on SQLite and PostgreSQL.
+
+Both queries group by model; whole-selection figures are combined from
+the per-model rows, so every matching row is read twice in total.
+"""
+
+from sqlalchemy import func, case
+from ..models.user import db
+from ..models.prompt import TestResult
+
+PERCENTILES = (50, 95, 99)
+
+# Averaged columns: name -> column; each is summed and counted where not NULL
+AVERAGED_COLUMNS = {
+    'response_time': TestResult.response_time,
+    'cost': TestResult.cost,
+    'input_tokens': TestResult.token_count_input,
+    'output_tokens': TestResult.token_count_output,
+    'rating': TestResult.user_rating,
+    'quality': TestResult.quality_score,
+    'consistency': TestResult.consistency_score,
+}
+
+def _model_totals(criteria):
+    """Per-model counts and sums, as ``{model_name: {...}}``"""
+    tokens = func.coalesce(TestResult.token_count_input, 0) + func.coalesce(TestResult.token_count_output, 0)
+    columns = [func.count(TestResult.id).label('count')]
+    for name, column in AVERAGED_COLUMNS.items():
+        columns.append(func.sum(column).label(f'{name}_sum'))
+        columns.append(func.count(column).label(f'{name}_count'))
+    columns.append(func.sum(case((TestResult.cost.isnot(None), tokens))).label('costed_tokens'))
+
+    rows = db.session.execute(
+        db.select(TestResult.model_name, *columns).where(*criteria).group_by(TestResult.model_name)
+    )
+    return {row.model_name: {key: value or 0 for key, value in row._mapping.items() if key != 'model_name'} for row in rows}
+
+def _latency_percentiles(criteria):
+    """
+    Nearest-rank latency percentiles from one windowed query, as
+    ``({model_name: {p: value}}, {p: value})``: per model, then overall.
+    """
+    # Only the columns the ranking needs, so the windows sort narrow rows
+    ranked = db.select(
+        TestResult.model_name,
+        TestResult.response_time,
+        func.row_number().over(partition_by=TestResult.model_name, order_by=TestResult.response_time).label('model_rank'),
+        func.count().over(partition_by=TestResult.model_name).label('model_count'),
+        func.row_number().over(order_by=TestResult.response_time).label('overall_rank'),
+        func.count().over().label('overall_count')
+    ).where(*criteria, TestResult.response_time.isnot(None)).subquery()
+
+    columns = []
+    for p in PERCENTILES:
+        # The smallest time whose rank reaches p% of the timed tests
+        columns.append(func.min(case(
+            (ranked.c.model_rank >= ranked.c.model_count * (p / 100.0), ranked.c.response_time)
+        )).label(f'p{p}'))
+        columns.append(func.min(case(
+            (ranked.c.overall_rank >= ranked.c.overall_count * (p / 100.0), ranked.c.response_time)
+        )).label(f'overall_p{p}'))
+
+    per_model = {}
+    overall = {}
+    for row in db.session.execute(db.select(ranked.c.model_name, *columns).group_by(ranked.c.model_name)):
+        per_model[row.model_name] = {p: getattr(row, f'p{p}') for p in PERCENTILES}
+        for p in PERCENTILES:
+            # The overall minimum across groups is the overall percentile
+            value = getattr(row, f'overall_p{p}')
+            if value is not None and (overall.get(p) is None or value < overall[p]):
+                overall[p] = value
+    return per_model, overall
+
+def _average(totals, name):
+    count = totals.get(f'{name}_count')
+    return totals[f'{name}_sum'] / count if count else None
+
+def _stats(totals, percentiles):
+    total_cost = totals.get('cost_sum', 0)
+    costed_tokens = totals.get('costed_tokens')
+    stats = {
+        'count': totals.get('count', 0),
+        'avg_response_time': _average(totals, 'response_time'),
+        'total_cost': total_cost,
+        'avg_cost': _average(totals, 'cost'),
+        'avg_input_tokens': _average(totals, 'input_tokens'),
+        'avg_output_tokens': _average(totals, 'output_tokens'),
+        'cost_per_1k_tokens': total_cost / costed_tokens * 1000 if costed_tokens else None,
+        'avg_rating': _average(totals, 'rating'),
+        'rated_count': totals.get('rating_count', 0),
+        'avg_quality': _average(totals, 'quality'),
+        'avg_consistency': _average(totals, 'consistency'),
+    }
+    for p in PERCENTILES:
+        stats[f'p{p}_response_time'] = percentiles.get(p)
+    return stats
+
+def test_stats(*criteria):
+    """
+    Aggregate the test results matching ``criteria``.
+
+    Returns ``(overall, {model_name: stats})``; ``overall['count']`` is 0
+    when nothing matched.
+    """
+    model_totals = _model_totals(criteria)
+    model_percentiles, overall_percentiles = _latency_percentiles(criteria) if model_totals else ({}, {})
+
+    overall_totals = {}
+    for totals in model_totals.values():
+        for key, value in totals.items():
+            overall_totals[key] = overall_totals.get(key, 0) + value
+
+    overall = _stats(overall_totals, overall_percentiles)
+    by_model = {
+        model_name or 'unknown': _stats(totals, model_percentiles.get(model_name, {}))
+        for model_name, totals in model_totals.items()
+    }
+    return overall, by_model
@@ -0,0 +1,187 @@
+"""
+Gap-filled time series for the analytics charts.
+
+Buckets are numbered by integer division of epoch seconds, shifted by the
+caller's UTC offset (and, for weeks, aligned to Monday), so the same
+expression groups raw rows and numbers the empty buckets. A recursive CTE
+generates every bucket number in the range and each metric is LEFT JOINed
+onto it, so missing buckets come back as zeros from a single statement.
+
+Creations, tests and cost are counted from the raw tables, except that
+day and week buckets in UTC read closed days from the daily rollups and
+only today from the raw tables. Uses only exist as per-UTC-day counts;
+each day is placed in the bucket holding its noon, which keeps a UTC date
+on the same local date for offsets up to +/-12 hours.
+"""
+
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from ..models.user import db
+from ..models.prompt import Prompt, TestResult
+from .rollups import daily_rollups, ensure_rollups, utc_today, USAGE_METRICS
+
+BUCKET_SECONDS = {
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+}
+
+# Week buckets start on Monday; the epoch was a Thursday
+BUCKET_ORIGINS = {'hour': 0, 'day': 0, 'week': 4 * 86400}
+
+# Series metric -> usage kind (see rollups.USAGE_METRICS)
+USAGE_SERIES = {
+    'uses': 'prompt',
+    'template_uses': 'template',
+    'shortcut_uses': 'shortcut',
+}
+
+SERIES_METRICS = ('creations', 'tests', 'cost') + tuple(USAGE_SERIES)
+
+MAX_BUCKETS = 2000
+MAX_OFFSET_MINUTES = 14 * 60
+
+EPOCH = datetime(1970, 1, 1)
+
+class BucketSpec:
+    """Maps timestamps to bucket numbers for a bucket size and UTC offset (minutes)"""
+
+    def __init__(self, bucket, offset_minutes=0):
+        self.bucket = bucket
+        self.width = BUCKET_SECONDS[bucket]
+        self.offset_minutes = offset_minutes
+        # Seconds added to a UTC epoch before dividing by the width
+        self.shift = offset_minutes * 60 - BUCKET_ORIGINS[bucket]
+        self.tz = timezone(timedelta(minutes=offset_minutes))
+
+    def number(self, moment):
+        """Bucket number of a naive UTC datetime"""
+        return (int((moment - EPOCH).total_seconds()) + self.shift) // self.width
+
+    def start(self, number):
+        """Naive UTC datetime a bucket starts at"""
+        return EPOCH + timedelta(seconds=number * self.width - self.shift)
+
+    def label(self, number):
+        """Bucket start as a local ISO timestamp"""
+        return self.start(number).replace(tzinfo=timezone.utc).astimezone(self.tz).isoformat()
+
+    @property
+    def whole_utc_days(self):
+        """Whether every bucket is a run of whole UTC days"""
+        return self.bucket != 'hour' and self.offset_minutes == 0
+
+    def expression(self, epoch_seconds):
+        return (epoch_seconds + self.shift) // self.width
+
+    def range_for_days(self, days, now=None):
+        """First and last bucket numbers covering the last ``days`` local days up to now"""
+        now = now or datetime.utcnow()
+        local_today = (now + timedelta(minutes=self.offset_minutes)).date()
+        first_local_day = local_today - timedelta(days=max(days, 1) - 1)
+        first_moment = datetime.combine(first_local_day, datetime.min.time()) - timedelta(minutes=self.offset_minutes)
+        return self.number(first_moment), self.number(now)
+
+def epoch_seconds(column):
+    """Epoch seconds of a naive UTC column (strftime('%s') on SQLite)"""
+    return db.cast(db.extract('epoch', column), db.Integer)
+
+def _day_bucket(spec):
+    """Bucket of a daily_rollups row: the one holding the day's noon"""
+    return spec.expression(epoch_seconds(daily_rollups.c.day) + 43200).label('n')
+
+def _sum_of(metric, value):
+    """SUM of a daily_rollups value column over one metric's rows"""
+    return func.sum(db.case((daily_rollups.c.metric == metric, value), else_=0))
+
+def _merge(selects):
+    """Add up per-bucket rows from several selects with the same columns"""
+    if len(selects) == 1:
+        return selects[0].subquery()
+    union = db.union_all(*selects).subquery()
+    return db.select(union.c.n, *(
+        func.sum(column).label(column.name) for column in union.c if column.name != 'n'
+    )).group_by(union.c.n).subquery()
+
+def _metric_subqueries(spec, metrics, start_at, end_at, first, last):
+    """One aggregate subquery per source, grouped by bucket number ``n``"""
+    parts = []
+    # Closed days come from the daily rollups when buckets are whole UTC days
+    rolled_until = utc_today() if spec.whole_utc_days else None
+    raw_start = max(start_at, datetime.combine(rolled_until, datetime.min.time())) if rolled_until else start_at
+
+    def rollup_select(columns, rollup_metrics):
+        return (db.select(_day_bucket(spec), *columns)
+                .where(daily_rollups.c.day >= start_at.date(), daily_rollups.c.day < rolled_until,
+                       daily_rollups.c.metric.in_(rollup_metrics))
+                .group_by(_day_bucket(spec)))
+
+    if 'creations' in metrics:
+        bucket = spec.expression(epoch_seconds(Prompt.created_at)).label('n')
+        selects = [db.select(bucket, func.count().label('creations'))
+                   .where(Prompt.created_at >= raw_start, Prompt.created_at < end_at)
+                   .group_by(bucket)]
+        if rolled_until:
+            selects.append(rollup_select([func.sum(daily_rollups.c.count).label('creations')], ['prompts_created']))
+        parts.append(_merge(selects))
+
+    test_metrics = [name for name in ('tests', 'cost') if name in metrics]
+    if test_metrics:
+        bucket = spec.expression(epoch_seconds(TestResult.created_at)).label('n')
+        raw_columns = {
+            'tests': func.count().label('tests'),
+            'cost': func.coalesce(func.sum(TestResult.cost), 0).label('cost'),
+        }
+        selects = [db.select(bucket, *(raw_columns[name] for name in test_metrics))
+                   .where(TestResult.created_at >= raw_start, TestResult.created_at < end_at)
+                   .group_by(bucket)]
+        if rolled_until:
+            rolled_columns = {
+                'tests': _sum_of('tests', daily_rollups.c.count).label('tests'),
+                'cost': _sum_of('cost', daily_rollups.c.total).label('cost'),
+            }
+            selects.append(rollup_select([rolled_columns[name] for name in test_metrics], test_metrics))
+        parts.append(_merge(selects))
+
+    usage = [name for name in USAGE_SERIES if name in metrics]
+    if usage:
+        bucket = _day_bucket(spec)
+        columns = [_sum_of(USAGE_METRICS[USAGE_SERIES[name]], daily_rollups.c.count).label(name) for name in usage]
+        # Whole days around the range; the bucket filter trims the edges
+        parts.append(db.select(bucket, *columns)
+                     .where(daily_rollups.c.day >= (start_at - timedelta(days=1)).date(),
+                            daily_rollups.c.day <= end_at.date(),
+                            daily_rollups.c.metric.in_([USAGE_METRICS[USAGE_SERIES[name]] for name in usage]))
+                     .group_by(bucket)
+                     .having(bucket.between(first, last)).subquery())
+    return parts
+
+def time_series(metrics, spec, first, last):
+    """
+    One row per bucket from ``first`` to ``last`` (inclusive), zeros included.
+
+    Returns ``[{'bucket': local ISO start, metric: value, ...}]`` in order.
+    """
+    start_at, end_at = spec.start(first), spec.start(last + 1)
+    if spec.whole_utc_days:
+        ensure_rollups()
+
+    buckets = db.select(db.literal(first, db.Integer).label('n')).cte('buckets', recursive=True)
+    buckets = buckets.union_all(db.select(buckets.c.n + 1).where(buckets.c.n < last))
+
+    parts = _metric_subqueries(spec, metrics, start_at, end_at, first, last)
+    joined = buckets
+    columns = []
+    for part in parts:
+        joined = joined.outerjoin(part, part.c.n == buckets.c.n)
+        columns += [func.coalesce(column, 0).label(column.name) for column in part.c if column.name != 'n']
+
+    rows = db.session.execute(db.select(buckets.c.n, *columns).select_from(joined).order_by(buckets.c.n))
+    series = []
+    for row in rows:
+        point = {'bucket': spec.label(row.n)}
+        for metric in metrics:
+            value = getattr(row, metric)
+            point[metric] = round(float(value), 6) if metric == 'cost' else int(value)
+        series.append(point)
+    return series
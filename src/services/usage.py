@@ -0,0 +1,321 @@
+"""
+Write-behind buffer for usage counters.
+
+Opening a prompt, expanding a shortcut or instantiating a template used to
+commit an UPDATE each time. Usage events are now coalesced in memory per
+row and written in one transaction of batched UPDATEs every
+``USAGE_FLUSH_INTERVAL`` seconds, once ``USAGE_FLUSH_MAX_PENDING`` events
+are waiting, and at exit.
+
+With ``USAGE_JOURNAL_DIR`` set, each worker also appends its events to its
+own journal file before acknowledging them. Every journal is applied under
+a unique batch id recorded in ``usage_flush_batches``, so journals left
+behind by a crashed worker are replayed at the next startup exactly once.
+"""
+
+import atexit
+import glob
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import case, bindparam
+from sqlalchemy.exc import IntegrityError
+from ..models.user import db
+from ..models.prompt import Prompt, PromptTemplate, Shortcut
+from .rollups import record_daily_usage
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals are still replayed, just without liveness locks
+    fcntl = None
+
+# kind -> table whose use_count (and last_used, when present) is buffered
+USAGE_TABLES = {
+    'prompt': Prompt.__table__,
+    'template': PromptTemplate.__table__,
+    'shortcut': Shortcut.__table__,
+}
+
+# Applied journal ids are kept long enough to cover any restart delay
+BATCH_RETENTION = timedelta(days=7)
+
+usage_flush_batches = db.Table(
+    'usage_flush_batches',
+    db.Column('batch_id', db.String(100), primary_key=True),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+class UsageBuffer:
+    """Coalesces use_count / last_used increments and flushes them in batches"""
+
+    def __init__(self):
+        self.app = None
+        self.flush_interval = 5.0
+        self.max_pending = 500
+        self.journal_dir = None
+        self._pending = {}  # (kind, id) -> [count, last_used]
+        self._events = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._unapplied_journals = []
+        self._worker_pid = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = float(os.getenv('USAGE_FLUSH_INTERVAL', '5'))
+        self.max_pending = int(os.getenv('USAGE_FLUSH_MAX_PENDING', '500'))
+        self.journal_dir = os.getenv('USAGE_JOURNAL_DIR') or None
+        if self.journal_dir:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self.recover_journals()
+        atexit.register(self.flush)
+
+    # --- Recording -------------------------------------------------------
+
+    def record(self, kind, target_id, used_at=None, count=1):
+        """Count uses of a row; written to the database on the next flush"""
+        used_at = used_at or datetime.utcnow()
+        with self._lock:
+            self._ensure_worker()
+            entry = self._pending.setdefault((kind, target_id), [0, None])
+            entry[0] += count
+            if entry[1] is None or used_at > entry[1]:
+                entry[1] = used_at
+            self._events += 1
+            if self.journal_dir:
+                self._journal_append(f"{kind}\t{target_id}\t{used_at.isoformat()}\t{count}\n")
+            flush_now = self.flush_interval <= 0 or self._events >= self.max_pending
+
+        if flush_now:
+            try:
+                self.flush()
+            except Exception as e:
+                # The events stay buffered; the request itself succeeded
+                self.app.logger.warning(f"Usage flush failed, will retry: {e}")
+
+    def pending(self, kind, target_id):
+        """(count, last_used) recorded for a row but not flushed yet"""
+        with self._lock:
+            count, last_used = self._pending.get((kind, target_id), (0, None))
+        return count, last_used
+
+    def pending_total(self, kind):
+        """Unflushed uses across all rows of a kind"""
+        with self._lock:
+            return sum(count for (entry_kind, _), (count, _) in self._pending.items() if entry_kind == kind)
+
+    def pending_ids(self, kind):
+        """Ids of rows of a kind with unflushed uses"""
+        with self._lock:
+            return [target_id for (entry_kind, target_id) in self._pending if entry_kind == kind]
+
+    def merge_into(self, kind, data):
+        """Add unflushed usage to a serialized row (a dict with id / use_count / last_used)"""
+        count, last_used = self.pending(kind, data['id'])
+        if count:
+            data['use_count'] = (data.get('use_count') or 0) + count
+            if 'last_used' in data and last_used is not None:
+                stored = data['last_used']
+                if stored is None or last_used.isoformat() > stored:
+                    data['last_used'] = last_used.isoformat()
+        return data
+
+    # --- Flushing --------------------------------------------------------
+
+    def flush(self):
+        """Write all buffered usage in one transaction; returns the number of rows updated"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._events = 0
+                if self._journal is not None:
+                    self._unapplied_journals.append(self._rotate_journal())
+
+            if not batch:
+                self._discard_journals()
+                return 0
+
+            # Journals are recorded as applied in the same transaction as their events
+            batch_ids = [os.path.basename(path) for path, _ in self._unapplied_journals]
+            try:
+                with self.app.app_context():
+                    apply_usage(batch, batch_ids)
+            except Exception:
+                # Keep the events for the next attempt; their journals stay on disk
+                with self._lock:
+                    for key, (count, last_used) in batch.items():
+                        entry = self._pending.setdefault(key, [0, None])
+                        entry[0] += count
+                        if entry[1] is None or last_used > entry[1]:
+                            entry[1] = last_used
+                    self._events += len(batch)
+                raise
+
+            self._discard_journals()
+            return len(batch)
+
+    def _ensure_worker(self):
+        """Start the interval flusher in this process (again after a fork)"""
+        if self._worker_pid == os.getpid() or self.flush_interval <= 0:
+            return
+        self._worker_pid = os.getpid()
+        self._journal = None
+        self._unapplied_journals = []
+        thread = threading.Thread(target=self._run, name='usage-flusher', daemon=True)
+        thread.start()
+
+    def _run(self):
+        last_prune = datetime.utcnow()
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if self.journal_dir and datetime.utcnow() - last_prune > timedelta(hours=1):
+                    with self.app.app_context():
+                        prune_batches()
+                    last_prune = datetime.utcnow()
+            except Exception as e:
+                self.app.logger.warning(f"Usage flush failed, will retry: {e}")
+
+    # --- Journal ---------------------------------------------------------
+
+    def _journal_append(self, line):
+        if self._journal is None:
+            path = os.path.join(self.journal_dir, f"usage-{os.getpid()}-{uuid.uuid4().hex[:12]}.log")
+            journal = open(path + '.tmp', 'a', encoding='utf-8')
+            if fcntl:
+                # Held while this worker is alive so recovery leaves the file alone;
+                # taken before the file gets the name recovery looks for
+                fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.rename(path + '.tmp', path)
+            self._journal = (path, journal)
+        journal = self._journal[1]
+        journal.write(line)
+        journal.flush()
+
+    def _rotate_journal(self):
+        """Detach the current journal; it is deleted once its events are committed"""
+        journal, self._journal = self._journal, None
+        return journal
+
+    def _discard_journals(self):
+        journals, self._unapplied_journals = self._unapplied_journals, []
+        for path, journal in journals:
+            os.remove(path)
+            journal.close()
+
+    def recover_journals(self):
+        """Apply journals left by workers that exited without flushing"""
+        recovered = 0
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, 'usage-*.log'))):
+            try:
+                journal = open(path, 'r+', encoding='utf-8')
+            except FileNotFoundError:
+                continue  # recovered by another worker starting at the same time
+            with journal:
+                if fcntl:
+                    try:
+                        fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # owned by a live worker
+                    if not os.path.exists(path):
+                        continue  # recovered and removed after we opened it
+                batch = parse_journal(journal)
+                if batch:
+                    with self.app.app_context():
+                        # Skipped if the worker committed it but died before deleting the file
+                        apply_usage(batch, [os.path.basename(path)])
+                    recovered += 1
+                # Removed while the lock is held, so no other worker applies it after us
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        with self.app.app_context():
+            prune_batches()
+        return recovered
+
+def parse_journal(lines):
+    batch = {}
+    for line in lines:
+        try:
+            kind, target_id, used_at, count = line.rstrip('\n').split('\t')
+            key, used_at, count = (kind, int(target_id)), datetime.fromisoformat(used_at), int(count)
+        except ValueError:
+            continue  # torn final line from a crash mid-write
+        entry = batch.setdefault(key, [0, None])
+        entry[0] += count
+        if entry[1] is None or used_at > entry[1]:
+            entry[1] = used_at
+    return batch
+
+def apply_usage(batch, batch_ids=()):
+    """
+    Apply a coalesced batch as one executemany UPDATE per table.
+
+    ``batch_ids`` name the journals the events came from; they are recorded
+    in the same transaction so the same journal is never applied twice.
+    """
+    try:
+        with db.engine.begin() as conn:
+            if batch_ids:
+                if _applied_batches(conn, batch_ids):
+                    # Journal already recorded: these events were applied before a crash
+                    return False
+                applied_at = datetime.utcnow()
+                conn.execute(usage_flush_batches.insert(), [
+                    {'batch_id': batch_id, 'applied_at': applied_at} for batch_id in batch_ids
+                ])
+            for kind, table in USAGE_TABLES.items():
+                rows = [
+                    {'target_id': target_id, 'uses': count, 'used_at': last_used}
+                    for (entry_kind, target_id), (count, last_used) in batch.items()
+                    if entry_kind == kind
+                ]
+                if not rows:
+                    continue
+
+                values = {
+                    'use_count': db.func.coalesce(table.c.use_count, 0) + bindparam('uses'),
+                    # Usage is not an edit
+                    'updated_at': table.c.updated_at,
+                }
+                if 'last_used' in table.c:
+                    values['last_used'] = case(
+                        (table.c.last_used.is_(None) | (table.c.last_used < bindparam('used_at')),
+                         bindparam('used_at')),
+                        else_=table.c.last_used
+                    )
+                conn.execute(
+                    table.update().where(table.c.id == bindparam('target_id')).values(values),
+                    rows
+                )
+            # Per-day use counts for the analytics rollups, in the same transaction
+            record_daily_usage(conn, batch)
+    except IntegrityError:
+        # Another process recorded the same journal in the meantime; any other
+        # constraint violation is a real error and must not drop the counts
+        if batch_ids:
+            with db.engine.connect() as conn:
+                if _applied_batches(conn, batch_ids):
+                    return False
+        raise
+    return True
+
+def _applied_batches(conn, batch_ids):
+    """The ids among ``batch_ids`` already recorded in usage_flush_batches"""
+    return conn.execute(
+        db.select(usage_flush_batches.c.batch_id).where(usage_flush_batches.c.batch_id.in_(list(batch_ids)))
+    ).scalars().all()
+
+def prune_batches():
+    """Forget applied journal ids older than BATCH_RETENTION"""
+    with db.engine.begin() as conn:
+        conn.execute(usage_flush_batches.delete().where(
+            usage_flush_batches.c.applied_at < datetime.utcnow() - BATCH_RETENTION
+        ))
+
+usage_buffer = UsageBuffer()
@@ -0,0 +1,106 @@
+"""
+Shared fixtures for the backend tests.
+
+The app is imported once per session against a scratch SQLite database in
+a temporary directory, never database/app.db. Each test starts from empty
+tables.
+"""
+
+import os
+import sys
+import tempfile
+import pytest
+from sqlalchemy import event
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_scratch = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_scratch.name, 'test.db')}"
+os.environ['FLASK_DEBUG'] = 'False'
+# Write usage straight through and keep journals out of the tests
+os.environ['USAGE_FLUSH_INTERVAL'] = '0'
+os.environ['USAGE_JOURNAL_DIR'] = ''
+sys.path.insert(0, PROJECT_DIR)
+
+from main import app as flask_app
+from src.models.user import db
+from src.models.prompt import Category, Prompt, PromptTemplate
+
+# Bookkeeping tables seeded at startup rather than holding library data
+KEEP_TABLES = {'schema_migrations', 'table_versions'}
+
+def clear_tables():
+    for table in reversed(db.metadata.sorted_tables):
+        if table.name not in KEEP_TABLES:
+            db.session.execute(table.delete())
+    db.session.commit()
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        clear_tables()
+        yield flask_app
+        db.session.remove()
+
+@pytest.fixture
+def empty_database(app):
+    """Call to delete every row again within a test"""
+    return clear_tables
+
+class StatementCounter:
+    """Counts and records the SQL statements sent to the database"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+@pytest.fixture
+def count_statements(app):
+    """Context manager counting the statements run inside it"""
+    class Counting:
+        def __enter__(self):
+            self.counter = StatementCounter()
+            event.listen(db.engine, 'before_cursor_execute', self.counter.record)
+            return self.counter
+
+        def __exit__(self, *exc):
+            event.remove(db.engine, 'before_cursor_execute', self.counter.record)
+
+    return Counting
+
+@pytest.fixture
+def make_library(app):
+    """
+    Fill the library: ``prompts`` HEAD prompts (two tags each) and
+    ``templates`` templates spread over ``categories`` categories.
+    """
+    def make(prompts=0, templates=0, categories=5):
+        category_rows = [Category(name=f'Category {i}') for i in range(categories)]
+        db.session.add_all(category_rows)
+        db.session.flush()
+
+        for i in range(prompts):
+            prompt = Prompt(
+                title=f'Prompt {i}',
+                content=f'Instructions for prompt {i}',
+                category_id=category_rows[i % categories].id if categories else None
+            )
+            prompt.set_tags([f'tag-{i % 7}', f'group-{i % 3}'])
+            db.session.add(prompt)
+        for i in range(templates):
+            db.session.add(PromptTemplate(
+                name=f'Template {i}',
+                content='Hello {{name}}',
+                variables='[]',
+                category_id=category_rows[i % categories].id if categories else None
+            ))
+        db.session.commit()
+
+    return make
@@ -0,0 +1,42 @@
+"""
+The change feed keeps category prompt counts current and sends clients
+past bulk entries to a full reload.
+"""
+
+import json
+
+def changes_after(client, since):
+    return client.get(f'/api/changes?since={since}').get_json()
+
+def category_updates(feed):
+    return [change['data']['prompt_count'] for change in feed['changes']
+            if change['entity'] == 'category' and change['action'] == 'update']
+
+def test_prompt_create_and_delete_update_category(client, app):
+    # Cursors are taken after a logged write: an emptied log reads as 0, which it no longer covers
+    category = client.post('/api/categories', json={'name': 'Writing'}).get_json()
+    since = client.get('/api/changes').get_json()['last_seq']
+
+    prompt = client.post('/api/prompts', json={'title': 'Draft', 'content': 'Write', 'category_id': category['id']}).get_json()
+    feed = changes_after(client, since)
+    assert category_updates(feed) == [1]
+
+    client.delete(f"/api/prompts/{prompt['id']}")
+    assert category_updates(changes_after(client, feed['last_seq'])) == [0]
+
+def test_bulk_entry_resets_clients(client, app):
+    template = client.post('/api/templates', json={'name': 'Greeting', 'content': 'Hi {{name}}'}).get_json()
+    since = client.get('/api/changes').get_json()['last_seq']
+    assert changes_after(client, since)['reset'] is False
+
+    client.post('/api/prompts', json={'title': 'Single', 'content': 'One prompt'})
+    response = client.post(
+        f"/api/templates/{template['id']}/render-batch?persist=true",
+        data='name\nAda\nBob\n', content_type='text/csv'
+    )
+    assert json.loads(response.get_data(as_text=True).splitlines()[-1])['summary']['persisted'] == 2
+    latest = client.get('/api/changes').get_json()['last_seq']
+
+    feed = changes_after(client, since)
+    assert feed == {'changes': [], 'last_seq': latest, 'has_more': False, 'reset': True}
+    assert changes_after(client, latest)['reset'] is False
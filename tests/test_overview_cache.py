@@ -0,0 +1,41 @@
+"""
+The analytics overview is one SELECT on a cache miss and none on a hit,
+and any committed write (ORM or raw SQL) empties the cache.
+"""
+
+import pytest
+from sqlalchemy import text
+from src.models.user import db
+from src.models.prompt import Category
+from src.routes.analytics import overview_cache
+
+OVERVIEW = '/api/analytics/overview?days=30'
+
+@pytest.fixture
+def cached_overview(client, make_library, count_statements):
+    make_library(prompts=20, templates=5)
+    overview_cache.invalidate()
+
+    with count_statements() as miss:
+        response = client.get(OVERVIEW)
+    assert response.status_code == 200, response.get_json()
+    assert miss.count == 1, f'cache miss ran {miss.count} statements'
+    return response.get_json()
+
+def test_overview_hit_runs_no_statements(client, cached_overview, count_statements):
+    with count_statements() as hit:
+        response = client.get(OVERVIEW)
+    assert hit.count == 0, f'cache hit ran {hit.count} statements'
+    assert response.get_json() == cached_overview
+
+def test_orm_write_invalidates_overview(client, cached_overview):
+    db.session.add(Category(name='Written after caching'))
+    db.session.commit()
+
+    assert client.get(OVERVIEW).get_json()['total_categories'] == cached_overview['total_categories'] + 1
+
+def test_text_write_invalidates_overview(client, cached_overview):
+    db.session.execute(text("INSERT INTO categories (name) VALUES ('Written with text()')"))
+    db.session.commit()
+
+    assert client.get(OVERVIEW).get_json()['total_categories'] == cached_overview['total_categories'] + 1
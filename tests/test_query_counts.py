@@ -0,0 +1,25 @@
+"""
+List endpoints run a fixed number of statements however many rows they
+return; a count that grows with the rows is an N+1 regression.
+"""
+
+import pytest
+
+@pytest.mark.parametrize('path, library', [
+    ('/api/prompts', lambda n: {'prompts': n}),
+    ('/api/templates', lambda n: {'templates': n}),
+    ('/api/categories', lambda n: {'prompts': n, 'categories': n}),
+])
+def test_list_statement_count_is_constant(client, empty_database, make_library, count_statements, path, library):
+    counts = {}
+    for n in (10, 100):
+        empty_database()
+        make_library(**library(n))
+
+        with count_statements() as counter:
+            response = client.get(path)
+        assert response.status_code == 200, response.get_json()
+        assert len(response.get_json()) == n
+        counts[n] = counter.count
+
+    assert counts[10] == counts[100], f'{path} ran {counts[10]} statements for 10 rows, {counts[100]} for 100'
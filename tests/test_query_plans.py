@@ -0,0 +1,86 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot list and search endpoints.
+
+Every SELECT an endpoint runs is explained with its real parameters. None
+may scan a whole table, and ordered lists must come out of an index rather
+than a temporary B-tree. Relevance-ranked searches sort by BM25 score and
+the version history orders a recursive walk, so those two only need to
+reach their rows through indexes.
+
+The test database has no ANALYZE statistics, so SQLite plans as if every
+table were large: a plan shows whether an index can serve the query, not
+whether the few test rows are cheaper to scan.
+"""
+
+import re
+import pytest
+from src.models.user import db
+
+SCAN = re.compile(r'^SCAN (\w+)( USING .*)?$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+# What an endpoint may do beyond index searches
+INDEX_ORDER = 'index order'  # read a whole list in index order (unfiltered listings)
+SORTED = 'sorted'  # sort by a computed value (relevance, a recursive walk)
+
+@pytest.fixture
+def library(client, make_library):
+    make_library(prompts=200, templates=30)
+    prompt_id = client.get('/api/prompts?limit=1').get_json()[0]['id']
+    # A few superseded versions, so is_head is selective
+    for version in range(5):
+        prompt_id = client.put(f'/api/prompts/{prompt_id}', json={'content': f'Revision {version}'}).get_json()['id']
+    tests = client.post('/api/tests/batch', json={'tests': [
+        {'prompt_id': prompt_id, 'model_name': 'model-a', 'user_message': f'Question {i}'} for i in range(20)
+    ]}).get_json()
+    client.post('/api/shortcuts', json={'trigger': ';sig', 'expansion': 'Regards'})
+    return {
+        'prompt_id': prompt_id,
+        'category_id': 1,
+        'session_id': tests['test_session_id'],
+        'cursor': client.get('/api/prompts?limit=20').headers['X-Next-Cursor'],
+    }
+
+def explained_plans(client, count_statements, method, path, body=None):
+    """(statement, plan lines) for every SELECT the request runs"""
+    with count_statements() as counter:
+        response = client.open(path, method=method, json=body)
+    assert response.status_code == 200, response.get_json()
+
+    plans = []
+    with db.engine.connect() as conn:
+        for statement, parameters in counter.statements:
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                plans.append((statement, [row[-1] for row in rows]))
+    assert plans, f'{path} ran no queries'
+    return plans
+
+@pytest.mark.parametrize('method, path, body, allowed', [
+    ('GET', '/api/prompts', None, {INDEX_ORDER}),
+    ('GET', '/api/prompts?category_id={category_id}', None, ()),
+    ('GET', '/api/prompts?limit=20', None, {INDEX_ORDER}),
+    ('GET', '/api/prompts?limit=20&cursor={cursor}', None, {INDEX_ORDER}),
+    ('GET', '/api/prompts?tags=tag-1', None, {INDEX_ORDER}),
+    ('GET', '/api/prompts?search=instructions', None, {SORTED}),
+    ('GET', '/api/prompts?search=instructions&limit=10', None, {SORTED}),
+    ('POST', '/api/prompts/search', {'query': 'instructions'}, {SORTED}),
+    ('GET', '/api/prompts/{prompt_id}/history', None, {SORTED}),
+    ('GET', '/api/categories', None, {INDEX_ORDER}),
+    ('GET', '/api/templates', None, {INDEX_ORDER}),
+    ('GET', '/api/shortcuts?is_active=true', None, ()),
+    ('GET', '/api/tests?prompt_id={prompt_id}', None, ()),
+    ('GET', '/api/tests?test_session_id={session_id}', None, ()),
+    ('GET', '/api/tests?model_name=model-a', None, ()),
+])
+def test_hot_queries_use_indexes(client, count_statements, library, method, path, body, allowed):
+    tables = set(db.metadata.tables)
+    for statement, plan in explained_plans(client, count_statements, method, path.format(**library), body):
+        explained = f'{path}:\n{statement}\n' + '\n'.join(plan)
+        for match in filter(None, map(SCAN.match, plan)):
+            if match.group(1) not in tables:
+                continue  # CTEs, subqueries and the FTS index
+            assert match.group(2), f'Full table scan of {match.group(1)} in {explained}'
+            assert INDEX_ORDER in allowed, f'Full index scan of {match.group(1)} in {explained}'
+        if SORTED not in allowed:
+            assert TEMP_SORT not in plan, f'Sort in a temp B-tree in {explained}'
@@ -0,0 +1,26 @@
+"""
+Batch rendering reports CSV rows that do not match the header instead of
+rendering or saving them.
+"""
+
+import json
+from src.models.user import db
+from src.models.prompt import Prompt, PromptTemplate
+
+def test_csv_rows_must_match_header(client, app):
+    template = PromptTemplate(name='Greeting', content='Hi {{name}} {{x}}', variables='[]')
+    db.session.add(template)
+    db.session.commit()
+
+    body = 'x,name\n1,Ada\n2\n3,Bob,extra\n'
+    response = client.post(
+        f'/api/templates/{template.id}/render-batch?persist=true',
+        data=body, content_type='text/csv'
+    )
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert lines[0] == {'row': 1, 'content': 'Hi Ada 1', 'missing_variables': []}
+    assert lines[1] == {'row': 2, 'error': 'Fewer values than header columns'}
+    assert lines[2] == {'row': 3, 'error': 'More values than header columns'}
+    assert lines[3]['summary'] == {'rendered': 1, 'errors': 2, 'persisted': 1}
+    assert [prompt.content for prompt in Prompt.query.all()] == ['Hi Ada 1']
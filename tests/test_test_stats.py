@@ -0,0 +1,28 @@
+"""
+Test-result aggregates: tests without a model_name form their own
+'unknown' bucket, separate from the whole-selection figures.
+"""
+
+from src.models.user import db
+from src.models.prompt import Prompt, TestResult
+from src.services import test_stats as stats
+
+def test_unknown_model_percentiles_are_its_own(app):
+    prompt = Prompt(title='Timed prompt', content='Answer quickly')
+    db.session.add(prompt)
+    db.session.flush()
+    times = {None: [10, 20], 'model-a': [1, 2, 3, 4, 5, 6]}
+    for model_name, response_times in times.items():
+        db.session.add_all(
+            TestResult(prompt_id=prompt.id, model_name=model_name, response_time=response_time)
+            for response_time in response_times
+        )
+    db.session.commit()
+
+    overall, by_model = stats.test_stats(TestResult.prompt_id == prompt.id)
+
+    assert by_model['unknown']['count'] == 2
+    assert [by_model['unknown'][f'p{p}_response_time'] for p in stats.PERCENTILES] == [10, 20, 20]
+    assert [by_model['model-a'][f'p{p}_response_time'] for p in stats.PERCENTILES] == [3, 6, 6]
+    assert overall['count'] == 8
+    assert [overall[f'p{p}_response_time'] for p in stats.PERCENTILES] == [4, 20, 20]